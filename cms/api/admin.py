@@ -1,8 +1,107 @@
 from django.contrib import admin
-from .models import *
+from django.contrib.admin.utils import get_fields_from_path
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .models import Profile, Category, Content, ArchivedContent
+
+from utilities.pagination_utilities import EstimatedCountPaginator
+
 
 # Register your models here.
 
-admin.site.register(Profile)
-admin.site.register(Category)
-admin.site.register(Content)
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    admin for large tables, the changelist never counts the whole table
+    and searches with lookups served by indexes only
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        search_fields match the whole search term, or its prefix for fields starting with '^',
+        as admin does (case insensitively) but without the contains lookups no index can serve,
+        prefixes are served by the case insensitive indexes of migration api 0011
+        """
+        search_term = search_term.strip()
+
+        if not search_term:
+            return queryset, False
+
+        condition = Q()
+
+        for search_field in self.get_search_fields(request):
+            path = search_field.lstrip('^')
+            fields = get_fields_from_path(self.model, path)
+
+            try:
+                value = fields[-1].to_python(search_term)
+            except ValidationError:
+                # e.g. a title searched in ids
+                continue
+
+            # fields of related models are searched in a subquery, an OR across a join can't use indexes
+            relation, _, related_path = path.partition('__') if len(fields) > 1 else (None, None, path)
+
+            if search_field.startswith('^'):
+                lookups = {f'{related_path}__istartswith': value}
+            else:
+                lookups = {related_path: value}
+
+            if relation is not None:
+                condition |= Q(**{f'{relation}__in': fields[0].related_model.objects.filter(**lookups)})
+            else:
+                condition |= Q(**lookups)
+
+        if not condition:
+            return queryset.none(), False
+
+        return queryset.filter(condition), False
+
+
+@admin.register(Profile)
+class ProfileAdmin(ScalableModelAdmin):
+    list_display = ('id', 'user', 'phone_no', 'city', 'country')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    # indexed columns only
+    search_fields = ('^user__username', 'user__id')
+
+
+@admin.register(Category)
+class CategoryAdmin(ScalableModelAdmin):
+    list_display = ('id', 'title')
+    # indexed case insensitively, used by content autocomplete
+    search_fields = ('^title',)
+
+
+@admin.register(Content)
+class ContentAdmin(ScalableModelAdmin):
+    list_display = ('id', 'title', 'user', 'created_at', 'updated_at')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    # blob references are counted, they change through Content.pdf only, revisions are numbered by Content.save
+    readonly_fields = ('pdf_blob', 'revision')
+    autocomplete_fields = ('categories',)
+    # indexed columns only
+    search_fields = ('id', '^user__username')
+
+    def save_model(self, request, obj, form, change):
+        obj.save(revision_user_id=request.user.id)
+
+
+@admin.register(ArchivedContent)
+class ArchivedContentAdmin(ScalableModelAdmin):
+    list_display = ('id', 'title', 'user', 'updated_at', 'archived_at')
+    list_select_related = ('user',)
+    search_fields = ('id', '^user__username')
+
+    # archived contents are read only, they are written by the archive_contents command only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
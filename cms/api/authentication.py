@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import TokenActivity
+
+from utilities.db_utilities import DatabaseUtilities
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenUsageRecorder:
+    """
+    coalesces last_used writes of tokens, a token is marked used at most once per TOKEN_LAST_USED_RESOLUTION
+    seconds by a process, and marked tokens are written together by a single update per resolution period
+    the update is run by flush once the response is sent (see signals), outside of the request transaction,
+    so that read requests never take the write lock
+    """
+
+    def __init__(self):
+        # key: time the token was last marked used by this process
+        self.marked = {}
+        self.pending = set()
+        self.last_flush_time = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, token):
+        current_time = time.time()
+
+        try:
+            last_used = token.activity.last_used
+        except TokenActivity.DoesNotExist:
+            return
+
+        with self.lock:
+            # stored last_used is recent enough, or the token is already waiting for the next write
+            if current_time - max(last_used, self.marked.get(token.key, 0)) < settings.TOKEN_LAST_USED_RESOLUTION:
+                return
+
+            self.marked[token.key] = current_time
+            self.pending.add(token.key)
+
+    def flush(self, force=False):
+        """
+        writes last_used of pending tokens if a resolution period passed since the last write,
+        call it outside of transactions, pending tokens are kept for the next flush if the write fails
+        """
+        current_time = time.time()
+        resolution = settings.TOKEN_LAST_USED_RESOLUTION
+
+        with self.lock:
+            if not self.pending or (not force and current_time - self.last_flush_time < resolution):
+                return
+
+            keys, self.pending = self.pending, set()
+            self.last_flush_time = current_time
+
+            # marks older than a resolution period are covered by the stored last_used
+            self.marked = {key: marked_at for key, marked_at in self.marked.items()
+                           if current_time - marked_at < resolution}
+
+        try:
+            with DatabaseUtilities.immediate_atomic():
+                TokenActivity.objects.filter(token_id__in=keys).update(last_used=current_time)
+        except DatabaseError:
+            with self.lock:
+                self.pending |= keys
+
+            logger.warning('last_used of %d tokens not written, retried on next flush', len(keys), exc_info=True)
+
+
+token_usage_recorder = TokenUsageRecorder()
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """
+    token authentication rejecting tokens expired by age or idleness (see TokenActivity)
+    user and activity are read with the token in a single query
+    """
+
+    def authenticate_credentials(self, key):
+        try:
+            token = Token.objects.select_related('user', 'activity').get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        if TokenActivity.is_expired(token):
+            raise exceptions.AuthenticationFailed('Token has expired.')
+
+        token_usage_recorder.record(token)
+
+        return token.user, token
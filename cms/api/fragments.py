@@ -0,0 +1,84 @@
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+from utilities.cache_utilities import LruByteCache, invalidation_bus
+
+from .serializers import ContentSerializer
+
+
+class ContentFragmentCache:
+    """
+    rendered json of serialized contents, keyed by content id, updated_at and serialized fields
+    lists are spliced from cached fragments and only contents missing from the cache are serialized,
+    so serialization follows the rate of content writes rather than the rate of reads
+    fragments are dropped on invalidation events of their content, its user and its categories,
+    updated_at alone does not tell apart two updates within a second
+    """
+
+    renderer = JSONRenderer()
+
+    def __init__(self, max_bytes, bus=invalidation_bus):
+        self.cache = LruByteCache(max_bytes)
+        self.bus = bus
+        self.hits = 0
+        self.misses = 0
+
+        # dropped right away on writes of this process too, sqlite reuses ids of rows which are rolled back
+        for namespace in ('content', 'user', 'category'):
+            bus.subscribe(namespace, lambda key, namespace=namespace: self.invalidate(namespace, key), immediate=True)
+
+    def render(self, contents, fields) -> bytes:
+        """
+        returns json list of serialized contents, contents must be loaded with_fields(fields)
+        """
+        self.bus.poll()
+
+        fields = tuple(fields)
+        fragments = [self.cache.get((content.id, content.updated_at, fields)) for content in contents]
+        missing_contents = [content for content, fragment in zip(contents, fragments) if fragment is None]
+
+        if missing_contents:
+            rendered = iter(self.renderer.render(serialized_content) for serialized_content in
+                            ContentSerializer(missing_contents, many=True, fields=fields).data)
+
+            for index, content in enumerate(contents):
+                if fragments[index] is None:
+                    fragments[index] = next(rendered)
+
+                    self.cache.set((content.id, content.updated_at, fields), fragments[index],
+                                   tags=ContentFragmentCache.get_tags(content, fields))
+
+        self.hits += len(contents) - len(missing_contents)
+        self.misses += len(missing_contents)
+
+        return b'[' + b','.join(fragments) + b']'
+
+    def invalidate(self, namespace, key):
+        if key is None:
+            self.cache.clear()
+        else:
+            self.cache.invalidate_tag((namespace, str(key)))
+
+    def get_metrics(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.cache.entries),
+            'bytes': self.cache.size,
+        }
+
+    @staticmethod
+    def get_tags(content, fields):
+        tags = [('content', str(content.id))]
+
+        if 'user' in fields:
+            tags.append(('user', str(content.user_id)))
+
+        if 'categories' in fields:
+            # categories are prefetched, see ContentQuerySet.with_fields
+            tags += [('category', str(category.id)) for category in content.categories.all()]
+
+        return tags
+
+
+content_fragment_cache = ContentFragmentCache(max_bytes=settings.CONTENT_FRAGMENT_CACHE_SIZE)
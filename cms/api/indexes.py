@@ -0,0 +1,199 @@
+import bisect
+import heapq
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Count
+
+from utilities.cache_utilities import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+
+class CategoryIndex:
+    """
+    in process prefix index over category titles, for autocomplete without a query per keystroke
+
+    titles are kept in a sorted list of (lowercase title, id), a prefix is a contiguous range of it
+    found by binary search, suggestions are the most used categories of the range
+    ranges of short prefixes are long, their CATEGORY_AUTOCOMPLETE_MAX_SIZE most used categories are kept
+    once ranked and follow usage changes
+    titles follow category invalidation events of the bus, usage follows category links of this process
+    and is recounted every CATEGORY_INDEX_REBUILD_INTERVAL seconds (links of other processes, cascades)
+    by a background thread, requests are answered from the current index meanwhile
+    """
+
+    def __init__(self, bus=invalidation_bus):
+        self.bus = bus
+        self.keys = []
+        # id: [title, usage]
+        self.categories = {}
+        # prefix: ids of its most used categories, most used first, for prefixes up to
+        # CATEGORY_INDEX_TOP_PREFIX_LENGTH characters
+        self.top = {}
+        self.built_at = None
+        # set when the whole index must be rebuilt before its rebuild interval
+        self.expired = False
+        self.rebuild_thread = None
+        self.lock = threading.RLock()
+
+        bus.subscribe('category', self.refresh)
+
+    def build(self):
+        from .models import Category
+
+        # remember position of the bus first, changes made while building are replayed on next poll
+        self.bus.poll(force=True)
+
+        rows = Category.objects.annotate(usage=Count('content')).values_list('id', 'title', 'usage')
+
+        categories = {category_id: [title, usage] for category_id, title, usage in rows}
+        keys = sorted((title.lower(), category_id) for category_id, (title, _) in categories.items())
+
+        with self.lock:
+            self.categories, self.keys, self.top = categories, keys, {}
+            self.built_at = time.monotonic()
+            self.expired = False
+
+    def rebuild(self):
+        """
+        starts a build in a background thread, unless one is running
+        """
+        with self.lock:
+            if self.rebuild_thread is not None and self.rebuild_thread.is_alive():
+                return
+
+            self.rebuild_thread = threading.Thread(target=self.run_rebuild, name='category-index-rebuild',
+                                                   daemon=True)
+            self.rebuild_thread.start()
+
+    def run_rebuild(self):
+        try:
+            self.build()
+        except DatabaseError:
+            # the index stays due, next request starts another build
+            logger.warning('Rebuilding category index failed', exc_info=True)
+        finally:
+            # connections are per thread, the ones of this thread are not used again
+            connections.close_all()
+
+    def suggest(self, prefix, limit=10):
+        """
+        returns up to limit (id, title, usage) of categories whose title starts with prefix,
+        ordered by usage, then title
+        """
+        if self.built_at is None:
+            # first suggestion of a process which was not warmed up
+            self.build()
+        else:
+            if self.expired or time.monotonic() - self.built_at > settings.CATEGORY_INDEX_REBUILD_INTERVAL:
+                self.rebuild()
+
+            self.bus.poll()
+
+        prefix = prefix.lower()
+
+        with self.lock:
+            if len(prefix) <= settings.CATEGORY_INDEX_TOP_PREFIX_LENGTH and \
+                    limit <= settings.CATEGORY_AUTOCOMPLETE_MAX_SIZE:
+                if prefix not in self.top:
+                    self.top[prefix] = self.get_top(prefix, settings.CATEGORY_AUTOCOMPLETE_MAX_SIZE)
+
+                top_matches = self.top[prefix][:limit]
+            else:
+                top_matches = self.get_top(prefix, limit)
+
+            return [(category_id, *self.categories[category_id]) for category_id in top_matches]
+
+    def get_top(self, prefix, limit) -> list:
+        """
+        returns ids of the limit most used categories whose lowercase title starts with prefix
+        """
+        keys = self.keys
+
+        def get_matches():
+            for index in range(bisect.bisect_left(keys, (prefix,)), len(keys)):
+                title, category_id = keys[index]
+
+                if not title.startswith(prefix):
+                    return
+
+                yield category_id
+
+        return heapq.nsmallest(limit, get_matches(), key=self.get_rank)
+
+    def get_rank(self, category_id) -> tuple:
+        # most used first, then alphabetical
+        title, usage = self.categories[category_id]
+
+        return -usage, title.lower(), category_id
+
+    def get_top_prefixes(self, title) -> list:
+        title = title.lower()
+
+        return [title[:length] for length in range(min(len(title), settings.CATEGORY_INDEX_TOP_PREFIX_LENGTH) + 1)]
+
+    def add_usage(self, category_id, delta):
+        with self.lock:
+            if category_id not in self.categories:
+                return
+
+            category = self.categories[category_id]
+            category[1] += delta
+
+            for prefix in self.get_top_prefixes(category[0]):
+                top = self.top.get(prefix)
+
+                if top is None:
+                    continue
+
+                if category_id not in top:
+                    if delta > 0:
+                        top.append(category_id)
+                elif delta < 0 and len(top) >= settings.CATEGORY_AUTOCOMPLETE_MAX_SIZE:
+                    # a category left out of the full list may rank higher now, ranked again on next suggestion
+                    del self.top[prefix]
+                    continue
+
+                top.sort(key=self.get_rank)
+                del top[settings.CATEGORY_AUTOCOMPLETE_MAX_SIZE:]
+
+    def refresh(self, category_id=None):
+        """
+        reloads title of an added, renamed or deleted category, everything when category_id is None
+        """
+        from .models import Category
+
+        if self.built_at is None:
+            return
+
+        if category_id is None:
+            self.expired = True
+            return
+
+        category_id = int(category_id)
+        title = Category.objects.filter(pk=category_id).values_list('title', flat=True).first()
+
+        with self.lock:
+            if category_id in self.categories:
+                old_title, usage = self.categories.pop(category_id)
+                del self.keys[bisect.bisect_left(self.keys, (old_title.lower(), category_id))]
+                self.forget_top(old_title)
+            else:
+                usage = 0
+
+            if title is not None:
+                self.categories[category_id] = [title, usage]
+                bisect.insort(self.keys, (title.lower(), category_id))
+                self.forget_top(title)
+
+    def forget_top(self, title):
+        # lists of the prefixes of title are ranked again on next suggestion
+        for prefix in self.get_top_prefixes(title):
+            self.top.pop(prefix, None)
+
+
+category_index = CategoryIndex()
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import Content, ArchivedContent
+
+from utilities.db_utilities import DatabaseUtilities
+
+
+class Command(BaseCommand):
+    help = 'Moves contents not updated for CONTENT_ARCHIVE_AGE seconds to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=None,
+                            help='archive contents not updated for this many seconds')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='seconds to sleep between batches, so that requests get the database')
+
+    def handle(self, *args, **options):
+        older_than = options['older_than'] if options['older_than'] is not None else settings.CONTENT_ARCHIVE_AGE
+        cutoff = int(time.time()) - older_than
+
+        # updated_at is indexed
+        expired = Content.objects.filter(updated_at__lt=cutoff).order_by('updated_at')
+        archived = 0
+
+        while True:
+            # every batch is moved in its own short write transaction
+            with DatabaseUtilities.immediate_atomic():
+                contents = list(expired[:options['batch_size']])
+
+                if not contents:
+                    break
+
+                ArchivedContent.archive(contents)
+
+            archived += len(contents)
+            time.sleep(options['pause'])
+
+        self.stdout.write(f'Archived {archived} contents')
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from api.models import Content, ArchivedContent, ContentRevision, PdfBlob
+
+from utilities.db_utilities import DatabaseUtilities
+
+
+class Command(BaseCommand):
+    help = 'Deletes pdf blobs no content or content revision refers to anymore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--recount', action='store_true',
+                            help='recompute reference counts from contents first, e.g. after raw sql writes')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if options['recount']:
+            ref_count = 0
+
+            # archived contents and revision snapshots keep their references
+            for model in (Content, ArchivedContent, ContentRevision):
+                references = model.objects.filter(pdf_blob=OuterRef('pk')).order_by() \
+                    .values('pdf_blob').annotate(total=Count('id')).values('total')
+
+                ref_count += Coalesce(Subquery(references, output_field=IntegerField()), 0)
+
+            with DatabaseUtilities.immediate_atomic():
+                PdfBlob.objects.update(ref_count=ref_count)
+
+        # a blob is deleted only if no content refers to it, whatever its count says
+        unreferenced = PdfBlob.objects.filter(ref_count__lte=0, contents=None, archived_contents=None,
+                                            revisions=None)
+        collected = 0
+
+        while True:
+            # write lock is taken up front, so that no content can acquire a blob being deleted
+            with DatabaseUtilities.immediate_atomic():
+                digests = list(unreferenced.values_list('digest', flat=True)[:batch_size])
+
+                if not digests:
+                    break
+
+                PdfBlob.objects.filter(pk__in=digests).delete()
+
+            collected += len(digests)
+
+        self.stdout.write(f'Collected {collected} pdf blobs')
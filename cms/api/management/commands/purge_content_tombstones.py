@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import ContentTombstone
+
+
+class Command(BaseCommand):
+    help = 'Deletes content tombstones older than the change feed retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        cutoff = int(time.time()) - settings.CONTENT_TOMBSTONE_RETENTION
+
+        expired = ContentTombstone.objects.filter(deleted_at__lt=cutoff).order_by('deleted_at')
+        purged = 0
+
+        while True:
+            # delete in small batches, so that the table is never locked for long
+            with transaction.atomic():
+                ids = list(expired.values_list('id', flat=True)[:batch_size])
+
+                if not ids:
+                    break
+
+                ContentTombstone.objects.filter(pk__in=ids).delete()
+
+            purged += len(ids)
+
+        self.stdout.write(f'Purged {purged} content tombstones')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rest_framework.authtoken.models import Token
+
+from api.models import TokenActivity
+
+
+class Command(BaseCommand):
+    help = 'Deletes auth tokens expired by age or idleness'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # expired tokens are then found through the activity indexes only
+        TokenActivity.create_missing()
+
+        purged = 0
+
+        while True:
+            # delete in small batches, so that the table is never locked for long
+            with transaction.atomic():
+                keys = TokenActivity.get_expired_token_keys(batch_size)
+
+                if not keys:
+                    break
+
+                Token.objects.filter(pk__in=keys).delete()
+
+            purged += len(keys)
+
+        self.stdout.write(f'Purged {purged} expired tokens')
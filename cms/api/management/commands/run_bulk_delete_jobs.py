@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import BulkDeleteJob
+
+
+class Command(BaseCommand):
+    help = 'Processes queued bulk delete jobs in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='contents deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='seconds to sleep between batches')
+        parser.add_argument('--loop', action='store_true',
+                            help='keep polling for new jobs instead of exiting when the queue is empty')
+        parser.add_argument('--poll-interval', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        while True:
+            # queued jobs, and running jobs left behind by a worker which died
+            jobs = BulkDeleteJob.get_claimable().order_by('id')
+
+            for job in jobs:
+                # another worker may have picked the job already
+                if not job.claim():
+                    continue
+
+                self.stdout.write(f'Running bulk delete job {job.id}, {job.total} contents')
+
+                job.run(batch_size=options['batch_size'], pause=options['pause'])
+
+                self.stdout.write(f'Bulk delete job {job.id} deleted {job.deleted} contents')
+
+            if not options['loop']:
+                break
+
+            time.sleep(options['poll_interval'])
@@ -0,0 +1,35 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_content_counters(apps, schema_editor):
+    Content = apps.get_model('api', 'Content')
+    ContentCounter = apps.get_model('api', 'ContentCounter')
+
+    counters = [ContentCounter(scope='global', count=Content.objects.count())]
+
+    for row in Content.objects.order_by().values('user_id').annotate(total=Count('id')):
+        counters.append(ContentCounter(scope=f"user:{row['user_id']}", count=row['total']))
+
+    ContentCounter.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50, unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_content_counters, migrations.RunPython.noop),
+    ]
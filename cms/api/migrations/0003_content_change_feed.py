@@ -0,0 +1,38 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_content_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentTombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_id', models.IntegerField()),
+                ('user_id', models.IntegerField()),
+                ('deleted_at', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['updated_at'], name='api_content_updated_518b20_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['user', 'updated_at'], name='api_content_user_id_5796ae_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenttombstone',
+            index=models.Index(fields=['deleted_at'], name='api_content_deleted_e18df3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contenttombstone',
+            index=models.Index(fields=['user_id', 'deleted_at'], name='api_content_user_id_4d8d7b_idx'),
+        ),
+    ]
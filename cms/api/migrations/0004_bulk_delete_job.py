@@ -0,0 +1,32 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0003_content_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkDeleteJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20)),
+                ('target_user_id', models.IntegerField(blank=True, null=True)),
+                ('category_id', models.IntegerField(blank=True, null=True)),
+                ('older_than', models.BigIntegerField(blank=True, null=True)),
+                ('total', models.IntegerField(default=0)),
+                ('deleted', models.IntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('created_at', models.BigIntegerField(default=0)),
+                ('updated_at', models.BigIntegerField(default=0)),
+                ('requested_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
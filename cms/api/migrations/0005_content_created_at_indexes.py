@@ -0,0 +1,21 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_bulk_delete_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['created_at'], name='api_content_created_dcdd73_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['user', 'created_at'], name='api_content_user_id_63f104_idx'),
+        ),
+    ]
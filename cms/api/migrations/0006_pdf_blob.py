@@ -0,0 +1,67 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:19
+
+import hashlib
+import time
+
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+
+def move_pdfs_to_blobs(apps, schema_editor):
+    Content = apps.get_model('api', 'Content')
+    PdfBlob = apps.get_model('api', 'PdfBlob')
+
+    for content_id, pdf in Content.objects.order_by('id').values_list('id', 'pdf').iterator():
+        if not pdf:
+            continue
+
+        digest = hashlib.sha256(pdf.encode()).hexdigest()
+
+        if not PdfBlob.objects.filter(pk=digest).update(ref_count=F('ref_count') + 1):
+            PdfBlob.objects.create(digest=digest, data=pdf, ref_count=1, created_at=time.time())
+
+        Content.objects.filter(pk=content_id).update(pdf_blob_id=digest)
+
+
+def move_blobs_to_pdfs(apps, schema_editor):
+    Content = apps.get_model('api', 'Content')
+    PdfBlob = apps.get_model('api', 'PdfBlob')
+
+    for digest, data in PdfBlob.objects.values_list('digest', 'data').iterator():
+        Content.objects.filter(pdf_blob_id=digest).update(pdf=data)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_content_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.TextField()),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='pdf_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='contents', to='api.pdfblob'),
+        ),
+        migrations.RunPython(move_pdfs_to_blobs, move_blobs_to_pdfs),
+        # lets the column be added back with empty pdfs when migrating backwards
+        migrations.AlterField(
+            model_name='content',
+            name='pdf',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='content',
+            name='pdf',
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:22
+
+from django.db import migrations
+import utilities.model_fields
+
+
+def decompress_values(apps, schema_editor):
+    """
+    rewrites compressed values as plain text, so that they can be read again as text fields
+    existing rows are compressed by the recompress_text_fields command, not by this migration
+    """
+    for model_name, field_name in (('PdfBlob', 'data'), ('Profile', 'address')):
+        model = apps.get_model('api', model_name)
+        table = model._meta.db_table
+        column = model._meta.get_field(field_name).column
+        pk_column = model._meta.pk.column
+
+        for pk, value in model.objects.values_list('pk', field_name).iterator():
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(f'UPDATE "{table}" SET "{column}" = %s WHERE "{pk_column}" = %s', [str(value), pk])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_pdf_blob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pdfblob',
+            name='data',
+            field=utilities.model_fields.CompressedTextField(),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='address',
+            field=utilities.model_fields.CompressedTextField(blank=True),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, decompress_values),
+    ]
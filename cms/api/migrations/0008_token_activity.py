@@ -0,0 +1,40 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:25
+
+import time
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_token_activities(apps, schema_editor):
+    Token = apps.get_model('authtoken', 'Token')
+    TokenActivity = apps.get_model('api', 'TokenActivity')
+
+    # existing tokens count as used now, they expire by age or after the idle timeout from now on
+    current_time = time.time()
+
+    TokenActivity.objects.bulk_create(
+        [TokenActivity(token_id=key, created_at=created.timestamp(), last_used=current_time)
+         for key, created in Token.objects.values_list('key', 'created').iterator()],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0003_tokenproxy'),
+        ('api', '0007_compressed_text_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenActivity',
+            fields=[
+                ('token', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='activity', serialize=False, to='authtoken.token')),
+                ('created_at', models.BigIntegerField(db_index=True, default=0)),
+                ('last_used', models.BigIntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.RunPython(create_token_activities, migrations.RunPython.noop),
+    ]
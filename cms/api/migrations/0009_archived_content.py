@@ -0,0 +1,34 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0008_token_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedContent',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=30)),
+                ('body', models.CharField(max_length=300)),
+                ('summary', models.CharField(max_length=60)),
+                ('created_at', models.BigIntegerField(default=0)),
+                ('updated_at', models.BigIntegerField(default=0)),
+                ('archived_at', models.BigIntegerField(default=0)),
+                ('categories', models.ManyToManyField(related_name='archived_contents', to='api.Category')),
+                ('pdf_blob', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_contents', to='api.pdfblob')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_contents', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+import utilities.model_fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_archived_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ContentRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_id', models.IntegerField()),
+                ('number', models.PositiveIntegerField()),
+                ('user_id', models.IntegerField()),
+                ('created_at', models.BigIntegerField()),
+                ('is_snapshot', models.BooleanField(default=False)),
+                ('changed_fields', models.CharField(max_length=50)),
+                ('data', utilities.model_fields.CompressedTextField()),
+                ('pdf_blob', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='revisions', to='api.pdfblob')),
+            ],
+            options={
+                'unique_together': {('content_id', 'number')},
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import migrations
+
+# (app label, model name, column) searched by admin changelists and autocomplete with istartswith
+SEARCHED_COLUMNS = [
+    ('api', 'Category', 'title'),
+    (*settings.AUTH_USER_MODEL.split('.'), 'username'),
+]
+
+
+def get_index_name(table, column):
+    return f'{table}_{column}_ci_idx'
+
+
+def create_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+
+    for app_label, model_name, column in SEARCHED_COLUMNS:
+        table = apps.get_model(app_label, model_name)._meta.db_table
+        name = get_index_name(table, column)
+
+        # indexes matching the expression of istartswith, a case sensitive index can't serve it
+        if connection.vendor == 'sqlite':
+            # LIKE is case insensitive, it is served by a NOCASE index
+            expression = f'"{column}" COLLATE NOCASE'
+        elif connection.vendor == 'postgresql':
+            expression = f'UPPER("{column}"::text) text_pattern_ops'
+        else:
+            continue
+
+        schema_editor.execute(f'CREATE INDEX "{name}" ON "{table}" ({expression})')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+
+    for app_label, model_name, column in SEARCHED_COLUMNS:
+        table = apps.get_model(app_label, model_name)._meta.db_table
+
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{get_index_name(table, column)}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0010_content_revisions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,7 +1,17 @@
 from django.db import transaction
 
+from utilities.db_utilities import DatabaseUtilities
+
 
 class TransactionMixin(object):
+
+    # requests with these methods write, their transaction takes the write lock up front
+    write_methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+
     def dispatch(self, request, *args, **kwargs):
+        if request.method in self.write_methods:
+            with DatabaseUtilities.immediate_atomic():
+                return super(TransactionMixin, self).dispatch(request, *args, **kwargs)
+
         with transaction.atomic():
             return super(TransactionMixin, self).dispatch(request, *args, **kwargs)
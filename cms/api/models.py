@@ -1,13 +1,26 @@
+import hashlib
+import json
+import threading
 import time
+from collections import Counter
 
-from django.db import models
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Q, Subquery, Value
+from django.db.models.functions import Greatest, Lower, StrIndex, Substr
 from django.contrib.auth.models import User
 
 from rest_framework import status as status_codes
+from rest_framework.authtoken.models import Token
 
 from .field_validators import validate_pincode, validate_phone_no
+from .indexes import category_index
 
+from utilities.cache_utilities import invalidation_bus
+from utilities.delta_utilities import DeltaUtilities
 from utilities.exception_utilities import InvalidUserException, InvalidContentException, CustomException
+from utilities.model_fields import CompressedTextField
 
 
 # Create your models here.
@@ -57,7 +70,7 @@ User.add_to_class("get_user_by_email_or_none", get_user_by_email_or_none)
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    address = models.TextField(blank=True)
+    address = CompressedTextField(blank=True)
     phone_no = models.BigIntegerField(null=False,
                                       validators=[
                                           validate_phone_no
@@ -121,35 +134,298 @@ class Category(models.Model):
         return self.title
 
 
+class PdfBlob(models.Model):
+    """
+    pdf data of contents, stored once per distinct data and keyed by its sha256 digest
+    ref_count is the number of contents referencing the blob, blobs no longer referenced
+    are deleted by the collect_pdf_blobs command
+    """
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    data = CompressedTextField()
+    ref_count = models.IntegerField(default=0)
+    created_at = models.BigIntegerField(default=0)
+
+    def save(self, *args, **kwargs):
+        if self.created_at == 0:
+            self.created_at = time.time()
+
+        super(PdfBlob, self).save(*args, **kwargs)
+
+    @staticmethod
+    def get_digest(data) -> str:
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    @staticmethod
+    def acquire(digest, data):
+        """
+        adds a reference to the blob of data, the blob is created if no content has the same data
+        """
+        updated = PdfBlob.objects.filter(pk=digest).update(ref_count=F('ref_count') + 1)
+
+        if not updated:
+            PdfBlob.objects.get_or_create(digest=digest, defaults={'data': data})
+            PdfBlob.objects.filter(pk=digest).update(ref_count=F('ref_count') + 1)
+
+    @staticmethod
+    def release(digest):
+        PdfBlob.objects.filter(pk=digest).update(ref_count=F('ref_count') - 1)
+
+
+class ContentQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """
+        loads user, pdf and categories along with contents,
+        so that serializing a page does not query once per content
+        """
+        return self.select_related('user', 'pdf_blob').prefetch_related('categories')
+
+    def with_fields(self, fields):
+        """
+        loads only the columns needed to serialize given fields,
+        user and categories are fetched only when requested
+        """
+        related_fields = ('user', 'pdf', 'categories')
+
+        # user_id and timestamps are always loaded, they are needed for permission checks and sorting
+        columns = ['id', 'user', 'created_at', 'updated_at']
+        columns += [field for field in fields if field not in related_fields and field not in columns]
+
+        if 'pdf' in fields:
+            columns.append('pdf_blob')
+
+        queryset = self.only(*columns)
+
+        if 'user' in fields:
+            queryset = queryset.select_related('user')
+
+        if 'pdf' in fields:
+            queryset = queryset.select_related('pdf_blob')
+
+        if 'categories' in fields:
+            queryset = queryset.prefetch_related('categories')
+
+        return queryset
+
+    def with_snippets(self, search, length):
+        """
+        annotates snippet, a window of at most length characters of body around the first match of search
+        (start of body if body does not match), the window is cut by the database so bodies are never loaded
+        """
+        if search:
+            # LOWER of SQLite folds ASCII letters only, as LIKE of the search filter does,
+            # highlights are found in python (see ContentSnippetSerializer)
+            position = StrIndex(Lower('body'), Value(search.lower()))
+        else:
+            position = Value(0, output_field=models.IntegerField())
+
+        # a quarter of the window is kept before the match, for context
+        start = Greatest(position - length // 4, Value(1), output_field=models.IntegerField())
+
+        return self.annotate(snippet=Substr('body', start, length, output_field=models.TextField()))
+
+
 class Content(models.Model):
 
     class Meta:
         ordering = ['-id']
+        indexes = [
+            # change feed lookups, time range filters and sorting
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['created_at']),
+            models.Index(fields=['user', 'created_at']),
+        ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=30, null=False)
     body = models.CharField(max_length=300, null=False)
     summary = models.CharField(max_length=60, null=False)
-    pdf = models.TextField(null=False)
+    # pdf data is shared by contents having the same pdf, read and assigned through pdf
+    pdf_blob = models.ForeignKey(PdfBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='contents')
     categories = models.ManyToManyField(Category)
 
     created_at = models.BigIntegerField(default=0)
     updated_at = models.BigIntegerField(default=0)
+    # number of the last ContentRevision, 0 for contents saved before revisions were recorded
+    revision = models.PositiveIntegerField(default=0)
+
+    objects = ContentQuerySet.as_manager()
+
+    # pdf assigned since the content was loaded, and its digest
+    _pdf = None
+    _pdf_digest = None
+    _pdf_assigned = False
+
+    @property
+    def pdf(self):
+        if self._pdf_assigned:
+            return self._pdf
+
+        return self.pdf_blob.data if self.pdf_blob_id is not None else ''
+
+    @pdf.setter
+    def pdf(self, value):
+        self._pdf = value
+        self._pdf_digest = PdfBlob.get_digest(value) if value else None
+        self._pdf_assigned = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Content, cls).from_db(db, field_names, values)
+
+        # remember loaded values, to detect which fields are modified
+        instance._loaded_values = dict(zip(field_names, values))
+
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super(Content, self).refresh_from_db(using=using, fields=fields)
+
+        # reloaded values are the new baseline of change detection, unsaved changes of those fields are discarded
+        if fields is None:
+            attnames = [field.attname for field in self._meta.concrete_fields if field.attname in self.__dict__]
+        else:
+            attnames = [self._meta.get_field(field).attname for field in fields]
+
+        self._loaded_values = dict(getattr(self, '_loaded_values', {}),
+                                   **{attname: getattr(self, attname) for attname in attnames})
+
+        if 'pdf_blob_id' in attnames:
+            self._pdf = None
+            self._pdf_digest = None
+            self._pdf_assigned = False
+
+    def get_dirty_fields(self) -> list:
+        """
+        returns names of fields modified since the content was loaded or saved
+        every field is dirty for a content which is not saved yet
+        """
+        loaded_values = getattr(self, '_loaded_values', None)
+        fields = [field for field in self._meta.concrete_fields if not field.primary_key]
+
+        if self._state.adding or loaded_values is None:
+            return [field.name for field in fields]
+
+        dirty_fields = []
+
+        for field in fields:
+            if field.attname in loaded_values:
+                if getattr(self, field.attname) != loaded_values[field.attname]:
+                    dirty_fields.append(field.name)
+
+            elif field.attname in self.__dict__:
+                # deferred field which has been assigned
+                dirty_fields.append(field.name)
+
+        if self._pdf_assigned and self._pdf_digest != self.pdf_blob_id and 'pdf_blob' not in dirty_fields:
+            dirty_fields.append('pdf_blob')
+
+        return dirty_fields
+
+    def store_pdf(self):
+        """
+        points the content to the blob of the assigned pdf, moving its reference from the previous blob
+        """
+        if not self._pdf_assigned or self._pdf_digest == self.pdf_blob_id:
+            return
+
+        if self._pdf_digest is not None:
+            PdfBlob.acquire(self._pdf_digest, self._pdf)
+
+        if self.pdf_blob_id is not None and not self._state.adding:
+            PdfBlob.release(self.pdf_blob_id)
+
+        self.pdf_blob_id = self._pdf_digest
+
+    def get_previous_values(self, update_fields) -> dict:
+        """
+        returns values before this save of the modified versioned fields (see ContentRevision),
+        None for values which were not loaded
+        """
+        if update_fields is None:
+            # no versioned field compares modified
+            return {}
+
+        loaded_values = getattr(self, '_loaded_values', {})
+        previous_values = {field: loaded_values.get(field) for field in ('title', 'body', 'summary')
+                           if field in update_fields}
+
+        if 'pdf_blob' in update_fields:
+            digest = loaded_values.get('pdf_blob_id')
+            # the blob is joined by get_content_with_id_or_raise_exception
+            previous_blob = Content.pdf_blob.field.get_cached_value(self, default=None)
+
+            if digest is None:
+                previous_values['pdf'] = ''
+            elif previous_blob is not None and previous_blob.pk == digest:
+                previous_values['pdf'] = str(previous_blob.data)
+            else:
+                data = PdfBlob.objects.filter(pk=digest).values_list('data', flat=True).first()
+                previous_values['pdf'] = str(data) if data is not None else None
+
+        return previous_values
 
     def save(self, *args, **kwargs):
         current_time = time.time()
+        # user making the change, recorded with the revision (the owner by default)
+        revision_user_id = kwargs.pop('revision_user_id', None)
+        adding = self._state.adding
+
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            dirty_fields = self.get_dirty_fields()
+
+            # write only modified columns, every column if none compares modified: the row may have changed since
+            # it was loaded, skipping clean contents is up to callers (see UserContentView.update_content)
+            if dirty_fields:
+                kwargs['update_fields'] = dirty_fields
+
+        if kwargs.get('update_fields') is not None and 'updated_at' not in kwargs['update_fields']:
+            kwargs['update_fields'] = list(kwargs['update_fields']) + ['updated_at']
 
         if self.created_at == 0:
             self.created_at = current_time
 
         self.updated_at = current_time
 
+        previous_values = None if adding else self.get_previous_values(kwargs.get('update_fields'))
+        # revision the loaded values belong to
+        previous_number = self.revision
+
+        # the next number is written with the content, contents saved before revisions were recorded start their
+        # history with a snapshot of their previous version (see ContentRevision.record)
+        if adding:
+            self.revision = 1
+        elif previous_values:
+            self.revision = self.revision + 1 if self.revision else 2
+            kwargs['update_fields'] = list(kwargs['update_fields']) + ['revision']
+
+        if kwargs.get('update_fields') is None or 'pdf_blob' in kwargs['update_fields']:
+            self.store_pdf()
+
         super(Content, self).save(*args, **kwargs)
 
+        # writes of every column may overwrite changes made since the content was loaded, they are recorded too
+        if adding or previous_values or kwargs.get('update_fields') is None:
+            ContentRevision.record(self, previous_values, previous_number, user_id=revision_user_id)
+
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+
+    def touch(self):
+        """
+        bumps updated_at only, for changes outside of content columns (e.g. categories)
+        """
+        self.save(update_fields=['updated_at'])
+
     @staticmethod
     def get_content_with_id_or_raise_exception(content_id):
         try:
-            return Content.objects.get(pk=content_id)
+            # pdf is joined, edited contents are serialized whole
+            return Content.objects.select_related('pdf_blob').get(pk=content_id)
         except:
             response = {
                 'success': False,
@@ -164,10 +440,36 @@ class Content(models.Model):
         except:
             return None
 
-    def validate_date_and_raise_exception(self):
+    def clean_fields(self, exclude=None):
+        """
+        validates pdf as the required text field it is for clients, the blob itself is set on save
+        """
+        exclude = list(exclude or [])
+        errors = {}
 
         try:
-            self.full_clean()
+            super(Content, self).clean_fields(exclude=exclude + ['pdf_blob'])
+        except ValidationError as e:
+            errors = e.error_dict
+
+        if 'pdf_blob' not in exclude and not self.pdf:
+            errors['pdf'] = [ValidationError('This field cannot be blank.', code='blank')]
+
+        if errors:
+            raise ValidationError(errors)
+
+    def validate_date_and_raise_exception(self, fields=None, exclude=None):
+        """
+        validates the content, only given fields if fields is not None
+        unique checks are skipped when validating given fields, content has no unique column besides id
+        """
+        exclude = list(exclude or [])
+
+        if fields is not None:
+            exclude += [field.name for field in self._meta.concrete_fields if field.name not in fields]
+
+        try:
+            self.full_clean(exclude=exclude, validate_unique=fields is None)
 
         except Exception as e:
             response = {
@@ -175,3 +477,473 @@ class Content(models.Model):
                 "error": e.args[0]
             }
             raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+
+class ArchivedContent(models.Model):
+    """
+    content moved out of the content table by the archive_contents command, so that the content table
+    and its indexes only hold recent contents
+    keeps id, columns and categories of the content and its reference on the pdf blob, it is read only
+    """
+
+    class Meta:
+        ordering = ['-id']
+
+    # id of the content, content ids are never reused
+    id = models.IntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_contents')
+    title = models.CharField(max_length=30)
+    body = models.CharField(max_length=300)
+    summary = models.CharField(max_length=60)
+    pdf_blob = models.ForeignKey(PdfBlob, on_delete=models.PROTECT, null=True, blank=True,
+                                 related_name='archived_contents')
+    categories = models.ManyToManyField(Category, related_name='archived_contents')
+
+    created_at = models.BigIntegerField(default=0)
+    updated_at = models.BigIntegerField(default=0)
+    archived_at = models.BigIntegerField(default=0)
+
+    objects = ContentQuerySet.as_manager()
+
+    # set while a thread deletes the contents it moved to the archive
+    archiving = threading.local()
+
+    @property
+    def pdf(self):
+        return self.pdf_blob.data if self.pdf_blob_id is not None else ''
+
+    @staticmethod
+    def is_archiving() -> bool:
+        """
+        whether contents deleted now by this thread are moved to the archive,
+        post_delete receivers of Content skip them, they are not deletions
+        """
+        return getattr(ArchivedContent.archiving, 'active', False)
+
+    @staticmethod
+    def archive(contents):
+        """
+        moves given contents (with their category links) to the archive, call it in a transaction
+        archiving is not a deletion: no tombstone is written and pdf references move with the contents
+        """
+        current_time = time.time()
+        content_ids = [content.id for content in contents]
+
+        ArchivedContent.objects.bulk_create([
+            ArchivedContent(id=content.id, user_id=content.user_id, title=content.title, body=content.body,
+                            summary=content.summary, pdf_blob_id=content.pdf_blob_id, created_at=content.created_at,
+                            updated_at=content.updated_at, archived_at=current_time)
+            for content in contents
+        ])
+
+        links = list(Content.categories.through.objects.filter(content_id__in=content_ids)
+                     .values_list('content_id', 'category_id'))
+
+        ArchivedContent.categories.through.objects.bulk_create([
+            ArchivedContent.categories.through(archivedcontent_id=content_id, category_id=category_id)
+            for content_id, category_id in links
+        ])
+
+        # deletes category links too, counters are adjusted below for all the contents at once
+        ArchivedContent.archiving.active = True
+
+        try:
+            Content.objects.filter(pk__in=content_ids).delete()
+        finally:
+            ArchivedContent.archiving.active = False
+
+        # links are deleted without m2m_changed, category usage counts links of the content table only
+        usages = Counter(category_id for _, category_id in links)
+
+        def remove_usage():
+            for category_id, usage in usages.items():
+                category_index.add_usage(category_id, -usage)
+
+        transaction.on_commit(remove_usage)
+
+        archived_per_user = {}
+
+        for content in contents:
+            archived_per_user[content.user_id] = archived_per_user.get(content.user_id, 0) + 1
+
+        for user_id, archived in archived_per_user.items():
+            ContentCounter.increment(user_id, delta=-archived)
+
+        # archived contents are dropped from every cache
+        invalidation_bus.publish('content')
+
+
+class ContentCounter(models.Model):
+    """
+    keeps running totals of contents, globally and per user,
+    so that pagination does not have to run COUNT(*) on every request
+    """
+
+    GLOBAL_SCOPE = 'global'
+
+    scope = models.CharField(max_length=50, unique=True)
+    count = models.BigIntegerField(default=0)
+
+    @staticmethod
+    def get_scope(user_id=None):
+        return ContentCounter.GLOBAL_SCOPE if user_id is None else f'user:{user_id}'
+
+    @staticmethod
+    def increment(user_id, delta=1):
+        """
+        atomically adds delta to the global counter and to the counter of given user
+        """
+        for scope in (ContentCounter.GLOBAL_SCOPE, ContentCounter.get_scope(user_id)):
+            updated = ContentCounter.objects.filter(scope=scope).update(count=F('count') + delta)
+
+            if not updated:
+                ContentCounter.objects.get_or_create(scope=scope)
+                ContentCounter.objects.filter(scope=scope).update(count=F('count') + delta)
+
+    @staticmethod
+    def get_count_or_none(user_id=None):
+        """
+        returns the stored count for user (or global count if user_id is None),
+        None if the counter has not been created yet
+        """
+        scope = ContentCounter.get_scope(user_id)
+
+        return ContentCounter.objects.filter(scope=scope).values_list('count', flat=True).first()
+
+
+class ContentTombstone(models.Model):
+    """
+    compact record of a deleted content, served by the change feed
+    until it is older than the retention period
+    """
+
+    content_id = models.IntegerField()
+    user_id = models.IntegerField()
+    deleted_at = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at']),
+            models.Index(fields=['user_id', 'deleted_at']),
+        ]
+
+
+class ContentRevision(models.Model):
+    """
+    version of title, body, summary and pdf of a content, recorded on every save modifying them
+    every CONTENT_REVISION_SNAPSHOT_INTERVAL revisions is a snapshot holding whole values (the pdf by reference
+    to its blob), the others hold deltas against the previous revision of the modified fields only
+    a save from an instance loaded before another save of the content records the row whole,
+    writes bypassing Content.save (e.g. queryset updates) are not recorded
+    """
+
+    versioned_fields = ('title', 'body', 'summary', 'pdf')
+
+    content_id = models.IntegerField()
+    number = models.PositiveIntegerField()
+    user_id = models.IntegerField()
+    created_at = models.BigIntegerField()
+    is_snapshot = models.BooleanField(default=False)
+    # comma separated names of fields modified by the revision, listed without reading data
+    changed_fields = models.CharField(max_length=50)
+    # json of field values for snapshots, of field deltas (see DeltaUtilities) otherwise
+    data = CompressedTextField()
+    pdf_blob = models.ForeignKey(PdfBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='revisions')
+
+    class Meta:
+        unique_together = ('content_id', 'number')
+
+    @staticmethod
+    def record(content, previous_values, previous_number=0, user_id=None):
+        """
+        records saved values of content as its revision content.revision,
+        previous_values are values of modified fields before the save (None for a new content),
+        loaded at revision previous_number
+        """
+        user_id = user_id or content.user_id
+
+        if previous_values is None:
+            ContentRevision.create_snapshot(content, content.revision, user_id, ContentRevision.versioned_fields)
+            return
+
+        # read after the content row is written, saves of the content are serialized by its row lock
+        last_number = ContentRevision.objects.filter(content_id=content.pk).order_by('-number') \
+            .values_list('number', flat=True).first() or 0
+
+        if last_number != previous_number:
+            # the content was saved since it was loaded, deltas against the loaded values would not apply
+            # to the last revision
+            ContentRevision.record_row(content, last_number + 1, user_id)
+            return
+
+        if not previous_values:
+            return
+
+        if last_number == 0:
+            # content saved before revisions were recorded, its history starts with the version before this save
+            ContentRevision.create_snapshot(content, 1, content.user_id, ContentRevision.versioned_fields,
+                                            previous_values)
+
+        number = content.revision
+        changed_fields = tuple(previous_values)
+
+        if (number - 1) % settings.CONTENT_REVISION_SNAPSHOT_INTERVAL == 0:
+            ContentRevision.create_snapshot(content, number, user_id, changed_fields)
+            return
+
+        data = {field: DeltaUtilities.get_delta(previous_value, getattr(content, field),
+                                                settings.CONTENT_REVISION_DELTA_MAX_WORDS)
+                for field, previous_value in previous_values.items()}
+
+        ContentRevision.objects.create(content_id=content.pk, number=number, user_id=user_id,
+                                       created_at=content.updated_at, changed_fields=','.join(changed_fields),
+                                       data=json.dumps(data, separators=(',', ':')))
+
+    @staticmethod
+    def record_row(content, number, user_id):
+        """
+        records the content row as snapshot number, the instance takes versioned values and number of the row
+        """
+        row = Content.objects.filter(pk=content.pk).values('title', 'body', 'summary', 'pdf_blob_id').get()
+
+        for attname, value in row.items():
+            setattr(content, attname, value)
+
+        if content.revision != number:
+            Content.objects.filter(pk=content.pk).update(revision=number)
+            content.revision = number
+
+        ContentRevision.create_snapshot(content, number, user_id, ContentRevision.versioned_fields)
+
+    @staticmethod
+    def create_snapshot(content, number, user_id, changed_fields, previous_values=None):
+        """
+        snapshot of saved values of content, or of its values before the save if previous_values are given
+        """
+        values = {field: str(getattr(content, field)) for field in ('title', 'body', 'summary')}
+        pdf_digest = content.pdf_blob_id
+        created_at = content.updated_at
+
+        if previous_values is not None:
+            values.update((field, previous_values[field]) for field in values
+                          if previous_values.get(field) is not None)
+
+            if previous_values.get('pdf') is not None:
+                pdf_digest = PdfBlob.get_digest(previous_values['pdf']) if previous_values['pdf'] else None
+
+            created_at = getattr(content, '_loaded_values', {}).get('updated_at') or content.created_at
+
+        if pdf_digest is not None:
+            # the blob exists, it is the pdf of the content now or just before this save
+            PdfBlob.objects.filter(pk=pdf_digest).update(ref_count=F('ref_count') + 1)
+
+        ContentRevision.objects.create(content_id=content.pk, number=number, user_id=user_id, created_at=created_at,
+                                       is_snapshot=True, changed_fields=','.join(changed_fields),
+                                       data=json.dumps(values, separators=(',', ':')), pdf_blob_id=pdf_digest)
+
+    @staticmethod
+    def get_version(content_id, number):
+        """
+        returns values of versioned fields of content at revision number, None if there is no such revision
+        reads the closest snapshot at or before number and the revisions after it in one query
+        """
+        revisions = ContentRevision.objects.filter(content_id=content_id, number__lte=number)
+        snapshot_number = revisions.filter(is_snapshot=True).order_by('-number').values('number')[:1]
+        chain = list(revisions.filter(number__gte=Subquery(snapshot_number))
+                     .select_related('pdf_blob').order_by('number'))
+
+        if not chain or chain[-1].number != number:
+            return None
+
+        values = json.loads(str(chain[0].data))
+        values['pdf'] = str(chain[0].pdf_blob.data) if chain[0].pdf_blob_id is not None else ''
+        deltas = {field: [] for field in values}
+
+        for revision in chain[1:]:
+            for field, delta in json.loads(str(revision.data)).items():
+                deltas[field].append(delta)
+
+        for field, field_deltas in deltas.items():
+            if field_deltas:
+                values[field] = DeltaUtilities.apply_deltas(values[field], field_deltas)
+
+        values.update(number=number, user_id=chain[-1].user_id, created_at=chain[-1].created_at)
+
+        return values
+
+
+class BulkDeleteJob(models.Model):
+    """
+    queued deletion of contents of a user, a category or older than a time,
+    processed in small batches with short transactions by the run_bulk_delete_jobs command
+    """
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    requested_by = models.ForeignKey(User, null=True, on_delete=models.SET_NULL, related_name='+')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+
+    # filters, contents matching all of the given filters are deleted
+    target_user_id = models.IntegerField(null=True, blank=True)
+    category_id = models.IntegerField(null=True, blank=True)
+    older_than = models.BigIntegerField(null=True, blank=True)
+
+    total = models.IntegerField(default=0)
+    deleted = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True)
+
+    created_at = models.BigIntegerField(default=0)
+    updated_at = models.BigIntegerField(default=0)
+
+    def save(self, *args, **kwargs):
+        current_time = time.time()
+
+        if self.created_at == 0:
+            self.created_at = current_time
+
+        self.updated_at = current_time
+
+        super(BulkDeleteJob, self).save(*args, **kwargs)
+
+    @staticmethod
+    def get_claimable():
+        """
+        returns queryset of queued jobs and of running jobs whose worker stopped reporting progress
+        (crashed or killed) for BULK_DELETE_CLAIM_TIMEOUT seconds
+        """
+        stale_before = time.time() - settings.BULK_DELETE_CLAIM_TIMEOUT
+
+        return BulkDeleteJob.objects.filter(Q(status=BulkDeleteJob.STATUS_QUEUED) |
+                                            Q(status=BulkDeleteJob.STATUS_RUNNING, updated_at__lt=stale_before))
+
+    def get_contents(self, model=Content):
+        """
+        returns queryset of contents of model (Content or ArchivedContent) matching the job filters
+        """
+        contents = model.objects.all()
+
+        if self.target_user_id is not None:
+            contents = contents.filter(user_id=self.target_user_id)
+
+        if self.category_id is not None:
+            contents = contents.filter(categories__id=self.category_id)
+
+        if self.older_than is not None:
+            contents = contents.filter(created_at__lt=self.older_than)
+
+        return contents
+
+    def claim(self) -> bool:
+        """
+        marks a claimable job as running, returns False if another worker claimed it first
+        """
+        total = sum(self.get_contents(model).count() for model in (Content, ArchivedContent))
+
+        # updated_at is matched too, two workers reclaiming a stale job can't both succeed,
+        # progress of a reclaimed job restarts from the contents left
+        claimed = BulkDeleteJob.get_claimable().filter(pk=self.pk, updated_at=self.updated_at) \
+            .update(status=BulkDeleteJob.STATUS_RUNNING, total=total, deleted=0, updated_at=time.time())
+
+        self.refresh_from_db()
+
+        return claimed == 1
+
+    def run(self, batch_size=200, pause=0.1):
+        """
+        deletes matching contents batch by batch, each batch in its own short transaction,
+        sleeping between batches so that other readers and writers get the database
+        every batch refreshes updated_at, which keeps the job claimed
+        """
+        try:
+            for model in (Content, ArchivedContent):
+                while True:
+                    with transaction.atomic():
+                        content_ids = list(self.get_contents(model).order_by('id')
+                                           .values_list('id', flat=True)[:batch_size])
+
+                        if not content_ids:
+                            break
+
+                        deleted, deleted_per_model = model.objects.filter(pk__in=content_ids).delete()
+
+                        BulkDeleteJob.objects.filter(pk=self.pk).update(
+                            deleted=F('deleted') + deleted_per_model.get(model._meta.label, 0),
+                            updated_at=time.time()
+                        )
+
+                    time.sleep(pause)
+
+        except Exception as e:
+            BulkDeleteJob.objects.filter(pk=self.pk).update(status=BulkDeleteJob.STATUS_FAILED,
+                                                            error_message=str(e),
+                                                            updated_at=time.time())
+            raise
+
+        BulkDeleteJob.objects.filter(pk=self.pk).update(status=BulkDeleteJob.STATUS_COMPLETED,
+                                                        updated_at=time.time())
+        self.refresh_from_db()
+
+
+class TokenActivity(models.Model):
+    """
+    creation and last use of an auth token, tokens expire TOKEN_MAX_AGE seconds after creation
+    or TOKEN_IDLE_TIMEOUT seconds after last use
+    last_used is written at most once per TOKEN_LAST_USED_RESOLUTION seconds (see TokenUsageRecorder)
+    """
+
+    token = models.OneToOneField(Token, primary_key=True, on_delete=models.CASCADE, related_name='activity')
+    created_at = models.BigIntegerField(default=0, db_index=True)
+    last_used = models.BigIntegerField(default=0, db_index=True)
+
+    @staticmethod
+    def get_expired_token_keys(limit, current_time=None) -> list:
+        """
+        returns keys of up to limit expired tokens, selected through the created_at and last_used indexes
+        tokens without activity are not returned, see create_missing
+        """
+        current_time = time.time() if current_time is None else current_time
+        activities = TokenActivity.objects.order_by()
+
+        keys = set(activities.filter(created_at__lt=current_time - settings.TOKEN_MAX_AGE)
+                   .values_list('token_id', flat=True)[:limit])
+        keys.update(activities.filter(last_used__lt=current_time - settings.TOKEN_IDLE_TIMEOUT)
+                    .values_list('token_id', flat=True)[:limit])
+
+        return list(keys)[:limit]
+
+    @staticmethod
+    def create_missing():
+        """
+        creates activity of tokens which have none (not created through get_user_token, e.g. in the admin),
+        they count as last used when they were created, as in is_expired
+        scans the token table, it is run once per purge rather than per batch
+        """
+        keys = Token.objects.filter(activity=None).values_list('key', 'created')
+
+        TokenActivity.objects.bulk_create(
+            [TokenActivity(token_id=key, created_at=created.timestamp(), last_used=created.timestamp())
+             for key, created in keys.iterator()],
+            batch_size=500, ignore_conflicts=True
+        )
+
+    @staticmethod
+    def is_expired(token, current_time=None) -> bool:
+        current_time = time.time() if current_time is None else current_time
+
+        try:
+            created_at, last_used = token.activity.created_at, token.activity.last_used
+        except TokenActivity.DoesNotExist:
+            created_at = last_used = token.created.timestamp()
+
+        return created_at < current_time - settings.TOKEN_MAX_AGE or \
+            last_used < current_time - settings.TOKEN_IDLE_TIMEOUT
@@ -1,7 +1,7 @@
 import json
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Profile, Content, Category
+from .models import Profile, Content, Category, ContentRevision, BulkDeleteJob
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -39,10 +39,100 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class ContentSerializer(serializers.ModelSerializer):
+    """
+    accepts an optional fields argument, to serialize only a subset of fields
+    """
 
     user = UserSerializer()
     categories = CategorySerializer(many=True)
+    pdf = serializers.CharField()
 
     class Meta:
         model = Content
+        fields = ("id", "user", "categories", "title", "body", "summary", "pdf", "created_at", "updated_at")
+
+    def __init__(self, *args, **kwargs):
+        self.field_subset = kwargs.pop('fields', None)
+
+        super(ContentSerializer, self).__init__(*args, **kwargs)
+
+    def get_field_names(self, declared_fields, info):
+        field_names = super(ContentSerializer, self).get_field_names(declared_fields, info)
+
+        # fields outside the subset are never built, instead of being built and dropped
+        if self.field_subset is not None:
+            field_names = [field_name for field_name in field_names if field_name in self.field_subset]
+
+        return field_names
+
+
+class ContentSnippetSerializer(serializers.ModelSerializer):
+    """
+    search hit, contents must be annotated with snippet (see ContentQuerySet.with_snippets)
+    highlights are [start, end) offsets of the search key in title and snippet, search key is taken from context
+    """
+
+    categories = CategorySerializer(many=True)
+    snippet = serializers.ReadOnlyField()
+    highlights = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Content
+        fields = ("id", "title", "categories", "snippet", "highlights")
+
+    def get_highlights(self, content):
+        search = self.context.get('search')
+
+        return {
+            'title': self.get_match_offsets(content.title, search),
+            'snippet': self.get_match_offsets(content.snippet, search)
+        }
+
+    @staticmethod
+    def get_match_offsets(text, search):
+        """
+        returns [start, end) offsets of case insensitive matches of search in text
+        a character may casefold to several ('ß' to 'ss', 'İ' to 'i̇'), offsets in the casefolded text
+        are mapped back to the characters of text they come from
+        """
+        if not text or not search:
+            return []
+
+        search = search.casefold()
+        folded_characters = []
+        # index in text of every character of the casefolded text
+        origins = []
+
+        for index, character in enumerate(text):
+            for folded_character in character.casefold():
+                folded_characters.append(folded_character)
+                origins.append(index)
+
+        folded = ''.join(folded_characters)
+        offsets = []
+        start = folded.find(search)
+
+        while start != -1:
+            end = start + len(search)
+            offsets.append([origins[start], origins[end - 1] + 1])
+            start = folded.find(search, end)
+
+        return offsets
+
+
+class BulkDeleteJobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = BulkDeleteJob
         fields = "__all__"
+
+
+class ContentRevisionSerializer(serializers.ModelSerializer):
+    changed_fields = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ContentRevision
+        fields = ("number", "user_id", "created_at", "is_snapshot", "changed_fields")
+
+    def get_changed_fields(self, revision):
+        return revision.changed_fields.split(',') if revision.changed_fields else []
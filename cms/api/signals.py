@@ -0,0 +1,141 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_usage_recorder
+from .indexes import category_index
+from .models import Profile, Category, Content, ArchivedContent, ContentCounter, ContentRevision, ContentTombstone, \
+    PdfBlob
+
+from utilities.cache_utilities import invalidation_bus
+
+
+@receiver(post_save, sender=Content)
+def increment_content_counters(sender, instance, created, **kwargs):
+    if created:
+        ContentCounter.increment(instance.user_id)
+
+
+@receiver(post_delete, sender=Content)
+def decrement_content_counters(sender, instance, **kwargs):
+    if ArchivedContent.is_archiving():
+        return
+
+    ContentCounter.increment(instance.user_id, delta=-1)
+
+
+@receiver(post_delete, sender=Content)
+@receiver(post_delete, sender=ArchivedContent)
+def create_content_tombstone(sender, instance, **kwargs):
+    if sender is Content and ArchivedContent.is_archiving():
+        return
+
+    ContentTombstone.objects.create(content_id=instance.id,
+                                    user_id=instance.user_id,
+                                    deleted_at=time.time())
+
+
+@receiver(post_delete, sender=Content)
+@receiver(post_delete, sender=ArchivedContent)
+def delete_content_revisions(sender, instance, **kwargs):
+    if sender is Content and ArchivedContent.is_archiving():
+        return
+
+    # revisions are only read through their content, their snapshots would keep pdf blobs alive
+    ContentRevision.objects.filter(content_id=instance.id).delete()
+
+
+@receiver(post_delete, sender=Content)
+@receiver(post_delete, sender=ArchivedContent)
+@receiver(post_delete, sender=ContentRevision)
+def release_pdf_blob(sender, instance, **kwargs):
+    # pdf references of archived contents move with them
+    if sender is Content and ArchivedContent.is_archiving():
+        return
+
+    if instance.pdf_blob_id is not None:
+        PdfBlob.release(instance.pdf_blob_id)
+
+
+@receiver(m2m_changed, sender=Content.categories.through)
+def update_category_usage(sender, instance, action, reverse, pk_set, **kwargs):
+    # clears and cascades are caught up by the periodic rebuild of the index
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    delta = 1 if action == 'post_add' else -1
+
+    if reverse:
+        usages = {instance.pk: delta * len(pk_set)}
+    else:
+        usages = {category_id: delta for category_id in pk_set}
+
+    def apply():
+        for category_id, usage in usages.items():
+            category_index.add_usage(category_id, usage)
+
+    transaction.on_commit(apply)
+
+
+# cache invalidation events, namespaced by model, keyed by object id
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def invalidate_content(sender, instance, **kwargs):
+    # archiving publishes one event for all of its contents
+    if ArchivedContent.is_archiving():
+        return
+
+    invalidation_bus.publish('content', instance.pk)
+
+
+@receiver(m2m_changed, sender=Content.categories.through)
+def invalidate_content_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        invalidation_bus.publish('content', instance.pk)
+
+    elif pk_set:
+        for content_id in pk_set:
+            invalidation_bus.publish('content', content_id)
+
+    else:
+        # categories cleared from the category side, affected contents are unknown
+        invalidation_bus.publish('content')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category(sender, instance, **kwargs):
+    invalidation_bus.publish('category', instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile(sender, instance, **kwargs):
+    invalidation_bus.publish('profile', instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    invalidation_bus.publish('user', instance.pk)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    invalidation_bus.publish('token', instance.key)
+
+
+@receiver(request_finished)
+def flush_token_usage(sender, **kwargs):
+    # after the response, out of the request transaction
+    token_usage_recorder.flush()
@@ -1,10 +1,70 @@
-from django.test import TestCase
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import BrokenExecutor, Future
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.admin import site as admin_site
+from django.core.management import call_command
+from django.db import DatabaseError, connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from django.test import Client, TestCase, TransactionTestCase, override_settings
 from django.core.exceptions import ValidationError
 
 # Create your tests here.
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from .models import Profile, Content
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .admin import CategoryAdmin, ContentAdmin
+from .authentication import token_usage_recorder
+from .fragments import content_fragment_cache
+from .indexes import category_index
+from .models import Profile, Category, Content, ArchivedContent, ContentCounter, ContentRevision, ContentTombstone, \
+    BulkDeleteJob, PdfBlob, TokenActivity
 from .field_validators import validate_password
+from .serializers import ContentSnippetSerializer
+from .views import ViewHelper
+
+from cms.startup import get_environment
+from cms.warmup import warm_up
+from utilities.db_utilities import DatabaseUtilities
+from utilities.delta_utilities import DeltaUtilities
+from utilities.exception_utilities import CustomException
+from utilities.cache_utilities import InvalidationBus, InvalidatedCache, LruByteCache, invalidation_bus
+from utilities.model_fields import CompressedText, CompressedTextField
+from utilities.models import InvalidationEvent
+from utilities.password_utilities import PasswordHasherPool, password_hasher_pool
+from utilities.pagination_utilities import PaginationUtilities
+from utilities.query_log_utilities import SlowQueryLog, slow_query_log
+
+
+@contextmanager
+def run_on_commit_callbacks():
+    """
+    runs on_commit callbacks registered in the block when it exits, as a commit would,
+    test transactions are never committed
+    """
+    # invalidation events left pending by rolled back test transactions, sqlite reuses their ids
+    invalidation_bus.get_pending().clear()
+    callbacks = []
+
+    with mock.patch('django.db.transaction.on_commit', side_effect=callbacks.append):
+        yield
+
+        while callbacks:
+            callbacks.pop(0)()
 
 
 class UserProfileCreateTest(TestCase):
@@ -126,3 +186,1675 @@ class UserContentCreateTest(TestCase):
             content.full_clean()
 
             content.save()
+
+
+class ContentCounterTest(TestCase):
+    """ Test module for content counters """
+
+    email = "mahesh@gmail.com"
+    username = "maheshroyal"
+
+    def setUp(self):
+        self.user = User.objects.create(username=self.username, email=self.email)
+
+    def create_content(self, title='title'):
+        return Content.objects.create(user=self.user, title=title, body='body', summary='summary', pdf='pdf')
+
+    def test_counters_follow_create_and_delete(self):
+        first = self.create_content()
+        self.create_content()
+
+        self.assertEqual(ContentCounter.get_count_or_none(), 2)
+        self.assertEqual(ContentCounter.get_count_or_none(self.user.id), 2)
+
+        first.delete()
+
+        self.assertEqual(ContentCounter.get_count_or_none(), 1)
+        self.assertEqual(ContentCounter.get_count_or_none(self.user.id), 1)
+
+        # updates must not change the counters
+        Content.objects.get().save()
+        self.assertEqual(ContentCounter.get_count_or_none(self.user.id), 1)
+
+    def test_pagination_uses_counter(self):
+        for index in range(3):
+            self.create_content(f'title {index}')
+
+        contents = Content.objects.filter(user=self.user)
+        count = ContentCounter.get_count_or_none(self.user.id)
+
+        # only the page query is executed, no COUNT(*)
+        with self.assertNumQueries(1):
+            page = PaginationUtilities.paginate_results(contents, 2, 2, count=count)
+            self.assertEqual(len(page), 1)
+
+        self.assertEqual(PaginationUtilities.paginate_results(contents, 3, 2, count=count), [])
+
+
+class ContentBatchFetchTest(TestCase):
+    """ Test module for fetching multiple contents by id """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        self.other_user = User.objects.create(username='other', email='other@gmail.com')
+
+        self.own_content = Content.objects.create(user=self.user, title='own', body='body',
+                                                  summary='summary', pdf='pdf')
+        self.other_content = Content.objects.create(user=self.other_user, title='other', body='body',
+                                                    summary='summary', pdf='pdf')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_batch_fetch_preserves_order_and_reports_per_item(self):
+        missing_id = self.other_content.id + 100
+        content_ids = f'{missing_id},{self.other_content.id},{self.own_content.id}'
+
+        response = self.client.get('/api/content', {'content_ids': content_ids})
+        contents = response.json()['contents']
+
+        self.assertEqual([content['id'] for content in contents],
+                         [missing_id, self.other_content.id, self.own_content.id])
+        self.assertEqual([content['success'] for content in contents], [False, False, True])
+        self.assertEqual(contents[2]['content']['title'], 'own')
+
+    def test_batch_fetch_is_capped(self):
+        content_ids = ','.join(str(content_id) for content_id in range(1, 200))
+
+        response = self.client.get('/api/content', {'content_ids': content_ids})
+
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CONTENT_CHANGES_SETTLE_TIME=0)
+class ContentChangesTest(TestCase):
+    """ Test module for the content change feed """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_content(self, updated_at):
+        content = Content.objects.create(user=self.user, title='title', body='body', summary='summary', pdf='pdf')
+        Content.objects.filter(pk=content.pk).update(updated_at=updated_at)
+
+        return content
+
+    def test_changes_since_watermark_include_tombstones(self):
+        now = int(time.time())
+
+        old_content = self.create_content(now - 100)
+        new_content = self.create_content(now - 10)
+        deleted_content = self.create_content(now - 100)
+        deleted_content_id = deleted_content.id
+        deleted_content.delete()
+
+        response = self.client.get('/api/content/changes', {'since': now - 50}).json()
+
+        self.assertFalse(response['full_resync'])
+        self.assertFalse(response['has_more'])
+        self.assertEqual([content['id'] for content in response['contents']], [new_content.id])
+        self.assertEqual(response['deleted'], [deleted_content_id])
+
+        # nothing changed after the new watermark
+        response = self.client.get('/api/content/changes', {'since': response['watermark']}).json()
+        self.assertEqual(response['contents'], [])
+        self.assertEqual(response['deleted'], [])
+
+        # initial sync sees every content
+        response = self.client.get('/api/content/changes').json()
+        self.assertEqual({content['id'] for content in response['contents']}, {old_content.id, new_content.id})
+
+    def test_changes_are_paged_at_second_boundaries(self):
+        now = int(time.time())
+
+        first = self.create_content(now - 30)
+        self.create_content(now - 20)
+        self.create_content(now - 20)
+
+        response = self.client.get('/api/content/changes', {'since': 0, 'limit': 2}).json()
+
+        self.assertTrue(response['has_more'])
+        self.assertEqual([content['id'] for content in response['contents']], [first.id])
+
+        response = self.client.get('/api/content/changes', {'since': response['watermark'], 'limit': 2}).json()
+
+        self.assertFalse(response['has_more'])
+        self.assertEqual(len(response['contents']), 2)
+
+    def test_expired_watermark_requires_full_resync(self):
+        since = int(time.time()) - settings.CONTENT_TOMBSTONE_RETENTION - 1
+
+        response = self.client.get('/api/content/changes', {'since': since}).json()
+
+        self.assertTrue(response['full_resync'])
+
+
+class BulkDeleteJobTest(TestCase):
+    """ Test module for batched bulk deletion """
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', email='admin@gmail.com', is_superuser=True)
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        self.other_user = User.objects.create(username='other', email='other@gmail.com')
+
+        for index in range(5):
+            Content.objects.create(user=self.user, title=f'title {index}', body='body', summary='summary', pdf='pdf')
+
+        Content.objects.create(user=self.other_user, title='other', body='body', summary='summary', pdf='pdf')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_job_deletes_in_batches_and_reports_progress(self):
+        response = self.client.post('/api/content/bulk_delete', {'user_id': self.user.id}).json()
+        job_id = response['job']['id']
+
+        self.assertEqual(response['job']['status'], BulkDeleteJob.STATUS_QUEUED)
+
+        call_command('run_bulk_delete_jobs', batch_size=2, pause=0, stdout=StringIO())
+
+        job = self.client.get('/api/content/bulk_delete', {'job_id': job_id}).json()['job']
+
+        self.assertEqual(job['status'], BulkDeleteJob.STATUS_COMPLETED)
+        self.assertEqual(job['total'], 5)
+        self.assertEqual(job['deleted'], 5)
+        self.assertEqual(list(Content.objects.values_list('user_id', flat=True)), [self.other_user.id])
+        self.assertEqual(ContentCounter.get_count_or_none(self.user.id), 0)
+
+    def test_job_deletes_archived_contents(self):
+        archived = Content.objects.filter(user=self.user).order_by('id')[:2]
+        archived_ids = [content.id for content in archived]
+        ArchivedContent.archive(list(archived))
+
+        job_id = self.client.post('/api/content/bulk_delete', {'user_id': self.user.id}).json()['job']['id']
+        call_command('run_bulk_delete_jobs', batch_size=2, pause=0, stdout=StringIO())
+
+        job = BulkDeleteJob.objects.get(pk=job_id)
+
+        self.assertEqual((job.status, job.total, job.deleted), (BulkDeleteJob.STATUS_COMPLETED, 5, 5))
+        self.assertFalse(ArchivedContent.objects.exists())
+        self.assertEqual(set(ContentTombstone.objects.filter(content_id__in=archived_ids)
+                             .values_list('content_id', flat=True)), set(archived_ids))
+
+    def test_stale_running_job_is_claimed_again(self):
+        job_id = self.client.post('/api/content/bulk_delete', {'user_id': self.user.id}).json()['job']['id']
+        job = BulkDeleteJob.objects.get(pk=job_id)
+        self.assertTrue(job.claim())
+
+        # claimed by a worker which is still running
+        call_command('run_bulk_delete_jobs', pause=0, stdout=StringIO())
+        self.assertEqual(Content.objects.filter(user=self.user).count(), 5)
+
+        # the worker died
+        BulkDeleteJob.objects.filter(pk=job_id).update(
+            updated_at=time.time() - settings.BULK_DELETE_CLAIM_TIMEOUT - 1)
+        call_command('run_bulk_delete_jobs', pause=0, stdout=StringIO())
+
+        self.assertEqual(BulkDeleteJob.objects.get(pk=job_id).status, BulkDeleteJob.STATUS_COMPLETED)
+        self.assertFalse(Content.objects.filter(user=self.user).exists())
+
+    def test_invalid_older_than_is_rejected(self):
+        response = self.client.post('/api/content/bulk_delete', {'older_than': 'yesterday'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BulkDeleteJob.objects.exists())
+
+    def test_only_admin_can_enqueue(self):
+        self.client.force_authenticate(self.user)
+
+        response = self.client.post('/api/content/bulk_delete', {'user_id': self.user.id})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BulkDeleteJob.objects.exists())
+
+
+class ContentTimeRangeTest(TestCase):
+    """ Test module for time range filters, sorting and keyset pagination """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        self.contents = []
+
+        for index in range(5):
+            content = Content.objects.create(user=self.user, title=f'title {index}', body='body',
+                                             summary='summary', pdf='pdf')
+            # created 100, 200 ... seconds after epoch, updated in reverse order
+            Content.objects.filter(pk=content.pk).update(created_at=(index + 1) * 100, updated_at=1000 - index)
+            self.contents.append(content)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_ids(self, path, params):
+        return [content['id'] for content in self.client.get(path, params).json()['contents']]
+
+    def test_range_filter_and_sort(self):
+        params = {'created_from': 200, 'created_to': 400, 'sort': 'updated_at'}
+        expected = [self.contents[3].id, self.contents[2].id, self.contents[1].id]
+
+        self.assertEqual(self.get_ids('/api/content', params), expected)
+        self.assertEqual(self.get_ids('/api/content/search', params), expected)
+
+    def test_invalid_sort_is_rejected(self):
+        response = self.client.get('/api/content', {'sort': 'pdf'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_keyset_pagination(self):
+        params = {'sort': '-created_at', 'page_size': 2, 'cursor': ''}
+        ids = []
+
+        while True:
+            response = self.client.get('/api/content', params).json()
+            ids += [content['id'] for content in response['contents']]
+
+            if 'next_cursor' not in response:
+                break
+
+            params['cursor'] = response['next_cursor']
+
+        self.assertEqual(ids, [content.id for content in reversed(self.contents)])
+
+    def test_invalid_page_size_is_rejected(self):
+        for page_size in (0, -1, 'x', 101):
+            for params in ({}, {'cursor': ''}, {'include_archived': 'true'},
+                           {'include_archived': 'true', 'cursor': ''}):
+                response = self.client.get('/api/content', {'page_size': page_size, **params})
+
+                self.assertEqual(response.status_code, 400, f'page size {page_size} with {params}')
+
+
+@override_settings(INVALIDATION_BUS_POLL_INTERVAL=60)
+class QueryBudgetTest(TestCase):
+    """
+    Test module pinning the number of queries of every endpoint,
+    list endpoints must run the same number of queries for any page size
+    invalidation events of a write are written in one query after commit
+    invalidation bus polls are shared by the requests of a poll interval, they are left out
+    """
+
+    page_sizes = (1, 5, 20)
+
+    password = "Mahesh@123"
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', email='admin@gmail.com', is_superuser=True)
+        self.user = User.objects.create(username='author', email='author@gmail.com',
+                                        first_name='first', last_name='last')
+        self.user.set_password(self.password)
+        self.user.save()
+
+        Profile.objects.create(user=self.user, phone_no=1234567890, pin_code=543216)
+
+        categories = [Category.objects.create(title=f'category {index}') for index in range(3)]
+        self.contents = []
+
+        for index in range(25):
+            content = Content.objects.create(user=self.user, title=f'title {index}', body='body',
+                                             summary='summary', pdf='pdf')
+            content.categories.add(*categories)
+            self.contents.append(content)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        invalidation_bus.poll(force=True)
+
+    def count_queries(self, method, path, params=None):
+        # invalidation events are written after commit
+        with CaptureQueriesContext(connection) as context, run_on_commit_callbacks():
+            response = getattr(self.client, method)(path, params)
+
+        self.assertEqual(response.status_code, 200, response.content)
+
+        return len(context.captured_queries)
+
+    def assertQueryBudget(self, expected, path, params_for_size):
+        for page_size in self.page_sizes:
+            queries = self.count_queries('get', path, params_for_size(page_size))
+
+            self.assertEqual(queries, expected, f'{path} with page size {page_size}')
+
+    def test_content_list(self):
+        # savepoint, counter, page, categories, release
+        self.assertQueryBudget(5, '/api/content', lambda size: {'page_size': size})
+
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(5, '/api/content', lambda size: {'page_size': size})
+        self.assertQueryBudget(5, '/api/content', lambda size: {'page_size': size, 'user_id': self.user.id})
+
+    def test_content_list_with_cursor(self):
+        # savepoint, page, categories, release
+        self.assertQueryBudget(4, '/api/content', lambda size: {'page_size': size, 'cursor': '',
+                                                                'sort': 'created_at'})
+
+    def test_content_batch_fetch(self):
+        def params(size):
+            return {'content_ids': ','.join(str(content.id) for content in self.contents[:size])}
+
+        # savepoint, contents, categories, release
+        self.assertQueryBudget(4, '/api/content', params)
+
+    def test_search(self):
+        # counter, page, categories
+        self.assertQueryBudget(3, '/api/content/search', lambda size: {'page_size': size})
+        # count, page, categories
+        self.assertQueryBudget(3, '/api/content/search', lambda size: {'page_size': size, 'search': 'title'})
+        self.assertQueryBudget(3, '/api/content/search', lambda size: {'page_size': size, 'search': 'category'})
+
+    @override_settings(CONTENT_CHANGES_SETTLE_TIME=0)
+    def test_changes(self):
+        # one change per second, so pages are not extended to a whole second
+        for index, content in enumerate(self.contents):
+            Content.objects.filter(pk=content.pk).update(updated_at=index + 1)
+
+        # savepoint, contents, categories, tombstones, release
+        self.assertQueryBudget(5, '/api/content/changes', lambda size: {'limit': size})
+
+    def test_content_write_endpoints(self):
+        content = self.contents[0]
+
+        # savepoint, existing categories, pdf blob reference, insert, global counter, user counter,
+        # snapshot pdf blob reference, snapshot, linked categories, category links, categories, release,
+        # invalidation events
+        self.assertEqual(self.count_queries('post', '/api/content', {
+            'title': 'title', 'body': 'body', 'summary': 'summary', 'pdf': 'pdf',
+            'categories': json.dumps(['category 0', 'category 1'])
+        }), 13)
+
+        # savepoint, content, categories, linked categories, unlink, update, last revision, revision, user,
+        # categories, release, invalidation events
+        self.assertEqual(self.count_queries('put', '/api/content', {
+            'id': content.id, 'title': 'new title', 'categories': json.dumps(['category 0'])
+        }), 12)
+
+        # nothing changed: savepoint, content, categories, linked categories, user, categories, release
+        self.assertEqual(self.count_queries('put', '/api/content', {
+            'id': content.id, 'title': 'new title', 'categories': json.dumps(['category 0'])
+        }), 7)
+
+        # savepoint, content, category links delete, delete, global counter, user counter, tombstone, revisions,
+        # revisions delete, snapshot pdf blob release, pdf blob release, release, invalidation events
+        self.assertEqual(self.count_queries('delete', '/api/content', {'id': content.id}), 13)
+
+    def test_auth_endpoints(self):
+        self.client.force_authenticate(None)
+
+        # user, savepoint, profile, token lookup, token creation, token activity, release, invalidation events
+        self.assertEqual(self.count_queries('post', '/api/login', {'email': self.user.email,
+                                                                  'password': self.password}), 8)
+        # user, token
+        self.assertEqual(self.count_queries('post', '/api/get_token', {'email': self.user.email,
+                                                                      'password': self.password}), 2)
+
+
+class SparseFieldsTest(TestCase):
+    """ Test module for the fields param of content listing and search """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        self.content = Content.objects.create(user=self.user, title='title', body='body',
+                                              summary='summary', pdf='pdf')
+        self.category = Category.objects.create(title='category')
+        self.content.categories.add(self.category)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_default_fields_leave_out_pdf(self):
+        for path in ('/api/content', '/api/content/search'):
+            content = self.client.get(path).json()['contents'][0]
+
+            self.assertNotIn('pdf', content)
+            self.assertEqual(content['categories'], [{'id': self.category.id, 'title': 'category'}])
+
+    def test_requested_fields_only_are_read(self):
+        for path in ('/api/content', '/api/content/search'):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(path, {'fields': 'title,summary'})
+
+            self.assertEqual(response.json()['contents'],
+                             [{'id': self.content.id, 'title': 'title', 'summary': 'summary'}])
+
+            # neither the heavy columns nor the relations are queried
+            sql = ' '.join(query['sql'] for query in context.captured_queries)
+            self.assertNotIn('"api_content"."pdf"', sql)
+            self.assertNotIn('"api_content"."body"', sql)
+            self.assertNotIn('api_category', sql)
+            self.assertNotIn('auth_user', sql)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/content', {'fields': 'title,password'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchSnippetTest(TestCase):
+    """ Test module for snippet mode of content search """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        # 'İ' lowercases to two characters, offsets must still point into the snippet as sent
+        body = 'hay ' * 30 + 'İstanbul needle and NEEDLE' + ' hay' * 30
+        self.assertLessEqual(len(body), Content._meta.get_field('body').max_length)
+
+        self.content = Content.objects.create(user=self.user, title='Needle title', summary='summary', pdf='pdf' * 1000,
+                                              body=body)
+        self.content.categories.add(Category.objects.create(title='category'))
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(SEARCH_SNIPPET_LENGTH=60)
+    def test_snippet_around_match(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/content/search', {'search': 'needle', 'mode': 'snippet'})
+
+        content = response.json()['contents'][0]
+
+        self.assertEqual(set(content), {'id', 'title', 'categories', 'snippet', 'highlights'})
+        self.assertLessEqual(len(content['snippet']), settings.SEARCH_SNIPPET_LENGTH)
+        self.assertIn('İstanbul', content['snippet'])
+        self.assertEqual(content['highlights']['title'], [[0, 6]])
+
+        for start, end in content['highlights']['snippet']:
+            self.assertEqual(content['snippet'][start:end].lower(), 'needle')
+
+        self.assertEqual(len(content['highlights']['snippet']), 2)
+
+        # only the window is read, never the whole body or pdf
+        sql = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertNotIn('"api_content"."pdf"', sql)
+        self.assertNotIn('"api_content"."body" FROM', sql)
+
+    def test_highlights_of_characters_folding_to_several(self):
+        self.assertEqual(ContentSnippetSerializer.get_match_offsets('Die Straße, die STRASSE', 'strasse'),
+                         [[4, 10], [16, 23]])
+        self.assertEqual(ContentSnippetSerializer.get_match_offsets('İİ needle', 'NEEDLE'), [[3, 9]])
+
+    def test_snippet_without_match_in_body(self):
+        response = self.client.get('/api/content/search', {'search': 'category', 'mode': 'snippet'})
+        content = response.json()['contents'][0]
+
+        self.assertTrue(content['snippet'].startswith('hay hay'))
+        self.assertEqual(content['highlights'], {'title': [], 'snippet': []})
+
+    def test_unknown_mode_is_rejected(self):
+        response = self.client.get('/api/content/search', {'mode': 'compact'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class CategoryAutocompleteTest(TestCase):
+    """ Test module for category autocomplete """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        self.categories = {title: Category.objects.create(title=title)
+                           for title in ('Python', 'Pythonic', 'pytest', 'Django', 'Py')}
+
+        for index in range(3):
+            content = Content.objects.create(user=self.user, title='title', body='body', summary='summary')
+            content.categories.add(self.categories['pytest'])
+
+            if index < 2:
+                content.categories.add(self.categories['Pythonic'])
+
+        category_index.build()
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_titles(self, prefix, **params):
+        response = self.client.get('/api/categories/autocomplete', {'prefix': prefix, **params})
+
+        self.assertEqual(response.status_code, 200)
+
+        return [category['title'] for category in response.json()['categories']]
+
+    def test_suggestions_ranked_by_usage(self):
+        self.assertEqual(self.get_titles('py'), ['pytest', 'Pythonic', 'Py', 'Python'])
+        self.assertEqual(self.get_titles('PYTHON'), ['Pythonic', 'Python'])
+        self.assertEqual(self.get_titles('py', limit=2), ['pytest', 'Pythonic'])
+        self.assertEqual(self.get_titles('ruby'), [])
+        self.assertEqual(self.get_titles(''), [])
+
+    def test_suggestions_do_not_query(self):
+        with self.assertNumQueries(0):
+            category_index.suggest('py')
+
+    @override_settings(INVALIDATION_BUS_POLL_INTERVAL=0)
+    def test_index_follows_category_changes(self):
+        with run_on_commit_callbacks():
+            Category.objects.create(title='Pyramid')
+            self.categories['Python'].delete()
+
+            django = self.categories['Django']
+            django.title = 'Pydantic'
+            django.save()
+
+        self.assertEqual(self.get_titles('py'), ['pytest', 'Pythonic', 'Py', 'Pydantic', 'Pyramid'])
+        self.assertEqual(self.get_titles('dj'), [])
+
+    def test_ranked_prefixes_follow_usage(self):
+        self.assertEqual(self.get_titles('py'), ['pytest', 'Pythonic', 'Py', 'Python'])
+
+        category_index.add_usage(self.categories['Python'].id, 4)
+        category_index.add_usage(self.categories['pytest'].id, -3)
+
+        self.assertEqual(self.get_titles('py'), ['Python', 'Pythonic', 'Py', 'pytest'])
+        self.assertEqual(self.get_titles('python'), ['Python', 'Pythonic'])
+
+        with override_settings(CATEGORY_AUTOCOMPLETE_MAX_SIZE=2):
+            category_index.build()
+            self.assertEqual(self.get_titles('py', limit=2), ['pytest', 'Pythonic'])
+
+            # pytest drops out of the full list, the categories left out of it are ranked again
+            category_index.add_usage(self.categories['pytest'].id, -3)
+            self.assertEqual(self.get_titles('py', limit=2), ['Pythonic', 'Py'])
+
+    def test_rebuild_runs_in_background(self):
+        category_index.built_at -= settings.CATEGORY_INDEX_REBUILD_INTERVAL + 1
+
+        with mock.patch.object(category_index, 'build') as build:
+            with self.assertNumQueries(0):
+                self.assertEqual(len(category_index.suggest('py')), 4)
+
+            category_index.rebuild_thread.join()
+
+        build.assert_called_once_with()
+        self.assertNotEqual(category_index.rebuild_thread.ident, threading.get_ident())
+
+
+class WarmUpTest(TestCase):
+    """ Test module for worker warm-up """
+
+    def test_warm_up_builds_caches_and_connects(self):
+        warm_up()
+
+        self.assertIsNotNone(connection.connection)
+        self.assertTrue(get_resolver()._populated)
+
+
+class ColdStartTest(TestCase):
+    """ Test module for cold start of a worker """
+
+    # modules a fresh worker must not import before they are used
+    lazy_modules = ('setuptools', 'pkg_resources', 'api.admin', 'api.views', 'rest_framework.views',
+                    'concurrent.futures.process')
+
+    def start_worker(self):
+        """
+        returns modules imported by the wsgi application in a fresh interpreter, started as in production
+        """
+        code = 'import json, sys; import cms.wsgi; print(json.dumps(sorted(sys.modules)))'
+
+        # only what production.env sets, not what the environment running the tests happens to have
+        environment = {name: value for name, value in os.environ.items() if name != 'SETUPTOOLS_USE_DISTUTILS'}
+        environment.update(get_environment())
+        process = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, check=True, env=environment,
+                                 stdout=subprocess.PIPE, universal_newlines=True)
+
+        return json.loads(process.stdout)
+
+    def test_cold_start_imports_only_what_is_used(self):
+        modules = self.start_worker()
+
+        for module in self.lazy_modules:
+            self.assertNotIn(module, modules)
+
+
+class SqliteProfileTest(TestCase):
+    """ Test module for the SQLite performance profile """
+
+    def test_pragmas_are_applied_to_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+
+            cursor.execute('PRAGMA temp_store')
+            # 2 is MEMORY
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_immediate_atomic_nests_as_savepoint(self):
+        with DatabaseUtilities.immediate_atomic():
+            self.assertTrue(connection.in_atomic_block)
+            User.objects.create(username='author', email='author@gmail.com')
+
+        self.assertNotIn('_start_transaction_under_autocommit', connection.__dict__)
+        self.assertTrue(User.objects.filter(username='author').exists())
+
+    def test_journal_mode_is_only_set_by_migration(self):
+        migration = importlib.import_module('utilities.migrations.0002_sqlite_journal_mode')
+
+        with tempfile.TemporaryDirectory() as directory:
+            database = connections['default'].__class__({**connection.settings_dict,
+                                                         'NAME': os.path.join(directory, 'db')},
+                                                        alias='journal')
+
+            try:
+                # connecting applies the pragmas, it must not rewrite the database file header
+                with database.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'delete')
+
+                migration.set_journal_mode(None, mock.Mock(connection=database))
+
+                with database.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], settings.SQLITE_JOURNAL_MODE.lower())
+            finally:
+                database.close()
+
+
+class ImmediateAtomicTest(TransactionTestCase):
+    """ Test module for immediate_atomic outside of any transaction """
+
+    def test_transaction_begins_immediate(self):
+        # fails when django stops beginning SQLite transactions through the hook immediate_atomic overrides,
+        # see DatabaseUtilities.immediate_atomic_django_versions
+        self.assertTrue(DatabaseUtilities.has_transaction_hook(connection))
+
+        with CaptureQueriesContext(connection) as queries:
+            with DatabaseUtilities.immediate_atomic():
+                User.objects.create(username='author', email='author@gmail.com')
+
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+        self.assertNotIn('_start_transaction_under_autocommit', connection.__dict__)
+
+
+class ContentWritePathTest(TestCase):
+    """ Test module for change detection on content updates """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        self.category = Category.objects.create(title='category')
+
+        content = Content.objects.create(user=self.user, title='title', body='body', summary='summary', pdf='pdf')
+        content.categories.add(self.category)
+        Content.objects.filter(pk=content.pk).update(updated_at=100)
+
+        self.content = Content.objects.get(pk=content.pk)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def put(self, **data):
+        response = self.client.put('/api/content', dict(data, id=self.content.id))
+        self.assertEqual(response.status_code, 200, response.content)
+
+        return Content.objects.get(pk=self.content.pk)
+
+    def test_only_modified_columns_are_written(self):
+        with CaptureQueriesContext(connection) as context:
+            content = self.put(title='new title')
+
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"title"', updates[0])
+        self.assertNotIn('"pdf"', updates[0])
+        self.assertEqual(content.title, 'new title')
+        self.assertNotEqual(content.updated_at, 100)
+
+    def test_no_op_update_writes_nothing(self):
+        with CaptureQueriesContext(connection) as context:
+            content = self.put(title='title', categories=json.dumps(['category']))
+
+        self.assertFalse([query for query in context.captured_queries
+                          if query['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))])
+        self.assertEqual(content.updated_at, 100)
+
+    def test_refresh_resets_change_detection(self):
+        content = Content.objects.get(pk=self.content.pk)
+        Content.objects.filter(pk=content.pk).update(title='other title')
+
+        content.refresh_from_db()
+        content.title = 'title'
+
+        with CaptureQueriesContext(connection) as context:
+            content.save()
+
+        # the reloaded title is the baseline, only the title is written
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE "api_content"')]
+
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"title"', updates[0])
+        self.assertNotIn('"body"', updates[0])
+        self.assertEqual(Content.objects.get(pk=content.pk).title, 'title')
+
+    def test_save_of_clean_content_writes_it(self):
+        content = Content.objects.get(pk=self.content.pk)
+        Content.objects.filter(pk=content.pk).update(title='other title')
+
+        content.save()
+
+        content = Content.objects.get(pk=content.pk)
+        self.assertEqual(content.title, 'title')
+        self.assertNotEqual(content.updated_at, 100)
+
+    def test_category_change_bumps_updated_at(self):
+        content = self.put(categories=json.dumps(['other category']))
+
+        self.assertEqual(list(content.categories.values_list('title', flat=True)), ['other category'])
+        self.assertNotEqual(content.updated_at, 100)
+
+
+class PdfBlobTest(TestCase):
+    """ Test module for content addressed storage of pdfs """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_content(self, pdf):
+        response = self.client.post('/api/content', {'title': 'title', 'body': 'body', 'summary': 'summary',
+                                                     'pdf': pdf, 'categories': json.dumps(['category'])})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        return Content.objects.get(pk=response.json()['content']['id'])
+
+    def get_ref_counts(self):
+        return dict(PdfBlob.objects.values_list('data', 'ref_count'))
+
+    def test_same_pdf_is_stored_once(self):
+        first = self.create_content('same pdf')
+        second = self.create_content('same pdf')
+
+        # every content and its first revision (a snapshot) refer to the blob
+        self.assertEqual(first.pdf_blob_id, second.pdf_blob_id)
+        self.assertEqual(self.get_ref_counts(), {'same pdf': 4})
+        self.assertEqual(Content.objects.get(pk=second.pk).pdf, 'same pdf')
+
+        response = self.client.put('/api/content', {'id': second.id, 'pdf': 'other pdf'})
+
+        # the second revision is a delta, it refers to no blob
+        self.assertEqual(response.json()['content']['pdf'], 'other pdf')
+        self.assertEqual(self.get_ref_counts(), {'same pdf': 3, 'other pdf': 1})
+
+        # pdf is left alone when not sent
+        self.client.put('/api/content', {'id': second.id, 'title': 'new title'})
+        self.assertEqual(self.get_ref_counts(), {'same pdf': 3, 'other pdf': 1})
+
+        # revisions are deleted with their content
+        self.client.delete('/api/content', {'id': first.id})
+        self.assertEqual(self.get_ref_counts(), {'same pdf': 1, 'other pdf': 1})
+
+    def test_collect_deletes_unreferenced_blobs_only(self):
+        content = self.create_content('kept pdf')
+        self.create_content('deleted pdf').delete()
+
+        # reference count drifted by a raw write
+        PdfBlob.objects.filter(pk=content.pdf_blob_id).update(ref_count=0)
+
+        call_command('collect_pdf_blobs', stdout=StringIO())
+        self.assertEqual(self.get_ref_counts(), {'kept pdf': 0})
+
+        # the content and its first revision
+        call_command('collect_pdf_blobs', '--recount', stdout=StringIO())
+        self.assertEqual(self.get_ref_counts(), {'kept pdf': 2})
+
+
+class ContentRevisionTest(TestCase):
+    """ Test module for revision history of contents """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        self.admin = User.objects.create(username='admin', email='admin@gmail.com', is_superuser=True)
+        self.other_user = User.objects.create(username='other', email='other@gmail.com')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        response = self.client.post('/api/content', {'title': 'title', 'body': 'first body', 'summary': 'summary',
+                                                     'pdf': 'pdf line\n' * 100,
+                                                     'categories': json.dumps(['category'])})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        self.content_id = response.json()['content']['id']
+
+    def put(self, **data):
+        response = self.client.put('/api/content', dict(data, id=self.content_id))
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def get_revision(self, number):
+        return self.client.get('/api/content/revisions', {'content_id': self.content_id, 'number': number})
+
+    @override_settings(CONTENT_REVISION_SNAPSHOT_INTERVAL=3)
+    def test_every_version_is_reconstructed(self):
+        versions = [('first body', 'pdf line\n' * 100)]
+
+        for index in range(6):
+            pdf = 'pdf line\n' * 50 + f'edit {index}\n' + 'pdf line\n' * 50
+            self.put(body=f'body {index}', pdf=pdf)
+            versions.append((f'body {index}', pdf))
+
+        revisions = list(ContentRevision.objects.filter(content_id=self.content_id).order_by('number'))
+
+        self.assertEqual([revision.is_snapshot for revision in revisions], [True, False, False] * 2 + [True])
+        # deltas copy the unchanged lines of the pdf
+        self.assertLess(len(revisions[2].data), 100)
+
+        for number, (body, pdf) in enumerate(versions, start=1):
+            revision = self.get_revision(number).json()['revision']
+
+            self.assertEqual((revision['number'], revision['title'], revision['body'], revision['pdf']),
+                             (number, 'title', body, pdf))
+
+        response = self.get_revision(len(versions) + 1)
+        self.assertEqual(response.status_code, 400)
+
+    def test_listing_and_permissions(self):
+        self.put(title='new title')
+
+        self.client.force_authenticate(self.admin)
+        self.put(summary='new summary')
+
+        response = self.client.get('/api/content/revisions', {'content_id': self.content_id})
+
+        self.assertEqual([(revision['number'], revision['user_id'], revision['changed_fields'])
+                          for revision in response.json()['revisions']],
+                         [(3, self.admin.id, ['summary']), (2, self.user.id, ['title']),
+                          (1, self.user.id, ['title', 'body', 'summary', 'pdf'])])
+
+        self.client.force_authenticate(self.other_user)
+        self.assertEqual(self.get_revision(1).status_code, 400)
+
+    def test_content_saved_before_revisions_starts_with_its_previous_version(self):
+        ContentRevision.objects.filter(content_id=self.content_id).delete()
+        Content.objects.filter(pk=self.content_id).update(revision=0)
+
+        self.put(body='new body')
+
+        self.assertEqual(self.get_revision(1).json()['revision']['body'], 'first body')
+        self.assertEqual(self.get_revision(2).json()['revision']['body'], 'new body')
+        self.assertEqual(self.get_revision(2).json()['revision']['pdf'], 'pdf line\n' * 100)
+
+    def assertLastVersionIsRow(self):
+        content = Content.objects.get(pk=self.content_id)
+        version = ContentRevision.get_version(self.content_id, content.revision)
+
+        self.assertEqual({field: version[field] for field in ContentRevision.versioned_fields},
+                         {field: str(getattr(content, field)) for field in ContentRevision.versioned_fields})
+
+    def test_every_save_is_recorded_against_the_row(self):
+        words = 'zero one two three four five six seven eight nine ten'.split()
+        content = Content.objects.get(pk=self.content_id)
+        other_content = Content.objects.get(pk=self.content_id)
+
+        for index in range(3):
+            other_content.body = ' '.join(words[:index + 8])
+            other_content.save()
+            self.assertLastVersionIsRow()
+
+        # loaded before the saves of other_content, its row is recorded whole
+        content.body = ' '.join(words[1:])
+        content.save()
+        self.assertLastVersionIsRow()
+        self.assertTrue(ContentRevision.objects.get(content_id=self.content_id, number=5).is_snapshot)
+
+        other_content.summary = 'other summary'
+        other_content.save()
+        self.assertLastVersionIsRow()
+        self.assertEqual(Content.objects.get(pk=self.content_id).body, ' '.join(words[1:]))
+
+        content.refresh_from_db()
+        content.body = ' '.join(words)
+        content.save()
+        self.assertLastVersionIsRow()
+        self.assertFalse(ContentRevision.objects.get(content_id=self.content_id, number=7).is_snapshot)
+
+        # writes every column, nothing changed
+        content.save()
+        self.assertLastVersionIsRow()
+        self.assertEqual(ContentRevision.objects.filter(content_id=self.content_id).count(), 7)
+
+    def test_deltas_apply_back_to_new_text(self):
+        words = ['a ', 'bb ', 'ccc\n', 'dd  ', 'e', '\n']
+
+        for seed in range(200):
+            old_text = ''.join(words[(seed * index) % 7 % 6] for index in range(seed % 40))
+            new_text = ''.join(words[(seed + index * index) % 6] for index in range(seed % 50))
+
+            for max_words in (5, 1000):
+                delta = DeltaUtilities.get_delta(old_text, new_text, max_words)
+                self.assertEqual(DeltaUtilities.apply_deltas(old_text, [delta]), new_text)
+
+                # chained on words, without joining the text in between
+                back_delta = DeltaUtilities.get_delta(new_text, old_text, max_words)
+                self.assertEqual(DeltaUtilities.apply_deltas(old_text, [delta, back_delta]), old_text)
+
+        self.assertEqual(DeltaUtilities.get_delta(None, 'text', 1000), ['text'])
+
+
+class ArchiveContentTest(TestCase):
+    """ Test module for archiving old contents """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        category = Category.objects.create(title='category')
+        self.contents = []
+
+        for index in range(5):
+            content = Content.objects.create(user=self.user, title=f'title {index}', body='needle',
+                                             summary='summary', pdf='pdf')
+            content.categories.add(category)
+            self.contents.append(content)
+
+        # first three contents were last updated long ago
+        for index, content in enumerate(self.contents):
+            updated_at = 1000 + index if index < 3 else int(time.time())
+            Content.objects.filter(pk=content.pk).update(created_at=1000 + index, updated_at=updated_at)
+
+        call_command('archive_contents', pause=0, batch_size=2, stdout=StringIO())
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_ids(self, path, params):
+        return [content['id'] for content in self.client.get(path, params).json()['contents']]
+
+    def test_old_contents_are_moved(self):
+        archived_ids = [content.id for content in self.contents[:3]]
+
+        self.assertEqual(list(ArchivedContent.objects.order_by('id').values_list('id', flat=True)), archived_ids)
+        self.assertEqual(Content.objects.count(), 2)
+        self.assertEqual(ContentCounter.get_count_or_none(self.user.id), 2)
+        self.assertFalse(ContentTombstone.objects.exists())
+
+        # pdf references move with the rows, first revisions keep theirs
+        self.assertEqual(PdfBlob.objects.get().ref_count, 10)
+        self.assertEqual(ArchivedContent.objects.get(pk=archived_ids[0]).pdf, 'pdf')
+        self.assertEqual(ContentRevision.objects.filter(content_id__in=archived_ids).count(), 3)
+
+    def test_category_usage_follows_archived_links(self):
+        category_index.build()
+        self.assertEqual(category_index.suggest('cat')[0][2], 2)
+
+        # on_commit callbacks don't run in test transactions
+        with mock.patch('django.db.transaction.on_commit', side_effect=lambda callback: callback()):
+            ArchivedContent.archive([self.contents[3]])
+
+        self.assertEqual(category_index.suggest('cat')[0][2], 1)
+        self.assertEqual(ContentCounter.get_count_or_none(self.user.id), 1)
+
+    def test_listing_includes_archived_on_request(self):
+        hot_ids = [content.id for content in reversed(self.contents[3:])]
+        all_ids = [content.id for content in reversed(self.contents)]
+
+        self.assertEqual(self.get_ids('/api/content', {}), hot_ids)
+        self.assertEqual(self.get_ids('/api/content', {'include_archived': 'true'}), all_ids)
+        self.assertEqual(self.get_ids('/api/content', {'include_archived': 'true', 'page': 2, 'page_size': 2}),
+                         all_ids[2:4])
+        self.assertEqual(self.get_ids('/api/content/search', {'search': 'needle', 'include_archived': 'true',
+                                                              'mode': 'snippet'}), all_ids)
+
+        response = self.client.get('/api/content', {'include_archived': 'true', 'sort': 'created_at'})
+        self.assertEqual(response.json()['contents'][0]['categories'][0]['title'], 'category')
+
+    def test_keyset_pagination_across_tables(self):
+        params = {'include_archived': 'true', 'sort': 'updated_at', 'page_size': 2, 'cursor': ''}
+        ids = []
+
+        while True:
+            response = self.client.get('/api/content', params).json()
+            ids += [content['id'] for content in response['contents']]
+
+            if 'next_cursor' not in response:
+                break
+
+            params['cursor'] = response['next_cursor']
+
+        self.assertEqual(ids, [content.id for content in self.contents])
+
+
+class ContentFragmentCacheTest(TestCase):
+    """ Test module for the cache of serialized contents """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        self.category = Category.objects.create(title='category')
+
+        for index in range(3):
+            content = Content.objects.create(user=self.user, title=f'title {index}', body='body',
+                                             summary='summary', pdf='pdf')
+            content.categories.add(self.category)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_contents(self, params=None):
+        response = self.client.get('/api/content', params)
+        self.assertEqual(response.status_code, 200, response.content)
+
+        return response.json()['contents']
+
+    def test_cached_fragments_are_spliced(self):
+        first = self.get_contents()
+        misses = content_fragment_cache.misses
+
+        self.assertEqual(self.get_contents(), first)
+        self.assertEqual(content_fragment_cache.misses, misses)
+
+        # every sparse fieldset has its own fragments
+        self.assertEqual(self.get_contents({'fields': 'title'})[0], {'id': first[0]['id'], 'title': 'title 2'})
+
+        response = self.client.get('/api/content', {'page_size': 2, 'cursor': ''}).json()
+        self.assertEqual(response['contents'], first[:2])
+        self.assertIn('next_cursor', response)
+
+    def test_negotiated_renderer_is_used(self):
+        first = self.get_contents()
+
+        response = self.client.get('/api/content', {'page_size': 2, 'cursor': ''},
+                                   HTTP_ACCEPT='application/json; indent=2')
+        self.assertIn(b'\n  "contents"', response.content)
+        self.assertEqual(response.json()['contents'], first[:2])
+        self.assertIn('next_cursor', response.json())
+
+        response = self.client.get('/api/content/search', {'search': 'title', 'format': 'json'})
+        self.assertEqual(response.json()['contents'], first)
+
+        self.assertEqual(self.client.get('/api/content', {'format': 'xml'}).status_code, 404)
+
+    def test_writes_invalidate_fragments(self):
+        self.get_contents()
+
+        content = Content.objects.order_by('id').first()
+        content.summary = 'new summary'
+        content.save()
+
+        self.category.title = 'renamed'
+        self.category.save()
+
+        contents = self.get_contents()
+
+        self.assertEqual(contents[-1]['summary'], 'new summary')
+        self.assertEqual({content['categories'][0]['title'] for content in contents}, {'renamed'})
+
+    def test_eviction_is_bounded_by_bytes(self):
+        cache = LruByteCache(max_bytes=10)
+
+        cache.set('first', b'12345', tags=['tag'])
+        cache.set('second', b'12345')
+        cache.get('first')
+        cache.set('third', b'123')
+
+        # least recently used entry is evicted first
+        self.assertIsNone(cache.get('second'))
+        self.assertEqual(cache.size, 8)
+
+        cache.set('too large', b'x' * 11)
+        self.assertIsNone(cache.get('too large'))
+
+        cache.invalidate_tag('tag')
+        self.assertEqual(list(cache.entries), ['third'])
+        self.assertEqual(dict(cache.tagged_keys), {})
+
+
+class CompressedTextFieldTest(TestCase):
+    """ Test module for compressed storage of large text columns """
+
+    pdf = 'lorem ipsum dolor sit amet ' * 200
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+
+    def get_stored_values(self, table, column):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT "{column}" FROM "{table}"')
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_large_values_are_compressed(self):
+        content = Content.objects.create(user=self.user, title='title', body='body', summary='summary', pdf=self.pdf)
+        Profile.objects.create(user=self.user, phone_no=1234567890, pin_code=543216, address='small address')
+
+        stored_pdf, = self.get_stored_values('api_pdfblob', 'data')
+
+        self.assertTrue(bytes(stored_pdf).startswith(CompressedTextField.COMPRESSED_HEADER))
+        self.assertLess(len(stored_pdf), len(self.pdf) // 10)
+        self.assertEqual(Profile.objects.get(user=self.user).address, 'small address')
+
+        # decompressed on first access only
+        blob = PdfBlob.objects.get(pk=content.pdf_blob_id)
+        self.assertIsInstance(blob.__dict__['data'], CompressedText)
+
+        self.assertEqual(blob.data, self.pdf)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get('/api/content', {'fields': 'pdf'})
+        self.assertEqual(response.json()['contents'], [{'id': content.id, 'pdf': self.pdf}])
+
+    def test_plain_text_rows_are_read_and_recompressed(self):
+        profile = Profile.objects.create(user=self.user, phone_no=1234567890, pin_code=543216)
+
+        # row written before the column was compressed
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE "api_profile" SET "address" = %s', [self.pdf])
+
+        self.assertEqual(Profile.objects.get(pk=profile.pk).address, self.pdf)
+
+        call_command('recompress_text_fields', stdout=StringIO())
+
+        stored_address, = self.get_stored_values('api_profile', 'address')
+
+        self.assertTrue(bytes(stored_address).startswith(CompressedTextField.COMPRESSED_HEADER))
+        self.assertEqual(Profile.objects.get(pk=profile.pk).address, self.pdf)
+
+
+class PasswordHasherPoolTest(TestCase):
+    """ Test module for password hashing in the hasher pool """
+
+    password = "Mahesh@123"
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        self.user.set_password(self.password)
+        self.user.save()
+
+    def test_token_endpoint_hashes_in_pool(self):
+        completed = password_hasher_pool.get_metrics()['completed']
+
+        response = self.client.post('/api/login', {'email': 'new@gmail.com', 'password': self.password,
+                                                   'first_name': 'first', 'last_name': 'last',
+                                                   'phone_no': 1234567890, 'pin_code': 543216})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        response = self.client.post('/api/get_token', {'email': 'new@gmail.com', 'password': self.password})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post('/api/get_token', {'email': self.user.email, 'password': 'Wrong@123'})
+        self.assertEqual(response.status_code, 400)
+
+        metrics = password_hasher_pool.get_metrics()
+
+        self.assertEqual(metrics['completed'], completed + 3)
+        self.assertGreaterEqual(metrics['wait_max'], 0)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2PasswordHasher',
+                                         'django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_outdated_hash_is_upgraded(self):
+        pool = PasswordHasherPool(size=0, queue_size=0, timeout=1)
+
+        self.user.password = make_password(self.password, hasher='md5')
+        self.user.save()
+
+        self.assertTrue(pool.check_password(self.user, self.password))
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('pbkdf2_sha256$'))
+
+    def test_full_queue_is_rejected(self):
+        pool = PasswordHasherPool(size=1, queue_size=0, timeout=1)
+        # the only slot is taken by a running hash
+        pool.slots.acquire()
+
+        with self.assertRaises(CustomException) as context:
+            pool.make_password(self.password)
+
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(pool.get_metrics()['rejected'], 1)
+
+    def test_timed_out_hash_keeps_its_slot_until_done(self):
+        pool = PasswordHasherPool(size=1, queue_size=0, timeout=0.01)
+        pool.executor = PendingExecutor()
+
+        with self.assertRaises(CustomException) as context:
+            pool.make_password(self.password)
+
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertFalse(pool.slots.acquire(blocking=False))
+
+        pool.executor.futures[0].set_result((time.time(), 'hash'))
+        self.assertTrue(pool.slots.acquire(blocking=False))
+
+    def test_broken_pool_is_replaced(self):
+        pool = PasswordHasherPool(size=1, queue_size=0, timeout=1)
+        executor = pool.executor = PendingExecutor(broken=True)
+
+        with self.assertRaises(CustomException) as context:
+            pool.make_password(self.password)
+
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertTrue(executor.shut_down)
+        self.assertIsNone(pool.executor)
+        self.assertTrue(pool.slots.acquire(blocking=False))
+
+    @override_settings(PASSWORD_HASHER_METRICS_LOG_INTERVAL=0)
+    def test_metrics_are_logged_when_hashes_ran(self):
+        pool = PasswordHasherPool(size=1, queue_size=0, timeout=1)
+        pool.slots.acquire()
+
+        with self.assertLogs('utilities.password_utilities', level='INFO') as logs:
+            with self.assertRaises(CustomException):
+                pool.make_password(self.password)
+
+        self.assertIn('1 rejected', logs.output[0])
+
+        # nothing ran since last log
+        with mock.patch('utilities.password_utilities.logger') as logger:
+            pool.log_metrics()
+
+        logger.info.assert_not_called()
+
+    def test_metrics_endpoint_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        self.assertEqual(client.get('/api/metrics').status_code, 403)
+
+        self.user.is_superuser = True
+        self.user.save()
+
+        response = client.get('/api/metrics').json()
+
+        self.assertEqual(response['pid'], os.getpid())
+        self.assertEqual(response['password_hasher'], password_hasher_pool.get_metrics())
+        self.assertEqual(response['content_fragment_cache'], content_fragment_cache.get_metrics())
+
+    def test_registration_hashes_outside_of_transaction(self):
+        outer_savepoints = list(connection.savepoint_ids)
+        hashing_savepoints = []
+
+        def hash_password(password):
+            hashing_savepoints.append(list(connection.savepoint_ids))
+
+            return make_password(password)
+
+        with mock.patch.object(password_hasher_pool, 'make_password', side_effect=hash_password):
+            response = self.client.post('/api/login', {'email': 'new@gmail.com', 'password': self.password,
+                                                       'first_name': 'first', 'last_name': 'last',
+                                                       'phone_no': 1234567890, 'pin_code': 543216})
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(hashing_savepoints, [outer_savepoints])
+        self.assertTrue(User.objects.get(email='new@gmail.com').check_password(self.password))
+
+
+class PendingExecutor:
+    """
+    executor for hasher pool tests, submitted hashes stay pending until a test completes them
+    a broken executor fails them right away, as a pool whose process died
+    """
+
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.futures = []
+        self.shut_down = False
+
+    def submit(self, function, *args):
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        if self.broken:
+            future.set_exception(BrokenExecutor('a process of the pool died'))
+
+        self.futures.append(future)
+
+        return future
+
+    def shutdown(self, wait=True):
+        self.shut_down = True
+
+
+class TokenExpiryTest(TestCase):
+    """ Test module for token expiry, rotation and purge """
+
+    password = "Mahesh@123"
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        self.user.set_password(self.password)
+        self.user.save()
+        Profile.objects.create(user=self.user, phone_no=1234567890, pin_code=543216)
+
+    def login(self):
+        response = self.client.post('/api/login', {'email': self.user.email, 'password': self.password})
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()['token']
+
+    def get_status(self, key):
+        return self.client.get('/api/content/search', HTTP_AUTHORIZATION=f'Token {key}').status_code
+
+    def test_expired_tokens_are_rejected_and_replaced(self):
+        key = self.login()
+        self.assertEqual(self.get_status(key), 200)
+
+        TokenActivity.objects.filter(pk=key).update(last_used=time.time() - settings.TOKEN_IDLE_TIMEOUT - 1)
+        self.assertEqual(self.get_status(key), 401)
+
+        new_key = self.login()
+        self.assertNotEqual(new_key, key)
+        self.assertEqual(self.get_status(new_key), 200)
+
+        TokenActivity.objects.filter(pk=new_key).update(created_at=time.time() - settings.TOKEN_MAX_AGE - 1)
+        self.assertEqual(self.get_status(new_key), 401)
+
+    @override_settings(TOKEN_ROTATE_ON_LOGIN=True)
+    def test_rotation_on_login(self):
+        key = self.login()
+        new_key = self.login()
+
+        self.assertNotEqual(new_key, key)
+        self.assertEqual(self.get_status(key), 401)
+        self.assertEqual(self.get_status(new_key), 200)
+
+    def test_last_used_writes_are_coalesced(self):
+        key = self.login()
+        last_used = time.time() - settings.TOKEN_LAST_USED_RESOLUTION - 1
+        TokenActivity.objects.filter(pk=key).update(last_used=last_used)
+
+        token_usage_recorder.last_flush_time = 0
+
+        with CaptureQueriesContext(connection) as context:
+            for _ in range(3):
+                self.get_status(key)
+
+        updates = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('UPDATE "api_tokenactivity"')]
+
+        self.assertEqual(len(updates), 1)
+        self.assertGreater(TokenActivity.objects.get(pk=key).last_used, last_used)
+
+    def test_failed_flush_keeps_tokens_pending(self):
+        key = self.login()
+        TokenActivity.objects.filter(pk=key).update(last_used=0)
+        token_usage_recorder.pending.add(key)
+
+        with mock.patch.object(TokenActivity.objects, 'filter', side_effect=DatabaseError('database is locked')), \
+                self.assertLogs('api.authentication', 'WARNING'):
+            token_usage_recorder.flush(force=True)
+
+        self.assertIn(key, token_usage_recorder.pending)
+
+        token_usage_recorder.flush(force=True)
+
+        self.assertFalse(token_usage_recorder.pending)
+        self.assertGreater(TokenActivity.objects.get(pk=key).last_used, 0)
+
+    def test_purge_deletes_expired_tokens_only(self):
+        key = self.login()
+        other_user = User.objects.create(username='other', email='other@gmail.com')
+        expired_key = ViewHelper.get_user_token(other_user)
+
+        TokenActivity.objects.filter(pk=expired_key).update(created_at=0)
+
+        # created without activity, e.g. in the admin
+        created_key = Token.objects.create(user=User.objects.create(username='third', email='third@gmail.com')).key
+        Token.objects.filter(pk=created_key).update(created=datetime.fromtimestamp(0, timezone.utc))
+
+        call_command('purge_expired_tokens', stdout=StringIO())
+
+        self.assertEqual(list(Token.objects.values_list('key', flat=True)), [key])
+
+    def test_expired_tokens_are_selected_through_indexes(self):
+        with CaptureQueriesContext(connection) as context:
+            TokenActivity.get_expired_token_keys(10)
+
+        for query in context.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+            self.assertIn('USING INDEX', plan)
+            self.assertNotIn('authtoken_token', plan)
+
+
+class SlowQueryLogTest(TestCase):
+    """ Test module for the slow query log """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+        Content.objects.create(user=self.user, title='title', body='body', summary='summary', pdf='pdf')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_fingerprint_normalizes_literals(self):
+        first = SlowQueryLog.get_fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) AND title = \'a\'  LIMIT 21')
+        second = SlowQueryLog.get_fingerprint('SELECT * FROM t WHERE id IN (%s) AND title = \'b\' LIMIT 5')
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, 'SELECT * FROM t WHERE id IN (...) AND title = ? LIMIT ?')
+
+    def test_slow_queries_are_recorded(self):
+        query_log = SlowQueryLog(threshold=0, size=3, max_fingerprints=10)
+
+        with connection.execute_wrapper(query_log):
+            for _ in range(2):
+                list(Content.objects.filter(title='secret title'))
+
+            for _ in range(3):
+                Content.objects.count()
+
+        snapshot = query_log.get_snapshot()
+
+        # ring buffer keeps the last queries only, aggregates count them all
+        self.assertEqual(len(snapshot['queries']), 3)
+        counts = {aggregate['sql'].startswith('SELECT COUNT'): aggregate['count']
+                  for aggregate in snapshot['fingerprints']}
+        self.assertEqual(counts, {True: 3, False: 2})
+
+        record = snapshot['queries'][-1]
+        self.assertEqual(record['params'], [])
+        self.assertTrue(record['call_site'].startswith('api/tests.py:'))
+        self.assertIsNone(record['view'])
+        self.assertIn('SCAN', record['plan'])
+
+        title_query = next(aggregate for aggregate in snapshot['fingerprints'] if 'title' in aggregate['sql'])
+        self.assertNotIn('secret', str(snapshot))
+        self.assertIn('"api_content"."title" = ?', title_query['sql'])
+
+    def test_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get('/api/slow_queries').status_code, 403)
+
+        self.user.is_superuser = True
+        self.user.save()
+
+        slow_query_log.clear()
+        threshold, slow_query_log.threshold = slow_query_log.threshold, 0
+
+        try:
+            self.client.get('/api/content/search', {'search': 'title'})
+        finally:
+            slow_query_log.threshold = threshold
+
+        response = self.client.get('/api/slow_queries').json()
+
+        search_queries = [query for query in response['queries'] if query['view'] == 'SearchContentView']
+        self.assertTrue(any('<str:7>' in query['params'] for query in search_queries))
+
+        self.client.delete('/api/slow_queries')
+        self.assertEqual(self.client.get('/api/slow_queries').json()['queries'], [])
+
+    def test_log_is_shared_by_processes(self):
+        slow_query_log.clear()
+        # another worker, with its own buffer
+        worker_log = SlowQueryLog(threshold=0, size=10, max_fingerprints=10)
+
+        with connection.execute_wrapper(worker_log):
+            Content.objects.count()
+
+        worker_log.flush()
+
+        snapshot = slow_query_log.get_snapshot()
+        self.assertEqual([query['fingerprint'] for query in snapshot['queries']],
+                         [aggregate['fingerprint'] for aggregate in snapshot['fingerprints']])
+        self.assertTrue(snapshot['queries'][0]['sql'].startswith('SELECT COUNT'))
+
+        stdout = StringIO()
+        call_command('slow_queries', stdout=stdout)
+        self.assertIn(snapshot['queries'][0]['fingerprint'], stdout.getvalue())
+
+    def test_flush_queries_are_not_recorded(self):
+        query_log = SlowQueryLog(threshold=0, size=10, max_fingerprints=10)
+
+        with connection.execute_wrapper(query_log):
+            Content.objects.count()
+            query_log.flush()
+
+        self.assertEqual(len(query_log.pending), 0)
+        self.assertEqual(len(query_log.get_snapshot()['queries']), 1)
+
+
+class AdminChangelistTest(TestCase):
+    """ Test module for admin pages of large tables """
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', email='admin@gmail.com',
+                                         is_superuser=True, is_staff=True)
+        self.client.force_login(self.admin)
+
+    def create_contents(self, count):
+        for index in range(User.objects.count(), User.objects.count() + count):
+            user = User.objects.create(username=f'author {index}', email=f'author{index}@gmail.com')
+            Content.objects.create(user=user, title=f'title {index}', body='body', summary='summary', pdf='pdf')
+
+    def count_changelist_queries(self, path, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path, params)
+
+        self.assertEqual(response.status_code, 200)
+
+        return len(context.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.create_contents(2)
+        queries = self.count_changelist_queries('/admin/api/content/')
+
+        self.create_contents(20)
+        self.assertEqual(self.count_changelist_queries('/admin/api/content/'), queries)
+
+    def test_changelist_search_and_change_form(self):
+        self.create_contents(3)
+        content = Content.objects.first()
+
+        self.assertEqual(self.count_changelist_queries('/admin/api/content/', {'q': content.user.username}),
+                         self.count_changelist_queries('/admin/api/content/', {'q': content.id}))
+
+        response = self.client.get(f'/admin/api/content/{content.id}/change/')
+
+        # users and categories are not rendered as select options
+        self.assertNotContains(response, '<option value="{}"'.format(content.user_id))
+
+    def test_search_uses_indexes(self):
+        self.create_contents(3)
+        content = Content.objects.first()
+        Category.objects.create(title='Python')
+        Category.objects.create(title='python tips')
+
+        def search(admin_class, model, term):
+            model_admin = admin_class(model, admin_site)
+            queryset, _ = model_admin.get_search_results(None, model.objects.all(), term)
+
+            with connection.cursor() as cursor:
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+
+            self.assertNotRegex(plan, r'SCAN (api_content|api_category|auth_user)\b')
+
+            return list(queryset)
+
+        self.assertEqual(search(ContentAdmin, Content, str(content.id)), [content])
+        self.assertEqual(search(ContentAdmin, Content, content.user.username), [content])
+        self.assertEqual(search(ContentAdmin, Content, content.user.username.upper()), [content])
+        self.assertEqual([category.title for category in search(CategoryAdmin, Category, 'python')],
+                         ['Python', 'python tips'])
+        self.assertEqual([category.title for category in search(CategoryAdmin, Category, 'PYTHON T')], ['python tips'])
+        self.assertEqual(search(CategoryAdmin, Category, 'Ruby'), [])
+
+
+class PathScopedMiddlewareTest(TestCase):
+    """ Test module for skipping browser middleware on API paths """
+
+    def test_api_requests_skip_session_and_csrf(self):
+        response = self.client.get('/api/content/search')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+
+        # token authenticated writes need no csrf token
+        user = User.objects.create(username='author', email='author@gmail.com')
+        token = Token.objects.create(user=user)
+
+        client = Client(enforce_csrf_checks=True)
+        response = client.delete('/api/content', {'id': 1}, content_type='application/json',
+                                 HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertNotEqual(response.status_code, 403)
+
+    def test_admin_keeps_session_and_csrf(self):
+        response = self.client.get('/admin/login/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('csrftoken', response.cookies)
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
+
+
+class InvalidationBusTest(TestCase):
+    """ Test module for invalidation events shared between processes """
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@gmail.com')
+
+        # stands for the bus of another worker process
+        self.bus = InvalidationBus()
+        self.cache = InvalidatedCache('content', bus=self.bus)
+        self.bus.poll(force=True)
+
+    def test_poll_delivers_events_of_other_processes(self):
+        with run_on_commit_callbacks():
+            content = Content.objects.create(user=self.user, title='title', body='body', summary='summary')
+            other_content = Content.objects.create(user=self.user, title='title', body='body', summary='summary')
+
+        self.bus.poll(force=True)
+
+        self.cache.set(content.id, 'cached')
+        self.cache.set(other_content.id, 'cached')
+
+        with run_on_commit_callbacks():
+            content.title = 'new title'
+            content.save()
+
+        self.bus.poll(force=True)
+
+        self.assertIsNone(self.cache.get(content.id))
+        self.assertEqual(self.cache.get(other_content.id), 'cached')
+        self.assertGreater(self.bus.get_version('content'), 0)
+
+    def test_events_are_coalesced_per_transaction(self):
+        content = Content.objects.create(user=self.user, title='title', body='body', summary='summary')
+        category = Category.objects.create(title='category')
+        last_event_id = InvalidationEvent.objects.values_list('id', flat=True).last() or 0
+
+        with run_on_commit_callbacks():
+            content.title = 'new title'
+            content.save()
+            content.categories.add(category)
+            content.save()
+
+            # nothing is written before commit
+            self.assertFalse(InvalidationEvent.objects.filter(id__gt=last_event_id).exists())
+
+        events = InvalidationEvent.objects.filter(id__gt=last_event_id).values_list('namespace', 'key')
+        self.assertEqual(list(events), [('content', str(content.id))])
+
+    def test_purge_keeps_recent_events(self):
+        with run_on_commit_callbacks():
+            Category.objects.create(title='category')
+
+        InvalidationEvent.objects.create(namespace='category', key='0')
+        InvalidationEvent.objects.filter(key='0').update(created_at=0)
+
+        call_command('purge_invalidation_events', stdout=StringIO())
+
+        self.assertFalse(InvalidationEvent.objects.filter(key='0').exists())
+        self.assertTrue(InvalidationEvent.objects.filter(namespace='category').exists())
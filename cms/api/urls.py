@@ -1,10 +1,18 @@
-from django.urls import path, include
-from .views import *
+from django.urls import path
+from .views import (LoginOrRegisterUserView, UserContentView, SearchContentView, ContentChangesView,
+                    ContentRevisionView, BulkDeleteContentView, CategoryAutocompleteView, SlowQueryLogView, MetricsView,
+                    TokenView)
 
 urlpatterns = [
     path('login', LoginOrRegisterUserView.as_view(), name="login_or_register_user"),
     path('content', UserContentView.as_view(), name="user_content"),
     path('content/search', SearchContentView.as_view(), name="search_content"),
+    path('content/changes', ContentChangesView.as_view(), name="content_changes"),
+    path('content/revisions', ContentRevisionView.as_view(), name="content_revisions"),
+    path('content/bulk_delete', BulkDeleteContentView.as_view(), name="bulk_delete_content"),
+    path('categories/autocomplete', CategoryAutocompleteView.as_view(), name="category_autocomplete"),
+    path('slow_queries', SlowQueryLogView.as_view(), name="slow_query_log"),
+    path('metrics', MetricsView.as_view(), name="metrics"),
     path('get_token', TokenView.as_view(), name="get_user_token"),
 ]
 
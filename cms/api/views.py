@@ -1,30 +1,45 @@
 import json
+import os
+import time
 
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.db.models import Q
+from django.http import HttpResponse
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework import status as status_codes
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 
-from .models import Profile, Content, Category
+from .models import Profile, Content, ArchivedContent, Category, ContentCounter, ContentRevision, ContentTombstone, \
+    BulkDeleteJob, TokenActivity
+from .authentication import ExpiringTokenAuthentication
+from .fragments import content_fragment_cache
+from .indexes import category_index
 from .mixins import TransactionMixin
-from .serializers import UserProfileSerializer, ContentSerializer
+from .serializers import UserProfileSerializer, ContentSerializer, ContentSnippetSerializer, ContentRevisionSerializer, \
+    BulkDeleteJobSerializer
 from .field_validators import validate_email, validate_password
 
+from utilities.db_utilities import DatabaseUtilities
 from utilities.request_utilities import RequestUtilities
+from utilities.number_utilities import NumberUtilities
 from utilities.exception_utilities import CustomException
 from utilities.pagination_utilities import PaginationUtilities
+from utilities.password_utilities import password_hasher_pool
+from utilities.query_log_utilities import slow_query_log
 
 
 # Create your views here.
 
 
-class LoginOrRegisterUserView(TransactionMixin, APIView):
+# no TransactionMixin, registration hashes the password before its write transaction begins,
+# a transaction holding the write lock while hashing would block every other writer
+class LoginOrRegisterUserView(APIView):
 
     def post(self, request, *args, **kwargs):
 
@@ -57,36 +72,43 @@ class LoginOrRegisterUserView(TransactionMixin, APIView):
             raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
 
         user = User.get_user_by_email_or_none(email=email)
+        encoded_password = None
 
         if user is None:
-            # giving unique username for user by adding email to the username,
-            # if email already exists, then user will directly login
-            user_name = f"{first_name}_{last_name}_{email}"
-            user = User.objects.create(username=user_name,
-                                       email=email,
-                                       first_name=first_name,
-                                       last_name=last_name
-                                       )
-            # user is created
-            # setting the raw password to user
-            user.set_password(password)
-            user.save()
-
             # validate the received data for creating profile
             self.validate_registration_data(post_data)
 
-            # creating user progile
-            profile = self.create_profile(post_data, user)
+            # password is hashed by the hasher pool, outside of the write transaction
+            encoded_password = password_hasher_pool.make_password(password)
 
-            # serializing profile
-            serialized_profile = UserProfileSerializer(profile, many=False).data
+        with DatabaseUtilities.immediate_atomic():
+            if user is None:
+                # looked up again under the write lock, the user may have registered meanwhile
+                user = User.get_user_by_email_or_none(email=email)
 
-        else:
-            # serializing profile
-            serialized_profile = UserProfileSerializer(user.profile, many=False).data
+            if user is None:
+                # giving unique username for user by adding email to the username,
+                # if email already exists, then user will directly login
+                user_name = f"{first_name}_{last_name}_{email}"
+                user = User.objects.create(username=user_name,
+                                           email=email,
+                                           first_name=first_name,
+                                           last_name=last_name,
+                                           password=encoded_password
+                                           )
+
+                # creating user progile
+                profile = self.create_profile(post_data, user)
 
-        # get user token for authentication purpose
-        token = ViewHelper.get_user_token(user)
+                # serializing profile
+                serialized_profile = UserProfileSerializer(profile, many=False).data
+
+            else:
+                # serializing profile
+                serialized_profile = UserProfileSerializer(user.profile, many=False).data
+
+            # get user token for authentication purpose
+            token = ViewHelper.get_user_token(user)
 
         response = {
             'success': True,
@@ -165,9 +187,15 @@ class LoginOrRegisterUserView(TransactionMixin, APIView):
 class UserContentView(TransactionMixin, APIView):
     """ inheriting API view class for using class based views in django """
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [ExpiringTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    # maximum number of ids accepted by a single batch fetch
+    max_batch_size = 100
+
+    # fields serialized when no fields param is sent, pdf is left out of listings
+    default_fields = ('id', 'user', 'title', 'body', 'summary', 'categories', 'created_at', 'updated_at')
+
     def get(self, request, *args, **kwargs):
         user = request.user
 
@@ -175,24 +203,43 @@ class UserContentView(TransactionMixin, APIView):
 
         user_id = query_params.get('user_id', None)
         content_id = query_params.get('content_id', None)
+        content_ids = query_params.get('content_ids', None)
 
-        page_no = query_params.get('page', 1)
-        page_size = query_params.get("page_size", 10)
+        # sparse fieldset, only these fields are read and serialized
+        fields = ViewHelper.get_content_fields(query_params, self.default_fields)
+
+        if content_ids is not None:
+            # batch fetch of contents, in the requested order
+            response = {
+                'success': True,
+                'contents': self.get_contents_batch(user, self.parse_content_ids(content_ids), fields)
+            }
+
+            return Response(response)
 
         # get contents according to the logged in user
-        contents = self.get_contents(user, user_id, content_id)
+        contents = self.get_contents(user, user_id, content_id).with_fields(fields)
+        # filter on created_at / updated_at ranges
+        contents, is_filtered = ViewHelper.filter_by_time_range(contents, query_params)
 
-        # paginate the results
-        paged_contents = PaginationUtilities.paginate_results(contents, page_no, page_size)
-        # serialize content
-        serialized_contents = ContentSerializer(paged_contents, many=True).data
+        # total count from content counters, instead of counting the queryset
+        def get_count():
+            return None if is_filtered else self.get_contents_count(user, user_id, content_id)
 
-        response = {
-            'success': True,
-            'contents': serialized_contents
-        }
+        # archived contents are read only when asked for
+        if RequestUtilities.get_boolean_query_param(request, 'include_archived'):
+            archived_contents = self.get_contents(user, user_id, content_id, ArchivedContent).with_fields(fields)
+            archived_contents, _ = ViewHelper.filter_by_time_range(archived_contents, query_params)
 
-        return Response(response)
+            paged_contents, next_cursor = ViewHelper.paginate_content_tiers([contents, archived_contents],
+                                                                            query_params)
+        else:
+            # paginate the results
+            paged_contents, next_cursor = ViewHelper.paginate_contents(contents, query_params, get_count)
+        # serialized contents are spliced from cached fragments, only contents missing from the cache are serialized
+        rendered_contents = content_fragment_cache.render(list(paged_contents), fields)
+
+        return ViewHelper.get_contents_response(request, rendered_contents, next_cursor)
 
     def post(self, request, *args, **kwargs):
         user = request.user
@@ -250,11 +297,11 @@ class UserContentView(TransactionMixin, APIView):
 
         content_instance = Content.get_content_with_id_or_raise_exception(content_id)
         # check if logged in user is content creator or admin
-        if user.id == content_instance.user.id or user.is_superuser:
-            # get category instances list
-            category_instance_list = self.get_categories(json.loads(categories))
+        if user.id == content_instance.user_id or user.is_superuser:
+            # get category instances list, categories are left as they are if not sent
+            category_instance_list = self.get_categories(json.loads(categories)) if categories is not None else None
             # update the content data
-            self.update_content(content_instance, title, body, summary, pdf, category_instance_list)
+            self.update_content(content_instance, title, body, summary, pdf, category_instance_list, user)
 
             response = {
                 'success': True,
@@ -287,7 +334,7 @@ class UserContentView(TransactionMixin, APIView):
         content_instance = Content.get_content_with_id_or_raise_exception(content_id)
 
         # check if logged in user is content creator or admin
-        if user.id == content_instance.user.id or user.is_superuser:
+        if user.id == content_instance.user_id or user.is_superuser:
             # delete content
             content_instance.delete()
 
@@ -355,10 +402,21 @@ class UserContentView(TransactionMixin, APIView):
         """
         returns  list of category instances, based on give input list
         """
+        # fetch existing categories in one query, create only the missing ones
+        existing_categories = {
+            category_instance.title: category_instance
+            for category_instance in Category.objects.filter(title__in=categories)
+        }
+
         instance_list = []
 
         for category in categories:
-            category_instance, created = Category.objects.get_or_create(title=category)
+            category_instance = existing_categories.get(category, None)
+
+            if category_instance is None:
+                category_instance, created = Category.objects.get_or_create(title=category)
+                existing_categories[category] = category_instance
+
             instance_list.append(category_instance)
 
         return instance_list
@@ -373,31 +431,67 @@ class UserContentView(TransactionMixin, APIView):
                           summary=summary,
                           pdf=pdf)
 
-        content.validate_date_and_raise_exception()
+        # user is the logged in user, no need to check it exists
+        content.validate_date_and_raise_exception(exclude=['user'])
         content.save()
 
         content.categories.add(*category_instance_list)
-        content.save()
 
         return content
 
-    def update_content(self, content_instance, title, body, summary, pdf, category_instance_list) -> None:
+    def update_content(self, content_instance, title, body, summary, pdf, category_instance_list, user=None) -> None:
 
         """
         updates the content data and saves it
+        only modified columns are written, nothing is written if nothing changed
+        user is recorded as the author of the revision
         """
 
         content_instance.title = title if title else content_instance.title
         content_instance.body = body if body else content_instance.body
         content_instance.summary = summary if summary else content_instance.summary
-        content_instance.pdf = pdf if pdf else content_instance.pdf
+
+        # pdf is read from its blob, only assign it when sent
+        if pdf:
+            content_instance.pdf = pdf
+
+        categories_changed = False
 
         if category_instance_list is not None:
-            content_instance.categories.set(category_instance_list)
+            categories_changed = self.update_categories(content_instance, category_instance_list)
 
-        content_instance.validate_date_and_raise_exception()
+        dirty_fields = content_instance.get_dirty_fields()
 
-        content_instance.save()
+        if dirty_fields:
+            content_instance.validate_date_and_raise_exception(fields=dirty_fields)
+            content_instance.save(revision_user_id=user.id if user is not None else None)
+
+        elif categories_changed:
+            # keep updated_at current, change feed relies on it
+            content_instance.touch()
+
+    def update_categories(self, content_instance, category_instance_list) -> bool:
+        """
+        links content to given categories, touching only links which changed
+        returns False if content already had exactly these categories
+        """
+        current_ids = set(content_instance.categories.values_list('id', flat=True))
+        new_ids = {category_instance.id for category_instance in category_instance_list}
+
+        if current_ids == new_ids:
+            return False
+
+        removed_ids = current_ids - new_ids
+        added_categories = [category_instance for category_instance in category_instance_list
+                            if category_instance.id not in current_ids]
+
+        if removed_ids:
+            content_instance.categories.remove(*removed_ids)
+
+        if added_categories:
+            content_instance.categories.add(*added_categories)
+
+        return True
 
     def get_serialized_content(self, content):
         """
@@ -405,52 +499,202 @@ class UserContentView(TransactionMixin, APIView):
         """
         return ContentSerializer(content, many=False).data
 
-    def get_contents(self, user, user_id, content_id):
+    def get_contents(self, user, user_id, content_id, model=Content):
         """
         returns content based on logged in user
         if admin, sned every one's content
         else, send content of logged in user only
+        model is Content, or ArchivedContent for archived contents
         """
         if user.is_superuser:
             if user_id is not None:
-                contents = Content.objects.filter(user_id=user_id)
+                contents = model.objects.filter(user_id=user_id)
 
             elif content_id is not None:
-                contents = Content.objects.filter(pk=content_id)
+                contents = model.objects.filter(pk=content_id)
 
             else:
-                contents = Content.objects.all()
+                contents = model.objects.all()
 
         else:
             if content_id is not None:
-                contents = Content.objects.filter(pk=content_id, user=user)
+                contents = model.objects.filter(pk=content_id, user=user)
+
+            else:
+                contents = model.objects.filter(user=user)
+
+        return contents
 
+    def parse_content_ids(self, content_ids) -> list:
+        """
+        parses comma separated content ids, keeping the order and dropping duplicates
+        raises exception if an id is invalid or too many ids are received
+        """
+        parsed_ids = []
+
+        for content_id in content_ids.split(','):
+            parsed_id = NumberUtilities.get_integer_from_string(content_id.strip(), return_default=None)
+
+            if parsed_id is None:
+                response = ViewHelper.get_error_context(False, f'Invalid content id {content_id}')
+
+                raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+            parsed_ids.append(parsed_id)
+
+        parsed_ids = list(dict.fromkeys(parsed_ids))
+
+        if len(parsed_ids) > self.max_batch_size:
+            response = ViewHelper.get_error_context(False, f'At most {self.max_batch_size} content ids are allowed')
+
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+        return parsed_ids
+
+    def get_contents_batch(self, user, content_ids, fields) -> list:
+        """
+        returns one result per requested id, in the requested order
+        missing contents and contents of other users (for non admin) are reported per item
+        """
+        contents = Content.objects.filter(pk__in=content_ids).with_fields(fields)
+
+        # same rules as get_contents, admin can see every one's content
+        allowed_contents = []
+        forbidden_ids = set()
+
+        for content in contents:
+            if user.is_superuser or content.user_id == user.id:
+                allowed_contents.append(content)
             else:
-                contents = Content.objects.filter(user=user)
+                forbidden_ids.add(content.id)
 
-        return contents.prefetch_related('categories')
+        serialized_contents = {
+            serialized_content['id']: serialized_content
+            for serialized_content in ContentSerializer(allowed_contents, many=True, fields=fields).data
+        }
+
+        results = []
+
+        for content_id in content_ids:
+            if content_id in serialized_contents:
+                result = {'id': content_id, 'success': True, 'content': serialized_contents[content_id]}
+
+            elif content_id in forbidden_ids:
+                result = ViewHelper.get_error_context(False, 'only author or admin can view content')
+                result['id'] = content_id
+
+            else:
+                result = ViewHelper.get_error_context(False, f'Content with id {content_id} does not exist :(')
+                result['id'] = content_id
+
+            results.append(result)
+
+        return results
+
+    @staticmethod
+    def get_contents_count(user, user_id, content_id):
+        """
+        returns total number of contents visible to logged in user, read from content counters
+        returns None when the count can't be taken from counters (single content lookup)
+        """
+        if content_id is not None:
+            return None
+
+        if user.is_superuser:
+            return ContentCounter.get_count_or_none(user_id)
+
+        return ContentCounter.get_count_or_none(user.id)
 
 
 class SearchContentView(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [ExpiringTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    # fields serialized when no fields param is sent, pdf is left out of search results
+    default_fields = ('id', 'user', 'title', 'body', 'summary', 'categories', 'created_at', 'updated_at')
+
+    # fields read in snippet mode, snippet itself is cut from body by the database
+    snippet_fields = ('id', 'title', 'categories')
+
+    modes = ('full', 'snippet')
+
     def get(self, request, *args, **kwargs):
         user = request.user
 
         query_params = request.query_params
 
         search = query_params.get('search', None)
+        # full mode serializes contents, snippet mode only id, title, categories and a snippet around the match
+        mode = query_params.get('mode', 'full')
+        # estimated count mode, uses content counters as upper bound of search results
+        estimated_count = RequestUtilities.get_boolean_query_param(request, 'estimated_count')
 
-        page_no = query_params.get('page', 1)
-        page_size = query_params.get("page_size", 10)
+        if mode not in self.modes:
+            response = ViewHelper.get_error_context(False, f'Invalid mode {mode}')
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+        # sparse fieldset, only these fields are read and serialized
+        fields = ViewHelper.get_content_fields(query_params, self.default_fields)
+
+        def get_matching_contents(model):
+            contents = self.get_contents(user, search, model)
+
+            if mode == 'snippet':
+                return contents.with_fields(self.snippet_fields) \
+                    .with_snippets(search, settings.SEARCH_SNIPPET_LENGTH)
+
+            return contents.with_fields(fields)
+
+        # filter on created_at / updated_at ranges
+        contents, is_filtered = ViewHelper.filter_by_time_range(get_matching_contents(Content), query_params)
+
+        def get_count():
+            if (search is None and not is_filtered) or estimated_count:
+                return UserContentView.get_contents_count(user, None, None)
 
+            return None
+
+        # archived contents are searched only when asked for
+        if RequestUtilities.get_boolean_query_param(request, 'include_archived'):
+            archived_contents, _ = ViewHelper.filter_by_time_range(get_matching_contents(ArchivedContent),
+                                                                   query_params)
+
+            paged_contents, next_cursor = ViewHelper.paginate_content_tiers([contents, archived_contents],
+                                                                            query_params)
+        else:
+            # paginate content, based on page number or cursor
+            paged_contents, next_cursor = ViewHelper.paginate_contents(contents, query_params, get_count)
+
+        if mode != 'snippet':
+            # serialized contents are spliced from cached fragments
+            rendered_contents = content_fragment_cache.render(list(paged_contents), fields)
+
+            return ViewHelper.get_contents_response(request, rendered_contents, next_cursor)
+
+        # snippets depend on the search key, they are serialized for every request
+        serialized_contents = ContentSnippetSerializer(paged_contents, many=True, context={'search': search}).data
+
+        response = {
+            'success': True,
+            'contents': serialized_contents
+        }
+
+        if next_cursor is not None:
+            response['next_cursor'] = next_cursor
+
+        return Response(response)
+
+    def get_contents(self, user, search, model=Content):
+        """
+        returns contents of logged in user (every one's for admin) matching the search key
+        model is Content, or ArchivedContent for archived contents
+        """
         if user.is_superuser:
             # if super user, send all user's content
-            contents = Content.objects.all()
+            contents = model.objects.all()
         else:
             # send only authenticated user's content
-            contents = Content.objects.filter(user=user)
+            contents = model.objects.filter(user=user)
 
         if search is not None:
             # search content data, based on search key
@@ -458,22 +702,342 @@ class SearchContentView(APIView):
                                        Q(body__icontains=search) |
                                        Q(summary__icontains=search) |
                                        Q(categories__title__icontains=search)) \
-                .prefetch_related('categories')\
                 .distinct()
 
-        # paginate content, based on page number
-        paged_contents = PaginationUtilities.paginate_results(contents, page_no, page_size)
+        return contents
 
-        # serialize content data
-        serialized_contents = ContentSerializer(paged_contents, many=True).data
+
+class ContentChangesView(TransactionMixin, APIView):
+    """
+    incremental change feed, returns contents updated and ids deleted after the given watermark
+    """
+
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        user = request.user
+
+        query_params = request.query_params
+
+        since = NumberUtilities.get_integer_from_string(query_params.get('since', None), return_default=0)
+        limit = NumberUtilities.get_integer_from_string(query_params.get('limit', None),
+                                                        return_default=settings.CONTENT_CHANGES_PAGE_SIZE)
+        limit = min(max(limit, 1), settings.CONTENT_CHANGES_MAX_PAGE_SIZE)
+
+        current_time = int(time.time())
+
+        # tombstones older than retention may be purged already,
+        # so deletions since the watermark can't be reported anymore
+        if 0 < since < current_time - settings.CONTENT_TOMBSTONE_RETENTION:
+            response = {
+                'success': True,
+                'full_resync': True
+            }
+
+            return Response(response)
+
+        # only serve changes which are old enough to be committed
+        until = max(current_time - settings.CONTENT_CHANGES_SETTLE_TIME, since)
+
+        contents, tombstones, watermark, has_more = self.get_changes(user, since, until, limit)
 
         response = {
             'success': True,
-            'contents': serialized_contents
+            'full_resync': False,
+            'watermark': watermark,
+            'has_more': has_more,
+            'contents': ContentSerializer(contents, many=True).data,
+            'deleted': [tombstone.content_id for tombstone in tombstones]
+        }
+
+        return Response(response)
+
+    def get_changes(self, user, since, until, limit):
+        """
+        returns changed contents, tombstones, new watermark and whether more changes are pending
+        changes are cut at a second boundary, so that resuming from the watermark never skips a change
+        """
+        contents = Content.objects.with_related()
+        tombstones = ContentTombstone.objects.all()
+
+        if not user.is_superuser:
+            contents = contents.filter(user=user)
+            tombstones = tombstones.filter(user_id=user.id)
+
+        contents = contents.filter(updated_at__gt=since, updated_at__lte=until).order_by('updated_at', 'id')
+        tombstones = tombstones.filter(deleted_at__gt=since, deleted_at__lte=until).order_by('deleted_at', 'id')
+
+        changed_contents = list(contents[:limit + 1])
+        deleted_contents = list(tombstones[:limit + 1])
+
+        change_times = sorted([content.updated_at for content in changed_contents] +
+                              [tombstone.deleted_at for tombstone in deleted_contents])
+
+        if len(change_times) <= limit:
+            return changed_contents, deleted_contents, until, False
+
+        # first change which does not fit in this page
+        boundary = change_times[limit]
+
+        if change_times[0] == boundary:
+            # a single second holds more than limit changes, send that whole second
+            changed_contents = list(contents.filter(updated_at=boundary))
+            deleted_contents = list(tombstones.filter(deleted_at=boundary))
+
+            return changed_contents, deleted_contents, boundary, True
+
+        changed_contents = [content for content in changed_contents if content.updated_at < boundary]
+        deleted_contents = [tombstone for tombstone in deleted_contents if tombstone.deleted_at < boundary]
+
+        return changed_contents, deleted_contents, boundary - 1, True
+
+
+class BulkDeleteContentView(TransactionMixin, APIView):
+    """
+    lets admin enqueue deletion of many contents and follow its progress,
+    the deletion itself is done in batches by the run_bulk_delete_jobs command
+    """
+
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        self.validate_admin(request.user)
+
+        job_id = request.query_params.get('job_id', None)
+
+        try:
+            job = BulkDeleteJob.objects.get(pk=job_id)
+        except:
+            response = ViewHelper.get_error_context(False, f'Bulk delete job with id {job_id} does not exist :(')
+
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+        response = {
+            'success': True,
+            'job': BulkDeleteJobSerializer(job, many=False).data
+        }
+
+        return Response(response)
+
+    def post(self, request, *args, **kwargs):
+        user = request.user
+
+        self.validate_admin(user)
+
+        post_data = RequestUtilities.get_post_data(request)
+
+        if post_data is None:
+            response = ViewHelper.get_error_context(False, 'Invalid params')
+
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+        user_id = post_data.get('user_id', None)
+        category = post_data.get('category', None)
+        older_than = post_data.get('older_than', None)
+
+        # at least one filter is required, never wipe out every content
+        if user_id is None and category is None and older_than is None:
+            response = ViewHelper.get_error_context(False, 'send user_id, category or older_than in post params')
+
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+        job = BulkDeleteJob(requested_by=user)
+
+        if user_id is not None:
+            job.target_user_id = User.get_user_or_raise_exception(user_id).id
+
+        if category is not None:
+            job.category_id = self.get_category_or_raise_exception(category).id
+
+        if older_than is not None:
+            job.older_than = NumberUtilities.get_integer_from_string(older_than, return_default=None)
+
+            if job.older_than is None:
+                response = ViewHelper.get_error_context(False, f'Invalid older_than {older_than}')
+
+                raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+        job.save()
+
+        response = {
+            'success': True,
+            'job': BulkDeleteJobSerializer(job, many=False).data
+        }
+
+        return Response(response)
+
+    def validate_admin(self, user):
+        if not user.is_superuser:
+            response = ViewHelper.get_error_context(False, 'only admin can delete contents in bulk')
+
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+    def get_category_or_raise_exception(self, title):
+        try:
+            return Category.objects.get(title=title)
+        except:
+            response = ViewHelper.get_error_context(False, f'Category {title} does not exist :(')
+
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+
+class ContentRevisionView(APIView):
+    """
+    lists revisions of a content newest first, or returns the content as it was at one revision
+    """
+
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        user = request.user
+
+        query_params = request.query_params
+
+        content_id = NumberUtilities.get_integer_from_string(query_params.get('content_id', None), return_default=None)
+
+        self.validate_content_author(user, content_id)
+
+        if query_params.get('number', None) is not None:
+            number = NumberUtilities.get_integer_from_string(query_params.get('number'), return_default=0)
+            revision = ContentRevision.get_version(content_id, number) if number > 0 else None
+
+            if revision is None:
+                response = ViewHelper.get_error_context(False, f'Revision {number} of content {content_id} '
+                                                               f'does not exist :(')
+
+                raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+            response = {
+                'success': True,
+                'revision': revision
+            }
+
+            return Response(response)
+
+        page_no = query_params.get('page', 1)
+        page_size = query_params.get('page_size', 10)
+
+        # data is not needed to list revisions
+        revisions = ContentRevision.objects.filter(content_id=content_id).defer('data').order_by('-number')
+
+        response = {
+            'success': True,
+            'revisions': ContentRevisionSerializer(PaginationUtilities.paginate_results(revisions, page_no, page_size),
+                                                   many=True).data
+        }
+
+        return Response(response)
+
+    def validate_content_author(self, user, content_id):
+        """
+        revisions of hot and archived contents are readable by their author and admin
+        """
+        author_id = None
+
+        if content_id is not None:
+            author_id = Content.objects.filter(pk=content_id).values_list('user_id', flat=True).first() or \
+                ArchivedContent.objects.filter(pk=content_id).values_list('user_id', flat=True).first()
+
+        if author_id is None:
+            response = ViewHelper.get_error_context(False, f'Content with id {content_id} does not exist :(')
+
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+        if user.id != author_id and not user.is_superuser:
+            response = ViewHelper.get_error_context(False, 'only author or admin can read revisions of content')
+
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+
+class CategoryAutocompleteView(APIView):
+    """
+    suggests existing categories whose title starts with prefix, most used first,
+    answered from the in process category index
+    """
+
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        query_params = request.query_params
+
+        prefix = query_params.get('prefix', '').strip()
+        limit = NumberUtilities.get_integer_from_string(query_params.get('limit', None),
+                                                        return_default=settings.CATEGORY_AUTOCOMPLETE_SIZE)
+        limit = min(max(limit, 1), settings.CATEGORY_AUTOCOMPLETE_MAX_SIZE)
+
+        suggestions = category_index.suggest(prefix, limit) if prefix else []
+
+        response = {
+            'success': True,
+            'categories': [{'id': category_id, 'title': title, 'usage': usage}
+                           for category_id, title, usage in suggestions]
+        }
+
+        return Response(response)
+
+
+class SlowQueryLogView(APIView):
+    """
+    lets admin read and clear the slow query log, shared by every process
+    """
+
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        self.validate_admin(request.user)
+
+        response = {
+            'success': True,
+            **slow_query_log.get_snapshot()
+        }
+
+        return Response(response)
+
+    def delete(self, request, *args, **kwargs):
+        self.validate_admin(request.user)
+
+        slow_query_log.clear()
+
+        return Response({'success': True})
+
+    def validate_admin(self, user):
+        if not user.is_superuser:
+            response = ViewHelper.get_error_context(False, 'only admin can read the slow query log')
+
+            raise CustomException(response, status_code=status_codes.HTTP_403_FORBIDDEN)
+
+
+class MetricsView(APIView):
+    """
+    lets admin read metrics of the process serving the request
+    """
+
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        self.validate_admin(request.user)
+
+        response = {
+            'success': True,
+            'pid': os.getpid(),
+            'password_hasher': password_hasher_pool.get_metrics(),
+            'content_fragment_cache': content_fragment_cache.get_metrics()
         }
 
         return Response(response)
 
+    def validate_admin(self, user):
+        if not user.is_superuser:
+            response = ViewHelper.get_error_context(False, 'only admin can read metrics')
+
+            raise CustomException(response, status_code=status_codes.HTTP_403_FORBIDDEN)
+
 
 class TokenView(APIView):
 
@@ -486,8 +1050,8 @@ class TokenView(APIView):
         # check if any user exists with given email
         user = User.get_user_by_email_or_none(email)
 
-        # validate user's password
-        if user is not None and user.check_password(password):
+        # validate user's password, hashing runs in the hasher pool
+        if user is not None and password_hasher_pool.check_password(user, password):
             # get user token
             token = ViewHelper.get_user_token(user)
 
@@ -503,6 +1067,21 @@ class TokenView(APIView):
 
 
 class ViewHelper:
+
+    # fields which can be requested with the fields param
+    content_fields = ('id', 'user', 'title', 'body', 'summary', 'pdf', 'categories', 'created_at', 'updated_at')
+
+    # sort keys accepted by content listing and search
+    content_sort_fields = ('id', '-id', 'created_at', '-created_at', 'updated_at', '-updated_at')
+
+    # query param to lookup, for filtering contents on time ranges
+    content_time_range_filters = {
+        'created_from': 'created_at__gte',
+        'created_to': 'created_at__lte',
+        'updated_from': 'updated_at__gte',
+        'updated_to': 'updated_at__lte',
+    }
+
     @staticmethod
     def get_error_context(success=False, error=''):
         return {
@@ -510,11 +1089,152 @@ class ViewHelper:
             'error_message': error
         }
 
+    @staticmethod
+    def get_content_fields(query_params, default_fields):
+        """
+        returns content fields requested by comma separated fields param, default fields if not sent
+        raises exception on unknown fields
+        """
+        fields = query_params.get('fields', None)
+
+        if not fields:
+            return list(default_fields)
+
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown_fields = set(fields) - set(ViewHelper.content_fields)
+
+        if unknown_fields:
+            response = ViewHelper.get_error_context(False, f'Invalid fields {", ".join(sorted(unknown_fields))}')
+
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+        # id is always sent, clients need it to identify the content
+        return ['id'] + [field for field in fields if field != 'id']
+
+    @staticmethod
+    def filter_by_time_range(contents, query_params):
+        """
+        filters contents on created_at / updated_at ranges given in query params (epoch seconds)
+        returns filtered contents and whether any filter was applied
+        """
+        lookups = {}
+
+        for param, lookup in ViewHelper.content_time_range_filters.items():
+            value = query_params.get(param, None)
+
+            if value is None:
+                continue
+
+            timestamp = NumberUtilities.get_integer_from_string(value, return_default=None)
+
+            if timestamp is None:
+                response = ViewHelper.get_error_context(False, f'Invalid {param}, expected epoch seconds')
+
+                raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+            lookups[lookup] = timestamp
+
+        if not lookups:
+            return contents, False
+
+        return contents.filter(**lookups), True
+
+    @staticmethod
+    def get_sort_field(query_params):
+        """
+        returns whitelisted sort field from query params, defaults to newest first
+        """
+        sort_field = query_params.get('sort', '-id')
+
+        if sort_field not in ViewHelper.content_sort_fields:
+            response = ViewHelper.get_error_context(False, f'Invalid sort {sort_field}')
+
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+        return sort_field
+
+    @staticmethod
+    def paginate_contents(contents, query_params, get_count=None):
+        """
+        paginates contents on the requested sort field
+        uses keyset pagination when a cursor param is sent, page numbers otherwise
+        get_count returns total count for page numbers (None to count the queryset),
+        it is not called for keyset pagination
+        returns page of contents and cursor of next page (None for page numbers or last page)
+        """
+        page_size = query_params.get("page_size", 10)
+        sort_field = ViewHelper.get_sort_field(query_params)
+
+        if 'cursor' in query_params:
+            return PaginationUtilities.paginate_keyset(contents, sort_field, query_params.get('cursor'), page_size)
+
+        page_no = query_params.get('page', 1)
+
+        contents = contents.order_by(sort_field, '-id' if sort_field.startswith('-') else 'id')
+
+        count = get_count() if get_count is not None else None
+
+        return PaginationUtilities.paginate_results(contents, page_no, page_size, count=count), None
+
+    @staticmethod
+    def get_contents_response(request, rendered_contents, next_cursor=None):
+        """
+        response of a content list rendered by the fragment cache, the list is spliced into the response json
+        as is, rather than being parsed and rendered again
+        other renderers negotiated for the request (browsable api, indented json) get the parsed list
+        """
+        renderer = request.accepted_renderer
+
+        if type(renderer) is not JSONRenderer or \
+                renderer.get_indent(request.accepted_media_type, {'request': request}) is not None:
+            response = {
+                'success': True,
+                'contents': json.loads(rendered_contents)
+            }
+
+            if next_cursor is not None:
+                response['next_cursor'] = next_cursor
+
+            return Response(response)
+
+        body = b'{"success":true,"contents":' + rendered_contents
+
+        if next_cursor is not None:
+            body += b',"next_cursor":' + content_fragment_cache.renderer.render(next_cursor)
+
+        return HttpResponse(body + b'}', content_type=renderer.media_type)
+
+    @staticmethod
+    def paginate_content_tiers(tiers, query_params):
+        """
+        paginates contents of several tables (hot and archived contents) merged on the requested sort field,
+        like paginate_contents, page numbers come without total count
+        """
+        page_size = query_params.get("page_size", 10)
+        sort_field = ViewHelper.get_sort_field(query_params)
+
+        if 'cursor' in query_params:
+            return PaginationUtilities.paginate_keyset_merged(tiers, sort_field, query_params.get('cursor'),
+                                                              page_size)
+
+        return PaginationUtilities.paginate_merged(tiers, sort_field, query_params.get('page', 1), page_size), None
+
     @staticmethod
     def get_user_token(user):
         """
         returns user's token if already exist, else creates a token and return the token
+        expired tokens are replaced, so are all tokens when TOKEN_ROTATE_ON_LOGIN is set
         """
-        token, created = Token.objects.get_or_create(user=user)
+        token = Token.objects.select_related('activity').filter(user=user).first()
+
+        if token is not None and (settings.TOKEN_ROTATE_ON_LOGIN or TokenActivity.is_expired(token)):
+            token.delete()
+            token = None
+
+        if token is None:
+            token = Token.objects.create(user=user)
+
+            current_time = time.time()
+            TokenActivity.objects.create(token=token, created_at=current_time, last_used=current_time)
 
         return token.key
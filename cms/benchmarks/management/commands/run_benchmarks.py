@@ -0,0 +1,75 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from benchmarks.runner import BenchmarkRegistry, BenchmarkRunner
+
+
+class Command(BaseCommand):
+    help = 'Runs the microbenchmarks on a freshly seeded in-memory database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', default=None, help='run only benchmarks with this text in their name')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--repetitions', type=int, default=30)
+        parser.add_argument('--rows', type=int, default=2000, help='contents in the seeded dataset')
+        parser.add_argument('--output', default=None, help='write results as JSON to this file')
+        parser.add_argument('--compare', default=None, help='JSON results of an earlier run to compare with')
+
+    def handle(self, *args, **options):
+        # registers the benchmarks
+        from benchmarks import suites
+
+        benchmarks = BenchmarkRegistry.get_benchmarks(options['filter'])
+        runner = BenchmarkRunner(warmup=options['warmup'], repetitions=options['repetitions'])
+
+        baseline = None
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)['results']
+
+        # test database of SQLite is in memory, the real database is never touched
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        try:
+            dataset = suites.seed_dataset(rows=options['rows'])
+
+            results = {}
+
+            self.stdout.write(f'{"benchmark":<40}{"median us":>12}{"p90 us":>12}{"p99 us":>12}{"stdev":>10}'
+                              f'{"change":>10}')
+
+            for name, (setup, number) in benchmarks.items():
+                results[name] = runner.run(setup(dataset), number=number)
+                self.stdout.write(self.format_result(name, results[name], baseline))
+
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['output']:
+            report = {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'rows': options['rows'],
+                'warmup': options['warmup'],
+                'repetitions': options['repetitions'],
+                'results': results,
+            }
+
+            with open(options['output'], 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+
+    @staticmethod
+    def format_result(name, result, baseline=None):
+        change = ''
+
+        if baseline is not None and name in baseline:
+            # relative change of the median against the earlier run
+            change = f'{(result["median"] / baseline[name]["median"] - 1) * 100:+.1f}%'
+
+        return (f'{name:<40}{result["median"]:>12.1f}{result["p90"]:>12.1f}{result["p99"]:>12.1f}'
+                f'{result["stdev"]:>10.1f}{change:>10}')
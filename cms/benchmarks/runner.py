@@ -0,0 +1,84 @@
+import gc
+import statistics
+import time
+
+
+class BenchmarkRegistry:
+    """
+    keeps benchmarks registered with the benchmark decorator, in registration order
+    """
+
+    benchmarks = {}
+
+    @staticmethod
+    def register(name, number=1):
+        """
+        decorator registering a benchmark
+        the decorated function receives the seeded dataset, does its setup
+        and returns the callable which is timed, called number times per sample
+        """
+        def decorator(function):
+            BenchmarkRegistry.benchmarks[name] = (function, number)
+            return function
+
+        return decorator
+
+    @staticmethod
+    def get_benchmarks(name_filter=None):
+        return {
+            name: benchmark
+            for name, benchmark in BenchmarkRegistry.benchmarks.items()
+            if name_filter is None or name_filter in name
+        }
+
+
+benchmark = BenchmarkRegistry.register
+
+
+class BenchmarkRunner:
+
+    def __init__(self, warmup=5, repetitions=30):
+        self.warmup = warmup
+        self.repetitions = repetitions
+
+    def run(self, function, number=1) -> dict:
+        """
+        times function, returns statistics of one call in microseconds
+        """
+        for _ in range(self.warmup):
+            function()
+
+        samples = []
+
+        # garbage collection pauses would add noise to single samples
+        gc_enabled = gc.isenabled()
+        gc.disable()
+
+        try:
+            for _ in range(self.repetitions):
+                start = time.perf_counter()
+
+                for _ in range(number):
+                    function()
+
+                samples.append((time.perf_counter() - start) / number * 1000000)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        return self.get_statistics(samples)
+
+    @staticmethod
+    def get_statistics(samples) -> dict:
+        percentiles = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+
+        return {
+            'samples': len(samples),
+            'min': min(samples),
+            'mean': statistics.mean(samples),
+            'median': statistics.median(samples),
+            'p90': percentiles[89],
+            'p99': percentiles[98],
+            'max': max(samples),
+            'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        }
@@ -0,0 +1,253 @@
+"""
+Microbenchmarks of the hot functions of the project.
+
+Every benchmark gets the dataset seeded by seed_dataset, does its setup
+outside of the timed part and returns the callable to time.
+"""
+
+import itertools
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from api.field_validators import validate_email, validate_password, validate_phone_no, validate_pincode
+from api.fragments import content_fragment_cache
+from api.indexes import category_index
+from api.models import Profile, Category, Content, ContentRevision, PdfBlob
+from api.serializers import ContentSerializer, UserProfileSerializer
+from api.views import UserContentView, SearchContentView
+
+from utilities.pagination_utilities import PaginationUtilities
+
+from .runner import benchmark
+
+
+def seed_dataset(rows=2000, users=20, categories=50, seed=0):
+    """
+    creates users with profiles, categories and contents, returns them for the benchmarks
+    """
+    generator = random.Random(seed)
+    words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'theta', 'kappa', 'lambda', 'sigma']
+
+    user_list = []
+
+    for index in range(users):
+        user = User.objects.create(username=f'user_{index}', email=f'user_{index}@gmail.com',
+                                   first_name='first', last_name=f'last {index}')
+        Profile.objects.create(user=user, phone_no=9000000000 + index, pin_code=500000 + index,
+                               city='city', state='state', country='country', address='address ' * 10)
+        user_list.append(user)
+
+    Category.objects.bulk_create(
+        [Category(title=f'{generator.choice(words)} {index}') for index in range(categories)]
+    )
+    category_list = list(Category.objects.all())
+
+    contents = []
+    blobs = {}
+
+    for index in range(rows):
+        text = ' '.join(generator.choice(words) for _ in range(40))
+        # bulk_create does not go through save, pdf blobs are created here
+        pdf = text * 20
+        digest = PdfBlob.get_digest(pdf)
+        blobs.setdefault(digest, PdfBlob(digest=digest, data=pdf)).ref_count += 1
+
+        contents.append(Content(user=user_list[index % users], title=f'title {index}', body=text[:300],
+                                summary=text[:60], pdf_blob_id=digest, created_at=index + 1, updated_at=index + 1))
+
+    PdfBlob.objects.bulk_create(blobs.values(), batch_size=500)
+    Content.objects.bulk_create(contents, batch_size=500)
+
+    through_model = Content.categories.through
+    links = []
+
+    for content_id in Content.objects.values_list('id', flat=True):
+        for category in generator.sample(category_list, 3):
+            links.append(through_model(content_id=content_id, category_id=category.id))
+
+    through_model.objects.bulk_create(links, batch_size=1000)
+
+    admin = User.objects.create(username='admin', email='admin@gmail.com', is_superuser=True)
+
+    return {
+        'users': user_list,
+        'admin': admin,
+        'categories': category_list,
+        'words': words,
+        'rows': rows,
+    }
+
+
+@benchmark('content_serializer_10_rows')
+def content_serializer_10(dataset):
+    contents = list(Content.objects.with_related()[:10])
+    return lambda: ContentSerializer(contents, many=True).data
+
+
+@benchmark('content_serializer_100_rows')
+def content_serializer_100(dataset):
+    contents = list(Content.objects.with_related()[:100])
+    return lambda: ContentSerializer(contents, many=True).data
+
+
+@benchmark('content_serializer_100_rows_sparse')
+def content_serializer_100_sparse(dataset):
+    fields = ['id', 'title', 'summary']
+    contents = list(Content.objects.with_fields(fields)[:100])
+    return lambda: ContentSerializer(contents, many=True, fields=fields).data
+
+
+@benchmark('content_fragments_100_rows_warm')
+def content_fragments_100_warm(dataset):
+    fields = list(UserContentView.default_fields)
+    contents = list(Content.objects.with_fields(fields)[:100])
+    # every fragment is cached by the first render, only splicing is timed
+    content_fragment_cache.render(contents, fields)
+    return lambda: content_fragment_cache.render(contents, fields)
+
+
+def get_edited_pdfs(content, count):
+    """
+    returns count versions of the pdf of content, each with one word replaced
+    """
+    words = content.pdf.split(' ')
+    middle = len(words) // 2
+
+    return [' '.join(words[:middle] + [f'edit{index}'] + words[middle + 1:]) for index in range(count)]
+
+
+@benchmark('content_update_without_revision')
+def content_update_without_revision(dataset):
+    content = Content.objects.order_by('id')[2]
+    bodies = itertools.cycle(['first body', 'second body'])
+    # the same write as content_update_with_revision, without change detection and revision
+    return lambda: Content.objects.filter(pk=content.pk).update(body=next(bodies), updated_at=time.time())
+
+
+@benchmark('content_update_with_revision')
+def content_update_with_revision(dataset):
+    content = Content.objects.select_related('pdf_blob').order_by('id')[0]
+    bodies = itertools.cycle(['first body', 'second body'])
+
+    def update():
+        content.body = next(bodies)
+        content.save()
+
+    return update
+
+
+@benchmark('content_update_pdf_with_revision')
+def content_update_pdf_with_revision(dataset):
+    content = Content.objects.select_related('pdf_blob').order_by('id')[1]
+    pdfs = itertools.cycle(get_edited_pdfs(content, 2))
+
+    def update():
+        content.pdf = next(pdfs)
+        content.save()
+
+    return update
+
+
+@benchmark('content_revision_snapshot')
+def content_revision_snapshot(dataset):
+    content = Content.objects.select_related('pdf_blob').order_by('-id')[0]
+    content.pdf = get_edited_pdfs(content, 1)[0]
+    content.save()
+    # first revision of a content saved before revisions is a snapshot
+    return lambda: ContentRevision.get_version(content.pk, 1)
+
+
+@benchmark('content_revision_longest_chain')
+def content_revision_longest_chain(dataset):
+    content = Content.objects.select_related('pdf_blob').order_by('-id')[1]
+
+    for pdf in get_edited_pdfs(content, settings.CONTENT_REVISION_SNAPSHOT_INTERVAL - 1):
+        content.pdf = pdf
+        content.save()
+
+    # snapshot and every delta up to the next snapshot are applied
+    return lambda: ContentRevision.get_version(content.pk, settings.CONTENT_REVISION_SNAPSHOT_INTERVAL)
+
+
+@benchmark('user_profile_serializer', number=10)
+def user_profile_serializer(dataset):
+    profile = Profile.objects.select_related('user').first()
+    return lambda: UserProfileSerializer(profile, many=False).data
+
+
+@benchmark('paginate_results_first_page')
+def paginate_first_page(dataset):
+    contents = Content.objects.all()
+    return lambda: list(PaginationUtilities.paginate_results(contents, 1, 10))
+
+
+@benchmark('paginate_results_deep_page')
+def paginate_deep_page(dataset):
+    contents = Content.objects.all()
+    deep_page = dataset['rows'] // 10
+    return lambda: list(PaginationUtilities.paginate_results(contents, deep_page, 10))
+
+
+@benchmark('paginate_keyset_deep_page')
+def paginate_keyset_deep_page(dataset):
+    contents = Content.objects.all()
+    # same position as the deep page of paginate_results_deep_page
+    position = dataset['rows'] - 10
+    cursor = f'{position}:{position}'
+    return lambda: PaginationUtilities.paginate_keyset(contents, 'created_at', cursor, 10)
+
+
+@benchmark('validate_email', number=1000)
+def email_validator(dataset):
+    return lambda: validate_email('some.user_name-1@example.co.in')
+
+
+@benchmark('validate_password', number=1000)
+def password_validator(dataset):
+    return lambda: validate_password('SomePassword123')
+
+
+@benchmark('validate_phone_no_and_pincode', number=1000)
+def number_validators(dataset):
+    def validate():
+        validate_phone_no(9876543210)
+        validate_pincode(560001)
+
+    return validate
+
+
+@benchmark('get_categories_warm')
+def get_categories_warm(dataset):
+    view = UserContentView()
+    titles = [category.title for category in dataset['categories'][:5]]
+    return lambda: view.get_categories(titles)
+
+
+@benchmark('get_categories_cold')
+def get_categories_cold(dataset):
+    view = UserContentView()
+    # fresh titles on every call, so every category is created
+    counter = itertools.count()
+    return lambda: view.get_categories([f'cold category {next(counter)}' for _ in range(5)])
+
+
+@benchmark('search_queryset_user')
+def search_queryset_user(dataset):
+    view = SearchContentView()
+    user = dataset['users'][0]
+    return lambda: list(view.get_contents(user, 'gamma').with_related()[:10])
+
+
+@benchmark('search_queryset_admin')
+def search_queryset_admin(dataset):
+    view = SearchContentView()
+    return lambda: list(view.get_contents(dataset['admin'], 'gamma').with_related()[:10])
+
+
+@benchmark('category_autocomplete', number=1000)
+def category_autocomplete(dataset):
+    category_index.build()
+    return lambda: category_index.suggest('ga', 10)
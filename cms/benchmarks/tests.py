@@ -0,0 +1,25 @@
+from django.test import TestCase
+
+from .runner import BenchmarkRegistry, BenchmarkRunner
+from . import suites
+
+
+class BenchmarkSuiteTest(TestCase):
+    """ Test module making sure every benchmark still runs """
+
+    def test_every_benchmark_runs(self):
+        dataset = suites.seed_dataset(rows=30, users=3, categories=10)
+        runner = BenchmarkRunner(warmup=1, repetitions=2)
+
+        for name, (setup, number) in BenchmarkRegistry.get_benchmarks().items():
+            result = runner.run(setup(dataset), number=1)
+
+            self.assertEqual(result['samples'], 2, name)
+            self.assertLessEqual(result['min'], result['p99'], name)
+
+    def test_statistics(self):
+        result = BenchmarkRunner.get_statistics([float(sample) for sample in range(1, 101)])
+
+        self.assertEqual(result['median'], 50.5)
+        self.assertAlmostEqual(result['p90'], 90.1)
+        self.assertEqual(result['max'], 100.0)
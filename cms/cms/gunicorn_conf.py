@@ -0,0 +1,47 @@
+"""
+Gunicorn configuration for production.
+
+Run with:
+    env $(grep -v '^#' production.env) gunicorn -c python:cms.gunicorn_conf cms.wsgi:application
+
+(variables of production.env are read when the interpreter starts, they cannot be set from here)
+
+The application is loaded and warmed up once in the master before forking,
+so workers share its memory copy-on-write. Every worker then opens its own
+database connections before accepting requests, and is recycled after
+serving a number of requests.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+# load the application in the master, before forking workers
+preload_app = True
+
+# recycle workers after this many requests, jitter avoids restarting all workers at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+
+def when_ready(server):
+    # application is preloaded at this point, warm up what can be shared with workers
+    from cms.warmup import warm_up
+
+    warm_up(connect_databases=False)
+
+
+def pre_fork(server, worker):
+    # database connections must never be inherited by a worker
+    from django.db import connections
+
+    connections.close_all()
+
+
+def post_fork(server, worker):
+    from cms.warmup import warm_up
+
+    warm_up()
@@ -30,28 +30,35 @@ ALLOWED_HOSTS = []
 
 # Application definition
 
+# admin modules of the apps are discovered when the URLconf is loaded (see cms/urls.py),
+# not on every start, management commands never import them
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'api',
-    'utilities',
+    'api.apps.ApiConfig',
+    'utilities.apps.UtilitiesConfig',
+    'benchmarks.apps.BenchmarksConfig',
     'rest_framework.authtoken',
 ]
 
+# session, csrf, session authentication and messages only run for browser pages (admin),
+# requests under BROWSER_MIDDLEWARE_EXEMPT_PATHS skip them
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'utilities.middleware.PathScopedSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'utilities.middleware.PathScopedCsrfViewMiddleware',
+    'utilities.middleware.PathScopedAuthenticationMiddleware',
+    'utilities.middleware.PathScopedMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+BROWSER_MIDDLEWARE_EXEMPT_PATHS = ['/api/']
+
 ROOT_URLCONF = 'cms.urls'
 
 TEMPLATES = [
@@ -91,9 +98,26 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': 'ajackus',
+        # keep connections open across requests, workers connect once while warming up
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# SQLite journal mode, stored in the database file, it is switched once by migration utilities 0002
+# WAL lets readers run alongside a writer
+SQLITE_JOURNAL_MODE = 'WAL'
+
+# SQLite performance profile, pragmas applied to every new connection
+# busy_timeout makes writers wait for the lock instead of failing
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # negative value is in KiB
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -134,6 +158,98 @@ STATIC_URL = '/static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication'
+        'api.authentication.ExpiringTokenAuthentication'
     ]
 }
+
+# page_size of list endpoints is accepted from 1 to this
+MAX_PAGE_SIZE = 100
+
+# Slow query log
+
+# queries taking this many seconds or more are recorded with their query plan, None disables the log
+SLOW_QUERY_THRESHOLD = 0.2
+# slow queries kept in the log shared by every process, newest replace oldest
+SLOW_QUERY_LOG_SIZE = 200
+# distinct queries aggregated in the shared log, least recently slow ones are dropped first
+SLOW_QUERY_LOG_MAX_FINGERPRINTS = 500
+
+# Content change feed
+
+# tombstones of deleted contents are kept for this many seconds,
+# clients syncing from an older watermark have to do a full resync
+CONTENT_TOMBSTONE_RETENTION = 30 * 24 * 60 * 60
+
+# changes younger than this many seconds are held back,
+# so that transactions which are still open are not skipped by a watermark
+CONTENT_CHANGES_SETTLE_TIME = 2
+
+CONTENT_CHANGES_PAGE_SIZE = 100
+CONTENT_CHANGES_MAX_PAGE_SIZE = 500
+
+# contents not updated for this many seconds are moved to the archive table by archive_contents
+CONTENT_ARCHIVE_AGE = 365 * 24 * 60 * 60
+
+# Bulk delete
+
+# running bulk delete jobs which made no progress for this many seconds are claimed again by run_bulk_delete_jobs,
+# their worker is assumed dead
+BULK_DELETE_CLAIM_TIMEOUT = 10 * 60
+
+# Content revisions
+
+# every this many revisions of a content is stored whole, the others as deltas against the previous revision,
+# so reading a past version applies at most this many revisions
+CONTENT_REVISION_SNAPSHOT_INTERVAL = 10
+
+# fields whose changed part has more words than this (old and new together) are stored whole instead of diffed,
+# diffing is quadratic in the worst case
+CONTENT_REVISION_DELTA_MAX_WORDS = 20000
+
+# Cache invalidation bus
+
+# seconds between two polls of the invalidation events table by a process
+INVALIDATION_BUS_POLL_INTERVAL = 0.5
+
+# invalidation events are kept for this many seconds,
+# a process which did not poll for half of it drops all its cached entries
+INVALIDATION_EVENT_RETENTION = 60 * 60
+
+# bytes of rendered content json kept per process, least recently used contents are evicted first
+CONTENT_FRAGMENT_CACHE_SIZE = 32 * 1024 * 1024
+
+# Search
+
+# maximum number of characters of body sent as snippet of a search hit
+SEARCH_SNIPPET_LENGTH = 200
+
+# category autocomplete, answered from an in process index of category titles
+CATEGORY_AUTOCOMPLETE_SIZE = 10
+CATEGORY_AUTOCOMPLETE_MAX_SIZE = 50
+
+# seconds after which usage counts of the index are recounted from the database, in a background thread
+CATEGORY_INDEX_REBUILD_INTERVAL = 10 * 60
+# prefixes up to this many characters keep their most used categories ranked, longer ones are ranked per request
+CATEGORY_INDEX_TOP_PREFIX_LENGTH = 3
+
+# Password hashing
+
+# processes hashing passwords of login and token requests, 0 hashes in the request thread
+PASSWORD_HASHER_POOL_SIZE = int(os.environ.get('PASSWORD_HASHER_POOL_SIZE', 2))
+# requests waiting for a hasher process beyond the running ones, further requests get 503
+PASSWORD_HASHER_QUEUE_SIZE = 32
+# seconds a request waits for its hash before getting 503
+PASSWORD_HASHER_TIMEOUT = 5
+# seconds between two logs of the wait times and rejections of the hasher pool of a process
+PASSWORD_HASHER_METRICS_LOG_INTERVAL = 60
+
+# Auth tokens
+
+# seconds after which a token expires, whether it is used or not
+TOKEN_MAX_AGE = 30 * 24 * 60 * 60
+# seconds after which an unused token expires
+TOKEN_IDLE_TIMEOUT = 7 * 24 * 60 * 60
+# last use of a token is written at most once per this many seconds
+TOKEN_LAST_USED_RESOLUTION = 5 * 60
+# a new token is issued on every login, previous token stops working
+TOKEN_ROTATE_ON_LOGIN = False
@@ -0,0 +1,28 @@
+"""
+Cold start of the processes running the project (wsgi workers and manage.py).
+
+Some variables are read when the interpreter starts, before any code of the project runs,
+so they are set by whatever starts the process, from production.env (see README).
+Measure with: python manage.py profile_imports
+"""
+
+import os
+
+ENVIRONMENT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'production.env')
+
+
+def get_environment() -> dict:
+    """
+    returns variables of production.env, for the processes this one starts
+    """
+    environment = {}
+
+    with open(ENVIRONMENT_FILE) as file:
+        for line in file:
+            line = line.strip()
+
+            if line and not line.startswith('#'):
+                name, value = line.split('=', 1)
+                environment[name] = value
+
+    return environment
@@ -0,0 +1,42 @@
+"""
+Warm-up of a freshly started worker.
+
+Does the work that a cold worker would otherwise do while serving its first
+live requests: building the URL resolver, loading lazily imported DRF
+settings, building serializer fields from model metadata, opening
+database connections and building the category autocomplete index.
+"""
+
+from django.db import connections
+from django.urls import resolve, reverse
+
+
+def warm_up(connect_databases=True):
+    """
+    warms up process level caches, call it with connect_databases=False
+    in a process which forks afterwards, connections must not be shared with children
+    """
+    from rest_framework.settings import api_settings
+
+    from api.serializers import UserProfileSerializer, ContentSerializer, BulkDeleteJobSerializer
+
+    # url resolver and reverse lookup tables are populated on first use
+    resolve(reverse('api:user_content'))
+
+    # DRF imports renderer, parser and authentication classes lazily
+    api_settings.DEFAULT_RENDERER_CLASSES
+    api_settings.DEFAULT_PARSER_CLASSES
+    api_settings.DEFAULT_AUTHENTICATION_CLASSES
+
+    # serializer fields are built from model metadata on first access
+    for serializer_class in (ContentSerializer, UserProfileSerializer, BulkDeleteJobSerializer):
+        serializer_class().fields
+
+    if connect_databases:
+        from api.indexes import category_index
+
+        for connection in connections.all():
+            connection.ensure_connection()
+
+        # categories autocomplete index is built per worker, its bus position is per process
+        category_index.build()
@@ -1,4 +1,8 @@
 #!/bin/bash
+# manage.py runs with the environment of production, see production.env
+set -a
+. ./production.env
+set +a
 python3 manage.py migrate
 fixtures=$(ls seed/)
 while IFS= read -r fixture; do
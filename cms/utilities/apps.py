@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class UtilitiesConfig(AppConfig):
     name = 'utilities'
+
+    def ready(self):
+        # connect signal receivers
+        from . import signals  # noqa: F401
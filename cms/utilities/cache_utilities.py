@@ -0,0 +1,234 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    """
+    invalidation events shared by every worker process through the InvalidationEvent table
+
+    publish() collects events of the current transaction, once the change is committed they are stored,
+    one per key whatever the number of signals, and delivered to subscribers of this process
+    events are written after commit, out of the write transaction, so a process dying in between
+    (or failing to write them) leaves entries cached by other processes stale
+    poll() reads events published by other processes since the last poll, at most once per poll interval,
+    it is a single indexed range query and should be called before reading a cache
+    """
+
+    def __init__(self):
+        self.subscribers = defaultdict(list)
+        self.immediate_subscribers = defaultdict(list)
+        self.versions = defaultdict(int)
+        self.last_event_id = None
+        self.last_poll_time = 0
+        self.lock = threading.RLock()
+        # events published by the current transaction of each thread, in publish order
+        self.local = threading.local()
+
+    def subscribe(self, namespace, callback, immediate=False):
+        """
+        registers callback(key) for events of namespace,
+        key is None when everything in the namespace must be dropped
+        immediate callbacks are also called when this process publishes, before commit, for caches
+        which must not keep entries built from rows of a transaction that is rolled back
+        """
+        with self.lock:
+            self.subscribers[namespace].append(callback)
+
+            if immediate:
+                self.immediate_subscribers[namespace].append(callback)
+
+    def publish(self, namespace, key=''):
+        key = str(key)
+        self.get_pending()[(namespace, key)] = None
+
+        for callback in self.immediate_subscribers[namespace]:
+            callback(key or None)
+
+        # runs right away outside of a transaction, every callback of a commit after the first finds nothing left
+        # events of a rolled back transaction are kept for the next commit, an extra invalidation is harmless
+        transaction.on_commit(self.flush)
+
+    def get_pending(self) -> dict:
+        if not hasattr(self.local, 'pending'):
+            self.local.pending = {}
+
+        return self.local.pending
+
+    def flush(self):
+        from utilities.models import InvalidationEvent
+
+        pending = self.get_pending()
+
+        if not pending:
+            return
+
+        events = list(pending)
+        pending.clear()
+
+        # bulk_create does not call save(), which sets created_at
+        created_at = int(time.time())
+
+        try:
+            InvalidationEvent.objects.bulk_create([
+                InvalidationEvent(namespace=namespace, key=key, created_at=created_at) for namespace, key in events
+            ])
+        except DatabaseError:
+            # the change is committed already, failing the request would not undo it
+            logger.warning('Publishing %d invalidation events failed', len(events), exc_info=True)
+
+        # this process does not have to wait for its next poll, empty key drops the whole namespace as in poll()
+        for namespace, key in events:
+            self.dispatch(namespace, key or None)
+
+    def get_version(self, namespace) -> int:
+        """
+        returns number of invalidations of namespace seen by this process,
+        can be used as part of cache keys
+        """
+        return self.versions[namespace]
+
+    def poll(self, force=False):
+        from utilities.models import InvalidationEvent
+
+        current_time = time.monotonic()
+
+        if not force and current_time - self.last_poll_time < settings.INVALIDATION_BUS_POLL_INTERVAL:
+            return
+
+        with self.lock:
+            events = InvalidationEvent.objects.order_by('id')
+
+            if self.last_event_id is None:
+                # first poll, caches are empty, only remember where the bus is
+                self.last_event_id = events.values_list('id', flat=True).last() or 0
+
+            elif current_time - self.last_poll_time > settings.INVALIDATION_EVENT_RETENTION / 2:
+                # events not seen yet may have been purged, drop everything
+                self.last_event_id = events.values_list('id', flat=True).last() or 0
+
+                for namespace in list(self.subscribers):
+                    self.dispatch(namespace, None)
+
+            else:
+                for event_id, namespace, key in events.filter(id__gt=self.last_event_id) \
+                        .values_list('id', 'namespace', 'key'):
+                    self.dispatch(namespace, key or None)
+                    self.last_event_id = event_id
+
+            self.last_poll_time = current_time
+
+    def dispatch(self, namespace, key):
+        with self.lock:
+            self.versions[namespace] += 1
+
+            for callback in self.subscribers[namespace]:
+                callback(key)
+
+
+invalidation_bus = InvalidationBus()
+
+
+class InvalidatedCache:
+    """
+    in process dict cache, entries are dropped on invalidation events of its namespace
+    """
+
+    def __init__(self, namespace, bus=invalidation_bus):
+        self.namespace = namespace
+        self.bus = bus
+        self.entries = {}
+
+        bus.subscribe(namespace, self.invalidate)
+
+    def get(self, key, default=None):
+        self.bus.poll()
+
+        return self.entries.get(str(key), default)
+
+    def set(self, key, value):
+        self.entries[str(key)] = value
+
+    def invalidate(self, key=None):
+        if key is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(str(key), None)
+
+
+class LruByteCache:
+    """
+    in process cache of bytes values, bounded by the total size of its values,
+    least recently used entries are evicted first
+    entries can be tagged, e.g. with the objects they were rendered from, and dropped by tag
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        # key: (value, tags), least recently used first
+        self.entries = OrderedDict()
+        self.tagged_keys = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                return None
+
+            self.entries.move_to_end(key)
+
+            return entry[0]
+
+    def set(self, key, value, tags=()):
+        # a value which does not fit would evict everything else
+        if len(value) > self.max_bytes:
+            return
+
+        with self.lock:
+            self.discard(key)
+
+            self.entries[key] = (value, tuple(tags))
+            self.size += len(value)
+
+            for tag in tags:
+                self.tagged_keys[tag].add(key)
+
+            while self.size > self.max_bytes:
+                self.discard(next(iter(self.entries)))
+
+    def invalidate_tag(self, tag):
+        with self.lock:
+            for key in list(self.tagged_keys.get(tag, ())):
+                self.discard(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tagged_keys.clear()
+            self.size = 0
+
+    def discard(self, key):
+        # callers hold the lock
+        entry = self.entries.pop(key, None)
+
+        if entry is None:
+            return
+
+        value, tags = entry
+        self.size -= len(value)
+
+        for tag in tags:
+            keys = self.tagged_keys[tag]
+            keys.discard(key)
+
+            if not keys:
+                del self.tagged_keys[tag]
@@ -0,0 +1,107 @@
+import warnings
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.db import transaction, connections, DatabaseError
+
+
+class DatabaseUtilities:
+
+    # django versions whose SQLite backend begins transactions through _start_transaction_under_autocommit,
+    # the private hook overridden by immediate_atomic, see ImmediateAtomicTest
+    immediate_atomic_django_versions = ((2, 2), (3, 2))
+
+    @staticmethod
+    def apply_sqlite_pragmas(connection) -> None:
+        """
+        applies the SQLite performance profile from settings to a new connection
+        """
+        if connection.vendor != 'sqlite':
+            return
+
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+
+        with connection.cursor() as cursor:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+    @staticmethod
+    def get_estimated_row_count(model, using='default'):
+        """
+        returns row count of model's table from database statistics, without scanning the table
+        returns None if statistics are not available (on SQLite they are collected by ANALYZE)
+        """
+        connection = connections[using]
+        table = model._meta.db_table
+
+        if connection.vendor == 'postgresql':
+            query = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+        elif connection.vendor == 'sqlite':
+            # first number of stat is the number of rows in the table
+            query = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+        else:
+            return None
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(query, [table])
+                row = cursor.fetchone()
+
+        except DatabaseError:
+            return None
+
+        if row is None:
+            return None
+
+        estimated_count = int(str(row[0]).split()[0])
+
+        # postgres reports -1 for tables which were never analyzed
+        return estimated_count if estimated_count >= 0 else None
+
+    @staticmethod
+    @contextmanager
+    def immediate_atomic(using=None):
+        """
+        atomic block which takes the SQLite write lock as soon as the transaction begins (BEGIN IMMEDIATE)
+        a deferred transaction upgrades its read lock on the first write, which fails right away
+        with "database is locked" when another connection is writing, busy_timeout does not help there
+        behaves as transaction.atomic on other databases and when already inside a transaction
+        """
+        connection = transaction.get_connection(using)
+
+        if connection.vendor != 'sqlite' or connection.in_atomic_block or \
+                not DatabaseUtilities.has_transaction_hook(connection):
+            with transaction.atomic(using=using):
+                yield
+            return
+
+        def begin_immediate():
+            connection.cursor().execute('BEGIN IMMEDIATE')
+
+        # django starts SQLite transactions through this hook, override it for the outermost block only
+        connection._start_transaction_under_autocommit = begin_immediate
+
+        try:
+            with transaction.atomic(using=using):
+                del connection._start_transaction_under_autocommit
+                yield
+        finally:
+            connection.__dict__.pop('_start_transaction_under_autocommit', None)
+
+    @staticmethod
+    def has_transaction_hook(connection) -> bool:
+        """
+        whether immediate_atomic can override how connection begins transactions,
+        other django versions begin deferred transactions, with a warning
+        """
+        first_version, last_version = DatabaseUtilities.immediate_atomic_django_versions
+
+        if first_version <= django.VERSION[:2] <= last_version and \
+                hasattr(connection, '_start_transaction_under_autocommit'):
+            return True
+
+        warnings.warn(f'immediate_atomic is not supported on django {django.get_version()}, '
+                      f'transactions begin deferred', RuntimeWarning)
+
+        return False
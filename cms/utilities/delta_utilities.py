@@ -0,0 +1,110 @@
+import re
+from difflib import SequenceMatcher
+
+
+class DeltaUtilities:
+    """
+    deltas between two versions of a text, computed on words (with their trailing whitespace)
+    a delta is a list of [start, end] ranges of words copied from the old text and of strings inserted,
+    e.g. [[0, 12], 'new words ', [15, 40]]
+    """
+
+    # words keep their trailing whitespace, so that joining words gives the text back
+    word_pattern = re.compile(r'\S+\s*|\s+')
+    # json length of a copy range, shorter copies are inlined
+    copy_length = 12
+
+    @staticmethod
+    def get_words(text) -> list:
+        return DeltaUtilities.word_pattern.findall(text) if text else []
+
+    @staticmethod
+    def get_delta(old_text, new_text, max_words) -> list:
+        """
+        returns delta from old_text to new_text, new_text is kept whole if old_text is unknown (None),
+        if the changed part of the texts has more than max_words words or if the delta would not be shorter
+        """
+        new_text = str(new_text or '')
+        whole = [new_text] if new_text else []
+
+        if old_text is None:
+            return whole
+
+        old_words = DeltaUtilities.get_words(str(old_text))
+        new_words = DeltaUtilities.get_words(new_text)
+
+        # edits are mostly local, the common prefix and suffix are matched in linear time and only the middle is diffed
+        # (the matcher ignores frequent words of long texts, it would miss most of a repetitive text)
+        prefix = 0
+
+        while prefix < min(len(old_words), len(new_words)) and old_words[prefix] == new_words[prefix]:
+            prefix += 1
+
+        suffix = 0
+
+        while suffix < min(len(old_words), len(new_words)) - prefix and \
+                old_words[-suffix - 1] == new_words[-suffix - 1]:
+            suffix += 1
+
+        old_middle = old_words[prefix:len(old_words) - suffix]
+        new_middle = new_words[prefix:len(new_words) - suffix]
+
+        # matching is quadratic in the worst case
+        if len(old_middle) + len(new_middle) > max_words:
+            return whole
+
+        matcher = SequenceMatcher(None, old_middle, new_middle)
+        opcodes = [('equal', 0, prefix, 0, prefix)]
+        opcodes += [(tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix)
+                    for tag, i1, i2, j1, j2 in matcher.get_opcodes()]
+        opcodes.append(('equal', len(old_words) - suffix, len(old_words), len(new_words) - suffix, len(new_words)))
+
+        delta = []
+        length = 0
+
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                copied = ''.join(old_words[i1:i2])
+
+                if len(copied) > DeltaUtilities.copy_length:
+                    delta.append([i1, i2])
+                    length += DeltaUtilities.copy_length
+                    continue
+
+                inserted = copied
+            else:
+                inserted = ''.join(new_words[j1:j2])
+
+            if not inserted:
+                continue
+
+            if delta and isinstance(delta[-1], str):
+                delta[-1] += inserted
+            else:
+                delta.append(inserted)
+
+            length += len(inserted)
+
+        return delta if length < len(new_text) else whole
+
+    @staticmethod
+    def apply_deltas(text, deltas) -> str:
+        """
+        applies successive deltas to text
+        deltas cut the new text on word boundaries, so words of inserted strings are words of the new text
+        and the text is split once for the whole chain
+        """
+        words = DeltaUtilities.get_words(text)
+
+        for delta in deltas:
+            new_words = []
+
+            for op in delta:
+                if isinstance(op, list):
+                    new_words += words[op[0]:op[1]]
+                else:
+                    new_words += DeltaUtilities.get_words(op)
+
+            words = new_words
+
+        return ''.join(words)
@@ -0,0 +1,68 @@
+import logging
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+
+# middleware stack every request went through before it was scoped by path
+FULL_MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+
+class Command(BaseCommand):
+    help = 'Measures per-request overhead of the full browser middleware stack against the path scoped one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--path', default='/api/content/search',
+                            help='API path, requested without token so no database work is involved')
+
+    def handle(self, *args, **options):
+        stacks = (
+            ('full', FULL_MIDDLEWARE),
+            ('scoped', settings.MIDDLEWARE),
+        )
+
+        results = {}
+
+        # every request is answered with 401, don't log each of them
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+
+        for name, middleware in stacks:
+            with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=['testserver']):
+                results[name] = self.measure(options['path'], options['requests'], options['repeat'])
+
+            self.stdout.write(f'{name:<8} {results[name]:8.1f} us/request')
+
+        self.stdout.write(f'removed  {results["full"] - results["scoped"]:8.1f} us/request')
+
+    def measure(self, path, requests, repeat):
+        """
+        returns median time of a request in microseconds, over repeat runs
+        """
+        client = Client()
+        # first request builds the middleware chain
+        client.get(path)
+
+        timings = []
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+
+            for _ in range(requests):
+                client.get(path)
+
+            timings.append((time.perf_counter() - start) / requests * 1000000)
+
+        return statistics.median(timings)
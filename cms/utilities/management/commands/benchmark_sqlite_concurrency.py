@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Compares concurrent read/write throughput of SQLite defaults against SQLITE_JOURNAL_MODE and SQLITE_PRAGMAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=3.0, help='seconds per profile')
+        parser.add_argument('--rows', type=int, default=5000, help='rows seeded before the run')
+
+    def handle(self, *args, **options):
+        profiles = (
+            ('defaults', {}, 'BEGIN'),
+            ('tuned', {'journal_mode': settings.SQLITE_JOURNAL_MODE, **settings.SQLITE_PRAGMAS}, 'BEGIN IMMEDIATE'),
+        )
+
+        self.stdout.write(f'{"profile":<10}{"writes/s":>12}{"reads/s":>12}{"locked errors":>16}')
+
+        for name, pragmas, begin in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+
+                self.seed(path, pragmas, options['rows'])
+                writes, reads, errors = self.run_profile(path, pragmas, begin, options)
+
+            duration = options['duration']
+            self.stdout.write(f'{name:<10}{writes / duration:>12.1f}{reads / duration:>12.1f}{errors:>16}')
+
+    def connect(self, path, pragmas):
+        # same timeout as django's sqlite backend, autocommit so transactions are explicit
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+
+        return connection
+
+    def seed(self, path, pragmas, rows):
+        connection = self.connect(path, pragmas)
+
+        connection.execute('CREATE TABLE content (id INTEGER PRIMARY KEY, user_id INTEGER, body TEXT, updated_at INTEGER)')
+        connection.execute('CREATE INDEX content_user_id ON content (user_id)')
+        connection.executemany('INSERT INTO content (user_id, body, updated_at) VALUES (?, ?, ?)',
+                               ((row % 100, 'x' * 300, row) for row in range(rows)))
+        connection.close()
+
+    def run_profile(self, path, pragmas, begin, options):
+        stop = threading.Event()
+        counters = {'writes': 0, 'reads': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def count(name):
+            with lock:
+                counters[name] += 1
+
+        def writer(user_id):
+            connection = self.connect(path, pragmas)
+
+            while not stop.is_set():
+                try:
+                    # read then write in one transaction, like an update request does
+                    connection.execute(begin)
+                    connection.execute('SELECT count(*) FROM content WHERE user_id = ?', (user_id,)).fetchone()
+                    connection.execute('UPDATE content SET updated_at = updated_at + 1 WHERE user_id = ? '
+                                       'AND id IN (SELECT id FROM content WHERE user_id = ? LIMIT 5)',
+                                       (user_id, user_id))
+                    connection.execute('COMMIT')
+                    count('writes')
+
+                except sqlite3.OperationalError:
+                    if connection.in_transaction:
+                        connection.execute('ROLLBACK')
+
+                    count('errors')
+
+            connection.close()
+
+        def reader(user_id):
+            connection = self.connect(path, pragmas)
+
+            while not stop.is_set():
+                try:
+                    connection.execute('SELECT * FROM content WHERE user_id = ? ORDER BY id DESC LIMIT 10',
+                                       (user_id,)).fetchall()
+                    count('reads')
+
+                except sqlite3.OperationalError:
+                    count('errors')
+
+            connection.close()
+
+        threads = [threading.Thread(target=writer, args=(index,)) for index in range(options['writers'])]
+        threads += [threading.Thread(target=reader, args=(index,)) for index in range(options['readers'])]
+
+        for thread in threads:
+            thread.start()
+
+        time.sleep(options['duration'])
+        stop.set()
+
+        for thread in threads:
+            thread.join()
+
+        return counters['writes'], counters['reads'], counters['errors']
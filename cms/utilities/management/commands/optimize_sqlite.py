@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Checkpoints the WAL file and refreshes query planner statistics, run it periodically (e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f'Database {options["database"]} is not SQLite, nothing to do')
+            return
+
+        with connection.cursor() as cursor:
+            # move WAL content into the database file and truncate the WAL
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            busy, log_frames, checkpointed_frames = cursor.fetchone()
+
+            cursor.execute('ANALYZE')
+            cursor.execute('PRAGMA optimize')
+
+        self.stdout.write(f'Checkpointed {checkpointed_frames} of {log_frames} WAL frames'
+                          f'{" (database busy)" if busy else ""}, statistics refreshed')
@@ -0,0 +1,99 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cms.startup import get_environment
+
+
+# code run in a fresh interpreter for each target
+TARGETS = {
+    # what a gunicorn worker imports before serving
+    'wsgi': 'import cms.wsgi',
+    # what every management command imports before running, see manage.py
+    'setup': 'import django; django.setup()',
+    # wsgi plus the URLconf, views and admin modules loaded by the first request (or the warm up)
+    'urls': 'import cms.wsgi; from django.urls import get_resolver; get_resolver().url_patterns',
+}
+
+# import time:       self [us] |       cumulative |   imported package
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class Command(BaseCommand):
+    help = 'Profiles imports of a cold start with python -X importtime, and prints the slowest modules ' \
+           'and the time spent per package'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=sorted(TARGETS), default='wsgi')
+        parser.add_argument('--module', default=None, help='profile importing this module after django setup')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--top', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['module'] is not None:
+            code = f'{TARGETS["setup"]}; import {options["module"]}'
+        else:
+            code = TARGETS[options['target']]
+
+        runs = [self.profile(code) for _ in range(options['repeat'])]
+        # import times vary between runs, the fastest run is the least disturbed one
+        imports = min(runs, key=lambda run: sum(self_time for _, self_time, _ in run))
+
+        total = sum(self_time for _, self_time, _ in imports)
+        self.stdout.write(f'{code}\n{len(imports)} modules imported in {total / 1000:.1f} ms\n')
+
+        self.stdout.write(f'{"cumulative ms":>13} {"self ms":>8}  module')
+
+        for name, self_time, cumulative_time in sorted(imports, key=lambda row: row[2], reverse=True)[:options['top']]:
+            self.stdout.write(f'{cumulative_time / 1000:>13.1f} {self_time / 1000:>8.1f}  {name}')
+
+        packages = defaultdict(lambda: [0, 0])
+
+        for name, self_time, _ in imports:
+            package = packages[Command.get_package(name)]
+            package[0] += 1
+            package[1] += self_time
+
+        self.stdout.write(f'\n{"self ms":>13} {"modules":>8}  package')
+
+        for package, (count, self_time) in sorted(packages.items(), key=lambda item: item[1][1],
+                                                  reverse=True)[:options['top']]:
+            self.stdout.write(f'{self_time / 1000:>13.1f} {count:>8}  {package}')
+
+    @staticmethod
+    def profile(code):
+        """
+        returns (module, self time, cumulative time) of every module imported by code in a fresh interpreter,
+        times in microseconds
+        """
+        # started as in production
+        env = dict(os.environ, **get_environment(),
+                   DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'cms.settings'))
+
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=settings.BASE_DIR, env=env,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+
+        if process.returncode != 0:
+            raise CommandError(process.stderr[-2000:])
+
+        imports = []
+
+        for line in process.stderr.splitlines():
+            match = IMPORT_TIME_PATTERN.match(line)
+
+            if match is not None:
+                imports.append((match.group(4), int(match.group(1)), int(match.group(2))))
+
+        return imports
+
+    @staticmethod
+    def get_package(name):
+        # contrib apps are reported one by one, they can be removed from INSTALLED_APPS one by one
+        parts = name.split('.')
+
+        return '.'.join(parts[:3]) if parts[:2] == ['django', 'contrib'] else parts[0]
@@ -0,0 +1,17 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utilities.models import InvalidationEvent
+
+
+class Command(BaseCommand):
+    help = 'Deletes cache invalidation events older than the retention period'
+
+    def handle(self, *args, **options):
+        cutoff = int(time.time()) - settings.INVALIDATION_EVENT_RETENTION
+
+        deleted, _ = InvalidationEvent.objects.filter(created_at__lt=cutoff).delete()
+
+        self.stdout.write(f'Purged {deleted} invalidation events')
@@ -0,0 +1,47 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from utilities.db_utilities import DatabaseUtilities
+from utilities.model_fields import CompressedText, CompressedTextField
+
+
+class Command(BaseCommand):
+    help = 'Rewrites rows of compressed text fields which are stored uncompressed, e.g. written before ' \
+           'the field was compressed. Space is given back to the file system by VACUUM only'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        for model in apps.get_models():
+            for field in model._meta.concrete_fields:
+                if isinstance(field, CompressedTextField):
+                    rewritten = self.recompress(model, field, options['batch_size'])
+
+                    self.stdout.write(f'{model._meta.label}.{field.name}: recompressed {rewritten} rows')
+
+    @staticmethod
+    def recompress(model, field, batch_size) -> int:
+        manager = model._base_manager
+        rows = manager.order_by('pk').values_list('pk', field.attname)
+        last_pk = None
+        rewritten = 0
+
+        while True:
+            # short write transactions, so that the table is never locked for long
+            with DatabaseUtilities.immediate_atomic():
+                batch = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:batch_size])
+
+                if not batch:
+                    return rewritten
+
+                for pk, value in batch:
+                    # small values are not compressed anyway
+                    if isinstance(value, CompressedText) or value is None or \
+                            len(value.encode('utf-8')) < field.min_length:
+                        continue
+
+                    manager.filter(pk=pk).update(**{field.attname: value})
+                    rewritten += 1
+
+            last_pk = batch[-1][0]
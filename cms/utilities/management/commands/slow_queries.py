@@ -0,0 +1,83 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from utilities.query_log_utilities import slow_query_log
+
+
+class Command(BaseCommand):
+    help = 'Prints the slow query log shared by every process, with query plans, ' \
+           'after requesting the given API paths in this process. It is also read from GET /api/slow_queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', default=[],
+                            help='API path with its query string, e.g. "/api/content/search?search=x", repeatable')
+        parser.add_argument('--user', default=None, help='username requests are made as, first admin by default')
+        parser.add_argument('--repeat', type=int, default=1)
+        parser.add_argument('--threshold', type=float, default=None,
+                            help='seconds, overrides SLOW_QUERY_THRESHOLD for the requests, 0 records every query')
+        parser.add_argument('--clear', action='store_true', help='empties the log before the requests')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            slow_query_log.clear()
+
+        if options['path']:
+            self.request_paths(options)
+
+        self.print_snapshot(slow_query_log.get_snapshot())
+
+    def request_paths(self, options):
+        if options['user'] is not None:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('id').first()
+
+        if user is None:
+            raise CommandError('No user to make the requests as')
+
+        client = APIClient()
+        client.force_authenticate(user)
+
+        threshold = slow_query_log.threshold
+
+        if options['threshold'] is not None:
+            slow_query_log.threshold = options['threshold']
+
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                for _ in range(options['repeat']):
+                    for path in options['path']:
+                        response = client.get(path)
+
+                        if response.status_code != 200:
+                            self.stderr.write(f'{path}: {response.status_code}')
+        finally:
+            slow_query_log.threshold = threshold
+
+    def print_snapshot(self, snapshot):
+        self.stdout.write(f'{"fingerprint":<13} {"count":>6} {"total ms":>9} {"mean ms":>8} {"max ms":>8}  sql')
+
+        for aggregate in snapshot['fingerprints']:
+            self.stdout.write(f'{aggregate["fingerprint"]:<13} {aggregate["count"]:>6} '
+                              f'{aggregate["total_time"] * 1000:>9.1f} {aggregate["mean_time"] * 1000:>8.1f} '
+                              f'{aggregate["max_time"] * 1000:>8.1f}  {aggregate["sql"][:200]}')
+
+        # call sites and plan of every fingerprint, from its latest slow run
+        latest = {}
+
+        for record in snapshot['queries']:
+            latest.setdefault(record['fingerprint'], record)
+
+        for aggregate in snapshot['fingerprints']:
+            record = latest.get(aggregate['fingerprint'])
+
+            if record is None:
+                continue
+
+            self.stdout.write(f'\n{aggregate["fingerprint"]}  view: {record["view"]}  '
+                              f'call site: {record["call_site"]}  params: {record["params"]}')
+
+            for line in (record['plan'] or 'no plan').splitlines():
+                self.stdout.write(f'    {line}')
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.middleware.csrf import CsrfViewMiddleware
+
+
+class PathScopedMiddlewareMixin(object):
+    """
+    skips the wrapped middleware for requests under settings.BROWSER_MIDDLEWARE_EXEMPT_PATHS,
+    API requests authenticate with tokens and need no session, csrf or messages handling
+    """
+
+    def __init__(self, get_response=None):
+        super(PathScopedMiddlewareMixin, self).__init__(get_response)
+
+        self.exempt_paths = tuple(getattr(settings, 'BROWSER_MIDDLEWARE_EXEMPT_PATHS', ()))
+
+    def is_exempt(self, request) -> bool:
+        return request.path_info.startswith(self.exempt_paths)
+
+    def __call__(self, request):
+        if self.is_exempt(request):
+            return self.get_response(request)
+
+        return super(PathScopedMiddlewareMixin, self).__call__(request)
+
+
+class PathScopedSessionMiddleware(PathScopedMiddlewareMixin, SessionMiddleware):
+    pass
+
+
+class PathScopedCsrfViewMiddleware(PathScopedMiddlewareMixin, CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        # process_view is called by the request handler directly, not through __call__
+        if self.is_exempt(request):
+            return None
+
+        return super(PathScopedCsrfViewMiddleware, self).process_view(request, callback, callback_args,
+                                                                      callback_kwargs)
+
+
+class PathScopedAuthenticationMiddleware(PathScopedMiddlewareMixin, AuthenticationMiddleware):
+    pass
+
+
+class PathScopedMessageMiddleware(PathScopedMiddlewareMixin, MessageMiddleware):
+    pass
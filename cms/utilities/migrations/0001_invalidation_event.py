@@ -0,0 +1,23 @@
+# Generated by Django 3.1.7 on 2026-10-19 12:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvalidationEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(max_length=50)),
+                ('key', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.BigIntegerField(db_index=True, default=0)),
+            ],
+        ),
+    ]
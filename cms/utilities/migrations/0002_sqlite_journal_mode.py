@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def set_journal_mode(apps, schema_editor, journal_mode=None):
+    connection = schema_editor.connection
+
+    if connection.vendor != 'sqlite':
+        return
+
+    # journal mode is persistent, set once here instead of on every connection
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode = {journal_mode or settings.SQLITE_JOURNAL_MODE}')
+
+
+def reset_journal_mode(apps, schema_editor):
+    set_journal_mode(apps, schema_editor, journal_mode='DELETE')
+
+
+class Migration(migrations.Migration):
+
+    # journal mode can't be changed inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('utilities', '0001_invalidation_event'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode, reset_journal_mode),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.1.7 on 2026-10-19 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilities', '0002_sqlite_journal_mode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=12)),
+                ('sql', models.TextField()),
+                ('params', models.TextField()),
+                ('duration', models.FloatField()),
+                ('view', models.CharField(blank=True, max_length=100)),
+                ('call_site', models.CharField(blank=True, max_length=200)),
+                ('plan', models.TextField(blank=True)),
+                ('created_at', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SlowQueryFingerprint',
+            fields=[
+                ('id', models.CharField(max_length=12, primary_key=True, serialize=False)),
+                ('sql', models.TextField()),
+                ('count', models.IntegerField(default=0)),
+                ('total_time', models.FloatField(default=0)),
+                ('max_time', models.FloatField(default=0)),
+                ('plan', models.TextField(blank=True)),
+                ('last_seen', models.BigIntegerField(db_index=True, default=0)),
+            ],
+        ),
+    ]
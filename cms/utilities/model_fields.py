@@ -0,0 +1,126 @@
+import zlib
+
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+
+class CompressedText:
+    """
+    compressed value of a CompressedTextField as read from the database, decompressed on demand
+    values() and values_list() return it as is, str() gives the text
+    """
+
+    __slots__ = ('payload',)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def decompress(self) -> str:
+        return zlib.decompress(self.payload[len(CompressedTextField.COMPRESSED_HEADER):]).decode('utf-8')
+
+    def __str__(self):
+        return self.decompress()
+
+    def __eq__(self, other):
+        if isinstance(other, CompressedText):
+            return self.payload == other.payload
+
+        return self.decompress() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'<CompressedText: {len(self.payload)} bytes>'
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """
+    decompresses the value on first access of the attribute, and keeps the text on the instance
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+
+        value = super(CompressedTextDescriptor, self).__get__(instance, cls)
+
+        if isinstance(value, CompressedText):
+            value = instance.__dict__[self.field.attname] = value.decompress()
+
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    """
+    text field stored as binary, zlib compressed when the text is at least min_length bytes
+    stored values start with a header telling whether they are compressed, values without header
+    (text written before the column was compressed) are read as plain text
+    lookups other than exact matches do not work on compressed values
+    """
+
+    COMPRESSED_HEADER = b'\x00z'
+    PLAIN_HEADER = b'\x00t'
+
+    descriptor_class = CompressedTextDescriptor
+
+    def __init__(self, *args, min_length=256, level=6, **kwargs):
+        self.min_length = min_length
+        self.level = level
+
+        super(CompressedTextField, self).__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super(CompressedTextField, self).deconstruct()
+
+        if self.min_length != 256:
+            kwargs['min_length'] = self.min_length
+
+        if self.level != 6:
+            kwargs['level'] = self.level
+
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def compress(self, value) -> bytes:
+        """
+        returns stored form of the text, compressed only if it is large enough and compression pays off
+        """
+        data = value.encode('utf-8')
+
+        if len(data) >= self.min_length:
+            compressed = zlib.compress(data, self.level)
+
+            if len(compressed) < len(data):
+                return self.COMPRESSED_HEADER + compressed
+
+        return self.PLAIN_HEADER + data
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, CompressedText):
+            return connection.Database.Binary(value.payload)
+
+        value = super(CompressedTextField, self).get_db_prep_value(value, connection, prepared)
+
+        if value is None:
+            return None
+
+        return connection.Database.Binary(self.compress(value))
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, str):
+            return value
+
+        value = bytes(value)
+
+        if value.startswith(self.COMPRESSED_HEADER):
+            return CompressedText(value)
+
+        if value.startswith(self.PLAIN_HEADER):
+            value = value[len(self.PLAIN_HEADER):]
+
+        return value.decode('utf-8')
@@ -0,0 +1,53 @@
+import time
+
+from django.db import models
+
+
+class InvalidationEvent(models.Model):
+    """
+    invalidation of a cached object, published by the process which changed the object
+    and polled by every process, id of the event is its version
+    """
+
+    namespace = models.CharField(max_length=50)
+    # id of the invalidated object, empty to invalidate the whole namespace
+    key = models.CharField(max_length=100, blank=True)
+    created_at = models.BigIntegerField(default=0, db_index=True)
+
+    def save(self, *args, **kwargs):
+        if self.created_at == 0:
+            self.created_at = time.time()
+
+        super(InvalidationEvent, self).save(*args, **kwargs)
+
+
+class SlowQuery(models.Model):
+    """
+    query which took SLOW_QUERY_THRESHOLD seconds or more, written by the slow query log of any process,
+    only the last SLOW_QUERY_LOG_SIZE queries are kept
+    """
+
+    fingerprint = models.CharField(max_length=12)
+    sql = models.TextField()
+    # json of params redacted to their types
+    params = models.TextField()
+    duration = models.FloatField()
+    view = models.CharField(max_length=100, blank=True)
+    call_site = models.CharField(max_length=200, blank=True)
+    plan = models.TextField(blank=True)
+    created_at = models.BigIntegerField(default=0)
+
+
+class SlowQueryFingerprint(models.Model):
+    """
+    slow queries aggregated by fingerprint (sql with literals normalized) over every process,
+    only the SLOW_QUERY_LOG_MAX_FINGERPRINTS most recently slow fingerprints are kept
+    """
+
+    id = models.CharField(max_length=12, primary_key=True)
+    sql = models.TextField()
+    count = models.IntegerField(default=0)
+    total_time = models.FloatField(default=0)
+    max_time = models.FloatField(default=0)
+    plan = models.TextField(blank=True)
+    last_seen = models.BigIntegerField(default=0, db_index=True)
@@ -1,12 +1,181 @@
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework import status as status_codes
+
+from utilities.db_utilities import DatabaseUtilities
+from utilities.exception_utilities import CustomException
+from utilities.number_utilities import NumberUtilities
+
+
+class CountedPaginator(Paginator):
+    """
+    paginator which trusts a precomputed count (e.g. from a counter table)
+    instead of running COUNT(*) over the queryset
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super(CountedPaginator, self).__init__(object_list, per_page, **kwargs)
+
+        if count is not None:
+            # count is a cached property on Paginator, seed its cache
+            self.__dict__['count'] = count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    paginator for large tables, e.g. in admin changelists
+    unfiltered querysets are counted from table statistics, filtered ones are counted up to count_limit rows
+    """
+
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+
+        if not queryset.query.where:
+            estimated_count = DatabaseUtilities.get_estimated_row_count(queryset.model)
+
+            if estimated_count is not None:
+                return estimated_count
+
+        return queryset[:self.count_limit].count()
 
 
 class PaginationUtilities:
 
     @staticmethod
-    def paginate_results(queryset, page_number, page_size=10):
-        """function to create pagination and return a query set for page number"""
-        paginator = Paginator(queryset, page_size)
+    def paginate_results(queryset, page_number, page_size=10, count=None):
+        """
+        function to create pagination and return a query set for page number
+        if count is given, it is used instead of counting the queryset
+        """
+        paginator = CountedPaginator(queryset, PaginationUtilities.parse_page_size(page_size), count=count)
         max_page = len(paginator.page_range)
 
         return [] if (max_page < int(page_number)) else paginator.get_page(page_number)
+
+    @staticmethod
+    def paginate_keyset(queryset, sort_field, cursor, page_size=10):
+        """
+        keyset pagination on sort field, with id as tie breaker
+        returns results of the page and cursor of the next page (None on last page)
+        cost of a page does not depend on how deep the page is
+        """
+        descending = sort_field.startswith('-')
+        field = sort_field.lstrip('-')
+
+        queryset = queryset.order_by(sort_field, '-id' if descending else 'id')
+
+        if cursor:
+            value, last_id = PaginationUtilities.parse_cursor(cursor)
+            lookup = 'lt' if descending else 'gt'
+
+            queryset = queryset.filter(Q(**{f'{field}__{lookup}': value}) |
+                                       Q(**{field: value, f'id__{lookup}': last_id}))
+
+        page_size = PaginationUtilities.parse_page_size(page_size)
+        results = list(queryset[:page_size + 1])
+
+        if len(results) <= page_size:
+            return results, None
+
+        results = results[:page_size]
+        last_result = results[-1]
+
+        return results, f'{getattr(last_result, field)}:{last_result.id}'
+
+    @staticmethod
+    def paginate_merged(querysets, sort_field, page_number, page_size=10):
+        """
+        page of the rows of several querysets merged on sort field, with id as tie breaker
+        (e.g. the same kind of rows kept in several tables), ids must be unique across querysets
+        only sort keys of the rows up to the page are read, then the rows of the page
+        """
+        descending = sort_field.startswith('-')
+        field = sort_field.lstrip('-')
+
+        page_size = PaginationUtilities.parse_page_size(page_size)
+        page_number = max(NumberUtilities.get_integer_from_string(page_number), 1)
+        end = page_number * page_size
+
+        keys = []
+
+        for index, queryset in enumerate(querysets):
+            rows = queryset.order_by(sort_field, '-id' if descending else 'id').values_list(field, 'id')[:end]
+            keys += [(value, row_id, index) for value, row_id in rows]
+
+        page_keys = sorted(keys, reverse=descending)[end - page_size:end]
+        rows = {}
+
+        for index, queryset in enumerate(querysets):
+            row_ids = [row_id for _, row_id, key_index in page_keys if key_index == index]
+
+            if row_ids:
+                rows.update((row.id, row) for row in queryset.filter(pk__in=row_ids))
+
+        return [rows[row_id] for _, row_id, _ in page_keys]
+
+    @staticmethod
+    def paginate_keyset_merged(querysets, sort_field, cursor, page_size=10):
+        """
+        keyset pagination of the rows of several querysets merged on sort field, see paginate_merged
+        """
+        descending = sort_field.startswith('-')
+        field = sort_field.lstrip('-')
+
+        page_size = PaginationUtilities.parse_page_size(page_size)
+        results = []
+        has_next_page = False
+
+        for queryset in querysets:
+            queryset_results, next_cursor = PaginationUtilities.paginate_keyset(queryset, sort_field, cursor, page_size)
+
+            results += queryset_results
+            has_next_page = has_next_page or next_cursor is not None
+
+        results.sort(key=lambda result: (getattr(result, field), result.id), reverse=descending)
+
+        if len(results) > page_size:
+            results = results[:page_size]
+            has_next_page = True
+
+        if not has_next_page:
+            return results, None
+
+        last_result = results[-1]
+
+        return results, f'{getattr(last_result, field)}:{last_result.id}'
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """
+        returns sort value and id from a cursor of form "<value>:<id>"
+        """
+        try:
+            value, last_id = cursor.split(':')
+            return int(value), int(last_id)
+        except ValueError:
+            response = {
+                'success': False,
+                'error_message': f'Invalid cursor {cursor}'
+            }
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+    @staticmethod
+    def parse_page_size(page_size) -> int:
+        """
+        returns page size as an integer from 1 to MAX_PAGE_SIZE
+        """
+        parsed_page_size = NumberUtilities.get_integer_from_string(page_size, return_default=None)
+
+        if parsed_page_size is None or not 1 <= parsed_page_size <= settings.MAX_PAGE_SIZE:
+            response = {
+                'success': False,
+                'error_message': f'Invalid page size {page_size}, it must be from 1 to {settings.MAX_PAGE_SIZE}'
+            }
+            raise CustomException(response, status_code=status_codes.HTTP_400_BAD_REQUEST)
+
+        return parsed_page_size
@@ -0,0 +1,209 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import BrokenExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework import status as status_codes
+
+from utilities.exception_utilities import CustomException
+
+logger = logging.getLogger(__name__)
+
+
+def initialize_hasher_process():
+    # forked children inherit a configured django, spawned ones have to set it up
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def hash_password(password):
+    """
+    runs in a pool process, returns start time and hash of password
+    """
+    return time.time(), make_password(password)
+
+
+def verify_password(password, encoded):
+    """
+    runs in a pool process, returns start time, whether password matches
+    and whether its hash must be upgraded (hasher or iterations changed in settings)
+    """
+    upgrades = []
+    matches = check_password(password, encoded, setter=lambda raw_password: upgrades.append(raw_password))
+
+    return time.time(), matches, bool(upgrades)
+
+
+class PasswordHasherPool:
+    """
+    runs slow password hashing in a few worker processes, so that request threads neither burn their CPU
+    nor hold the GIL while hashing
+    at most size hashes run at once and queue_size more wait, further requests are rejected right away,
+    requests waiting longer than timeout seconds fail, both with 503
+    metrics are per process, logged every PASSWORD_HASHER_METRICS_LOG_INTERVAL seconds when hashes ran
+    and served to admin by the metrics endpoint
+    a pool of size 0 hashes in the calling thread, a pool whose process died is replaced on the next request
+    """
+
+    def __init__(self, size, queue_size, timeout, metrics_window=1000):
+        self.size = size
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(size + queue_size)
+        self.executor = None
+        self.lock = threading.Lock()
+
+        # seconds hashes waited for a pool process, for the last metrics_window hashes
+        self.wait_times = deque(maxlen=metrics_window)
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        # completed, rejected and timed out hashes when metrics were last logged
+        self.logged_counts = (0, 0, 0)
+        self.logged_at = time.monotonic()
+
+    def get_executor(self):
+        # created on first use, gunicorn workers must not share the pool of the master
+        with self.lock:
+            if self.executor is None:
+                # imports multiprocessing, which processes never hashing a password don't need
+                from concurrent.futures import ProcessPoolExecutor
+
+                self.executor = ProcessPoolExecutor(max_workers=self.size, initializer=initialize_hasher_process)
+                # shut down at exit, before the modules it uses are torn down
+                atexit.register(self.executor.shutdown, wait=False)
+
+            return self.executor
+
+    def discard_executor(self, executor):
+        # a pool process died (killed or out of memory), the executor fails every hash from then on
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+                atexit.unregister(executor.shutdown)
+
+        executor.shutdown(wait=False)
+
+    def run(self, function, *args):
+        if self.size == 0:
+            return function(*args)[1:]
+
+        try:
+            return self.run_in_pool(function, *args)
+        finally:
+            self.log_metrics()
+
+    def run_in_pool(self, function, *args):
+        if not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            PasswordHasherPool.raise_busy()
+
+        executor = self.get_executor()
+        submitted_at = time.time()
+
+        try:
+            future = executor.submit(function, *args)
+        except BrokenExecutor:
+            self.slots.release()
+            self.discard_executor(executor)
+            PasswordHasherPool.raise_busy()
+        except BaseException:
+            self.slots.release()
+            raise
+
+        # the slot is held until the hash is done, a timed out hash still occupies its pool process
+        future.add_done_callback(lambda done_future: self.slots.release())
+
+        try:
+            started_at, *result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.timed_out += 1
+            PasswordHasherPool.raise_busy()
+        except BrokenExecutor:
+            self.discard_executor(executor)
+            PasswordHasherPool.raise_busy()
+
+        self.wait_times.append(max(started_at - submitted_at, 0))
+        self.completed += 1
+
+        return result
+
+    def make_password(self, password) -> str:
+        encoded, = self.run(hash_password, password)
+
+        return encoded
+
+    def check_password(self, user, password) -> bool:
+        """
+        checks password of user, the stored hash is upgraded when settings ask for a stronger one
+        """
+        if user.password is None or not user.has_usable_password():
+            return False
+
+        matches, must_upgrade = self.run(verify_password, password, user.password)
+
+        if matches and must_upgrade:
+            user.password = self.make_password(password)
+            user.save(update_fields=['password'])
+
+        return matches
+
+    def get_metrics(self) -> dict:
+        wait_times = sorted(self.wait_times)
+
+        def percentile(fraction):
+            return wait_times[min(int(len(wait_times) * fraction), len(wait_times) - 1)] if wait_times else 0
+
+        return {
+            'size': self.size,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'wait_p50': percentile(0.5),
+            'wait_p95': percentile(0.95),
+            'wait_max': wait_times[-1] if wait_times else 0,
+        }
+
+    def log_metrics(self):
+        """
+        logs metrics once per PASSWORD_HASHER_METRICS_LOG_INTERVAL seconds, when hashes ran since last time
+        """
+        now = time.monotonic()
+
+        if now - self.logged_at < settings.PASSWORD_HASHER_METRICS_LOG_INTERVAL:
+            return
+
+        counts = (self.completed, self.rejected, self.timed_out)
+        self.logged_at = now
+
+        if counts == self.logged_counts:
+            return
+
+        self.logged_counts = counts
+        metrics = self.get_metrics()
+
+        logger.info('Password hasher pool of process %d: %d completed, %d rejected, %d timed out, '
+                    'wait p50 %.3f s, p95 %.3f s, max %.3f s', os.getpid(), metrics['completed'],
+                    metrics['rejected'], metrics['timed_out'], metrics['wait_p50'], metrics['wait_p95'],
+                    metrics['wait_max'])
+
+    @staticmethod
+    def raise_busy():
+        response = {
+            'success': False,
+            'error_message': 'Too many login requests, try again later'
+        }
+        raise CustomException(response, status_code=status_codes.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+password_hasher_pool = PasswordHasherPool(size=settings.PASSWORD_HASHER_POOL_SIZE,
+                                          queue_size=settings.PASSWORD_HASHER_QUEUE_SIZE,
+                                          timeout=settings.PASSWORD_HASHER_TIMEOUT)
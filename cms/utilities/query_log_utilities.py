@@ -0,0 +1,301 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.views import View
+
+logger = logging.getLogger(__name__)
+
+
+class SlowQueryLog:
+    """
+    database execute wrapper recording queries which take threshold seconds or more
+    slow queries are recorded with redacted params, calling view, call site and query plan,
+    and are aggregated per fingerprint (sql with literals and placeholder lists normalized)
+    the log is shared by every process through the SlowQuery and SlowQueryFingerprint tables, capped to the
+    last size queries and the max_fingerprints most recently slow fingerprints
+    records are buffered per process and written by flush(), after every request (out of its transaction)
+    and before the log is read
+    """
+
+    # string and number literals, and placeholders
+    literal_pattern = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s|\?")
+    # IN lists of any length share a fingerprint
+    list_pattern = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+    space_pattern = re.compile(r'\s+')
+
+    def __init__(self, threshold, size, max_fingerprints):
+        self.threshold = threshold
+        self.size = size
+        self.max_fingerprints = max_fingerprints
+        # records not written yet, oldest are dropped if the process writes none for a while,
+        # their aggregates are kept
+        self.pending = deque(maxlen=size)
+        # key: fingerprint id, aggregates not written yet, least recently slow first
+        self.pending_aggregates = OrderedDict()
+        # key: fingerprint id, plans of the fingerprints this process explained, least recently slow first
+        self.plans = OrderedDict()
+        self.lock = threading.Lock()
+        # queries of flush() itself are not recorded
+        self.local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.threshold is None or getattr(self.local, 'flushing', False):
+            return execute(sql, params, many, context)
+
+        started_at = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started_at
+
+        if duration >= self.threshold:
+            self.record(context['connection'], sql, params, many, duration)
+
+        return result
+
+    def record(self, connection, sql, params, many, duration):
+        fingerprint = SlowQueryLog.get_fingerprint(sql)
+        fingerprint_id = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:12]
+        view, call_site = SlowQueryLog.get_call_site()
+
+        with self.lock:
+            plan = self.plans.get(fingerprint_id)
+
+        # a fingerprint is explained once per process while it is tracked, not on every slow run
+        if plan is None and not many:
+            plan = SlowQueryLog.explain(connection, sql, params)
+
+        with self.lock:
+            self.plans.pop(fingerprint_id, None)
+            self.plans[fingerprint_id] = plan
+
+            if len(self.plans) > self.max_fingerprints:
+                self.plans.popitem(last=False)
+
+            aggregate = self.pending_aggregates.pop(fingerprint_id, None) or {
+                'sql': fingerprint, 'count': 0, 'total_time': 0.0, 'max_time': 0.0, 'plan': None,
+            }
+
+            aggregate['count'] += 1
+            aggregate['total_time'] += duration
+            aggregate['max_time'] = max(aggregate['max_time'], duration)
+            aggregate['plan'] = aggregate['plan'] or plan
+
+            self.pending_aggregates[fingerprint_id] = aggregate
+
+            if len(self.pending_aggregates) > self.max_fingerprints:
+                self.pending_aggregates.popitem(last=False)
+
+            self.pending.append({
+                'fingerprint': fingerprint_id,
+                'sql': sql,
+                'params': SlowQueryLog.redact(params, many),
+                'duration': duration,
+                'time': time.time(),
+                'view': view,
+                'call_site': call_site,
+                'plan': plan,
+            })
+
+    def flush(self):
+        """
+        writes records of this process to the shared log, in a transaction of its own
+        """
+        from utilities.db_utilities import DatabaseUtilities
+        from utilities.models import SlowQuery, SlowQueryFingerprint
+
+        with self.lock:
+            records, self.pending = list(self.pending), deque(maxlen=self.size)
+            aggregates, self.pending_aggregates = self.pending_aggregates, OrderedDict()
+
+        if not records:
+            return
+
+        current_time = time.time()
+        self.local.flushing = True
+
+        try:
+            with DatabaseUtilities.immediate_atomic():
+                SlowQuery.objects.bulk_create([
+                    SlowQuery(fingerprint=record['fingerprint'], sql=record['sql'],
+                              params=json.dumps(record['params']), duration=record['duration'],
+                              view=record['view'] or '', call_site=record['call_site'] or '',
+                              plan=record['plan'] or '', created_at=record['time'])
+                    for record in records
+                ])
+
+                last_id = SlowQuery.objects.order_by('-id').values_list('id', flat=True).first()
+                SlowQuery.objects.filter(id__lte=last_id - self.size).delete()
+
+                for fingerprint_id, aggregate in aggregates.items():
+                    updated = SlowQueryFingerprint.objects.filter(pk=fingerprint_id).update(
+                        count=F('count') + aggregate['count'],
+                        total_time=F('total_time') + aggregate['total_time'],
+                        max_time=Greatest(F('max_time'), Value(aggregate['max_time'])),
+                        last_seen=current_time
+                    )
+
+                    if not updated:
+                        SlowQueryFingerprint.objects.create(id=fingerprint_id, sql=aggregate['sql'],
+                                                            count=aggregate['count'],
+                                                            total_time=aggregate['total_time'],
+                                                            max_time=aggregate['max_time'],
+                                                            plan=aggregate['plan'] or '', last_seen=current_time)
+                    elif aggregate['plan']:
+                        SlowQueryFingerprint.objects.filter(pk=fingerprint_id, plan='').update(plan=aggregate['plan'])
+
+                dropped = list(SlowQueryFingerprint.objects.order_by('-last_seen')
+                               .values_list('id', flat=True)[self.max_fingerprints:])
+
+                if dropped:
+                    SlowQueryFingerprint.objects.filter(pk__in=dropped).delete()
+
+        except DatabaseError:
+            # the log must never fail a request, records of this flush are lost
+            logger.warning('Writing %s slow queries failed', len(records), exc_info=True)
+        finally:
+            self.local.flushing = False
+
+    def get_snapshot(self) -> dict:
+        """
+        returns slow queries of every process newest first, and fingerprints by total time spent
+        """
+        from utilities.models import SlowQuery, SlowQueryFingerprint
+
+        self.flush()
+
+        records = [{
+            'fingerprint': query.fingerprint,
+            'sql': query.sql,
+            'params': json.loads(query.params),
+            'duration': query.duration,
+            'time': query.created_at,
+            'view': query.view or None,
+            'call_site': query.call_site or None,
+            'plan': query.plan or None,
+        } for query in SlowQuery.objects.order_by('-id')[:self.size]]
+
+        aggregates = [{
+            'fingerprint': fingerprint.id,
+            'sql': fingerprint.sql,
+            'count': fingerprint.count,
+            'total_time': fingerprint.total_time,
+            'mean_time': fingerprint.total_time / fingerprint.count,
+            'max_time': fingerprint.max_time,
+            'plan': fingerprint.plan or None,
+        } for fingerprint in SlowQueryFingerprint.objects.order_by('-total_time')]
+
+        return {
+            'threshold': self.threshold,
+            'queries': records,
+            'fingerprints': aggregates,
+        }
+
+    def clear(self):
+        from utilities.models import SlowQuery, SlowQueryFingerprint
+
+        with self.lock:
+            self.pending.clear()
+            self.pending_aggregates.clear()
+
+        SlowQuery.objects.all().delete()
+        SlowQueryFingerprint.objects.all().delete()
+
+    @staticmethod
+    def get_fingerprint(sql) -> str:
+        fingerprint = SlowQueryLog.literal_pattern.sub('?', sql)
+        fingerprint = SlowQueryLog.list_pattern.sub('(...)', fingerprint)
+
+        return SlowQueryLog.space_pattern.sub(' ', fingerprint).strip()
+
+    @staticmethod
+    def redact(params, many):
+        """
+        params are replaced by their type (and length for strings and bytes), values never leave the query
+        """
+        if many:
+            return f'<{len(params)} rows>'
+
+        def redact_value(value):
+            if value is None:
+                return None
+
+            if isinstance(value, (str, bytes)):
+                return f'<{type(value).__name__}:{len(value)}>'
+
+            return f'<{type(value).__name__}>'
+
+        if isinstance(params, dict):
+            return {name: redact_value(value) for name, value in params.items()}
+
+        return [redact_value(value) for value in params or ()]
+
+    @staticmethod
+    def get_call_site():
+        """
+        returns name of the view running the query (None outside views),
+        and innermost frame of project code, e.g. api/views.py:630 in get
+        """
+        view = None
+        call_site = None
+        frame = sys._getframe(1)
+
+        while frame is not None and view is None:
+            filename = frame.f_code.co_filename
+
+            if call_site is None and filename.startswith(settings.BASE_DIR) and filename != __file__ \
+                    and 'site-packages' not in filename:
+                call_site = f'{os.path.relpath(filename, settings.BASE_DIR)}:{frame.f_lineno} ' \
+                            f'in {frame.f_code.co_name}'
+
+            instance = frame.f_locals.get('self')
+
+            if isinstance(instance, View):
+                view = type(instance).__name__
+
+            frame = frame.f_back
+
+        return view, call_site
+
+    @staticmethod
+    def explain(connection, sql, params):
+        """
+        returns query plan of a select, EXPLAIN QUERY PLAN on SQLite and EXPLAIN on Postgres
+        """
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+
+        if connection.vendor == 'sqlite':
+            prefix = 'EXPLAIN QUERY PLAN '
+        elif connection.vendor == 'postgresql':
+            prefix = 'EXPLAIN '
+        else:
+            return None
+
+        # raw cursor of the driver, the plan query is neither wrapped nor recorded itself
+        cursor = connection.create_cursor()
+
+        try:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+        except connection.Database.Error:
+            return None
+        finally:
+            cursor.close()
+
+        # SQLite rows are (id, parent, notused, detail), Postgres rows hold one line of the plan
+        return '\n'.join(str(row[-1]) for row in rows)
+
+
+slow_query_log = SlowQueryLog(threshold=settings.SLOW_QUERY_THRESHOLD,
+                              size=settings.SLOW_QUERY_LOG_SIZE,
+                              max_fingerprints=settings.SLOW_QUERY_LOG_MAX_FINGERPRINTS)
@@ -13,6 +13,15 @@ class RequestUtilities:
     def get_post_data(request: object) -> dict:
         return request.data
 
+    @staticmethod
+    def get_boolean_query_param(request: object, name: str, default: bool = False) -> bool:
+        value = request.query_params.get(name, None)
+
+        if value is None:
+            return default
+
+        return value.lower() in ('1', 'true', 'yes')
+
     @staticmethod
     def fetch_body_or_raise_exception(request):
         try:
@@ -0,0 +1,24 @@
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .db_utilities import DatabaseUtilities
+from .query_log_utilities import slow_query_log
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    DatabaseUtilities.apply_sqlite_pragmas(connection)
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+    # every query of the connection goes through the log, including those of management commands
+    if slow_query_log not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_log)
+
+
+@receiver(request_finished)
+def flush_slow_query_log(sender, **kwargs):
+    # after the response, out of the request transaction
+    slow_query_log.flush()